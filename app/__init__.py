@@ -19,12 +19,14 @@ def create_app(config_name=None):
     flask_app = Flask(__name__, template_folder="templates", static_folder="static")
 
     config_name = config_name or os.environ.get("FLASK_ENV", "development")
+    # Instantiate the config so SQLALCHEMY_DATABASE_URI properties are resolved
+    from app import config as app_config
     if config_name == "production":
-        flask_app.config.from_object("app.config.ProductionConfig")
+        flask_app.config.from_object(app_config.ProductionConfig())
     elif config_name == "testing":
-        flask_app.config.from_object("app.config.TestingConfig")
+        flask_app.config.from_object(app_config.TestingConfig())
     else:
-        flask_app.config.from_object("app.config.DevelopmentConfig")
+        flask_app.config.from_object(app_config.DevelopmentConfig())
 
     db.init_app(flask_app)
     migrate.init_app(flask_app, db)
@@ -34,17 +36,39 @@ def create_app(config_name=None):
     login_manager.login_message = "Please log in to access this page."
     login_manager.login_message_category = "info"
 
+    from app.services.cart_store import init_cart_store
+    from app.services.product_cache import init_product_cache
+    from app.services.job_service import init_job_queue
+    from app.services.kpi_service import init_kpi_cache
+    from app.services.event_bus import init_event_bus
+    from app.services.activity_writer import init_activity_log
+    from app.services.promotion_engine import init_promotion_cache
+    from app.services.register_sync import init_register_sync
+    init_cart_store(flask_app)
+    init_product_cache(flask_app)
+    init_job_queue(flask_app)
+    init_kpi_cache(flask_app)
+    init_event_bus(flask_app)
+    init_activity_log(flask_app)
+    init_promotion_cache(flask_app)
+    init_register_sync(flask_app)
+
     from app.models.user import User
     import app.models  # noqa: F401 - register all models with SQLAlchemy
 
     # Create tables if they don't exist (for production deployment)
     with flask_app.app_context():
         db.create_all()
+        from app.services.search_service import ensure_search_index
+        ensure_search_index()  # SQLite FTS5 table; PostgreSQL trigram indexes come from migrations
 
     @login_manager.user_loader
     def load_user(user_id):
         return db.session.get(User, int(user_id))
 
+    from app.utils.metrics import init_metrics
+    init_metrics(flask_app)
+
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.inventory import inventory_bp
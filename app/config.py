@@ -21,6 +21,7 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     WTF_CSRF_ENABLED = True
     ITEMS_PER_PAGE = 20
+    PAGINATION_COUNT_TTL = int(os.environ.get("PAGINATION_COUNT_TTL", "60"))  # seconds a list's cached total is reused
     
     # Store info for receipts
     STORE_NAME = os.environ.get("STORE_NAME", "Grocery Store")
@@ -28,6 +29,106 @@ class Config:
     STORE_PHONE = os.environ.get("STORE_PHONE", "+1 234 567 8900")
     TAX_RATE = float(os.environ.get("TAX_RATE", "0.08"))
 
+    # Seconds an open cart keeps its stock reserved before other registers can sell it
+    STOCK_RESERVATION_TTL = int(os.environ.get("STOCK_RESERVATION_TTL", "900"))
+
+    # Server-side POS cart store: "sql" (shared across workers) or "memory" (single process, LRU)
+    CART_STORE = os.environ.get("CART_STORE", "sql")
+    CART_STORE_SIZE = int(os.environ.get("CART_STORE_SIZE", "1000"))
+
+    # Most lines one POST /pos/cart/add-batch (scanner burst, quick-add keys) may carry
+    POS_BATCH_MAX_ITEMS = int(os.environ.get("POS_BATCH_MAX_ITEMS", "500"))
+
+    # Per-process product lookup cache for POS scans (id / SKU / barcode)
+    PRODUCT_CACHE_ENABLED = os.environ.get("PRODUCT_CACHE_ENABLED", "1") == "1"
+    PRODUCT_CACHE_SIZE = int(os.environ.get("PRODUCT_CACHE_SIZE", "5000"))
+    PRODUCT_CACHE_TTL = int(os.environ.get("PRODUCT_CACHE_TTL", "30"))  # seconds; bounds staleness across workers
+
+    # Compiled active promotions per process; reloaded when promotions change and at least this often (seconds)
+    PROMOTION_CACHE_TTL = int(os.environ.get("PROMOTION_CACHE_TTL", "60"))
+
+    # Reports read closed days from daily_sales_rollup / daily_product_rollup (see `flask rollup-build`)
+    REPORT_USE_ROLLUPS = os.environ.get("REPORT_USE_ROLLUPS", "1") == "1"
+
+    # Row caps for the Excel / PDF sales exports; longer ranges are truncated with a note
+    EXCEL_EXPORT_ROW_LIMIT = int(os.environ.get("EXCEL_EXPORT_ROW_LIMIT", "1000000"))
+    PDF_EXPORT_ROW_LIMIT = int(os.environ.get("PDF_EXPORT_ROW_LIMIT", "100000"))
+
+    # Background export jobs: worker threads per web process (0 = run `flask export-worker`),
+    # artifact directory (default: instance/exports) and how long finished files are reused
+    EXPORT_WORKER_THREADS = int(os.environ.get("EXPORT_WORKER_THREADS", "2"))
+    EXPORT_POLL_INTERVAL = float(os.environ.get("EXPORT_POLL_INTERVAL", "1.0"))
+    EXPORT_DIR = os.environ.get("EXPORT_DIR")
+    EXPORT_ARTIFACT_TTL = int(os.environ.get("EXPORT_ARTIFACT_TTL", "3600"))
+    EXPORT_JOB_TIMEOUT = int(os.environ.get("EXPORT_JOB_TIMEOUT", "1800"))  # running longer = worker died
+
+    # Receipts are rendered once at checkout and stored; reprints read the stored copy
+    RECEIPT_QR = os.environ.get("RECEIPT_QR", "1") == "1"
+    RECEIPT_PDF_AT_CHECKOUT = os.environ.get("RECEIPT_PDF_AT_CHECKOUT", "0") == "1"  # else built on first request
+    RECEIPT_WIDTH = int(os.environ.get("RECEIPT_WIDTH", "42"))  # characters per line on the text receipt
+
+    # Request/SQL instrumentation behind /metrics and `flask perf-report` (opt-in)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+    METRICS_DIR = os.environ.get("METRICS_DIR")  # per-process snapshots; default instance/metrics
+    METRICS_FLUSH_INTERVAL = int(os.environ.get("METRICS_FLUSH_INTERVAL", "10"))  # seconds
+    METRICS_SLOW_STATEMENTS = int(os.environ.get("METRICS_SLOW_STATEMENTS", "20"))
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # lets a scraper use "Authorization: Bearer <token>"
+
+    # Dashboard KPI tiles: per-process cache refreshed in the background (stale-while-revalidate)
+    KPI_CACHE_ENABLED = os.environ.get("KPI_CACHE_ENABLED", "1") == "1"
+    KPI_CACHE_TTL = int(os.environ.get("KPI_CACHE_TTL", "60"))  # seconds; also bounds staleness across workers
+    KPI_CACHE_IDLE = int(os.environ.get("KPI_CACHE_IDLE", "3600"))  # stop refreshing entries nobody read for this long
+    KPI_TOP_SELLERS = int(os.environ.get("KPI_TOP_SELLERS", "5"))
+    KPI_NEAR_EXPIRY_DAYS = int(os.environ.get("KPI_NEAR_EXPIRY_DAYS", "7"))
+
+    # Live stock/alert events (SSE at /inventory/events): "memory" (one process) or "postgres"
+    # (LISTEN/NOTIFY, for several gunicorn workers; run them with gthread or gevent workers)
+    EVENT_BUS = os.environ.get("EVENT_BUS", "memory")
+    EVENT_BUS_CHANNEL = os.environ.get("EVENT_BUS_CHANNEL", "gsms_events")
+    EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "100"))  # per client; overflow sends "resync"
+    EVENT_MAX_CLIENTS = int(os.environ.get("EVENT_MAX_CLIENTS", "200"))  # per process
+    SSE_HEARTBEAT = int(os.environ.get("SSE_HEARTBEAT", "15"))  # seconds between keep-alive comments
+
+    # Activity log: "sync" (INSERT in the caller's transaction) or "async" (queued after commit and
+    # written by a background thread in multi-row batches; spilled to disk while the DB is down)
+    ACTIVITY_LOG_MODE = os.environ.get("ACTIVITY_LOG_MODE", "sync")
+    ACTIVITY_LOG_QUEUE_SIZE = int(os.environ.get("ACTIVITY_LOG_QUEUE_SIZE", "10000"))  # overflow goes to the spill file
+    ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get("ACTIVITY_LOG_BATCH_SIZE", "200"))
+    ACTIVITY_LOG_FLUSH_MS = int(os.environ.get("ACTIVITY_LOG_FLUSH_MS", "500"))
+    ACTIVITY_LOG_SPILL_DIR = os.environ.get("ACTIVITY_LOG_SPILL_DIR")  # default instance/activity_spill
+    # Retention (`flask activity-archive`): older months go to gzipped JSONL files, then are dropped.
+    # On PostgreSQL the table is partitioned by month; `flask activity-partitions` creates months ahead
+    ACTIVITY_LOG_RETENTION_MONTHS = int(os.environ.get("ACTIVITY_LOG_RETENTION_MONTHS", "12"))
+    ACTIVITY_LOG_ARCHIVE_DIR = os.environ.get("ACTIVITY_LOG_ARCHIVE_DIR")  # default instance/activity_archive
+    ACTIVITY_LOG_PARTITIONS_AHEAD = int(os.environ.get("ACTIVITY_LOG_PARTITIONS_AHEAD", "3"))
+
+    # Catalogue change feed (/inventory/api/changes): rows per page, how far behind "now" a page
+    # stops so rows from transactions still committing are not skipped, and how long deletions are
+    # remembered (a consumer that has not synced for longer must start again; `flask catalog-prune`)
+    CATALOG_CHANGES_PAGE = int(os.environ.get("CATALOG_CHANGES_PAGE", "1000"))
+    CATALOG_CHANGES_LAG = int(os.environ.get("CATALOG_CHANGES_LAG", "5"))
+    CATALOG_TOMBSTONE_DAYS = int(os.environ.get("CATALOG_TOMBSTONE_DAYS", "90"))
+
+    # Register mode: "online" (scans and checkouts use the central database directly) or "offline"
+    # (this app is a till running on a local SQLite replica: the catalogue is pulled from
+    # REGISTER_CENTRAL_URL and sales are pushed there in batches; see app.services.register_sync)
+    REGISTER_MODE = os.environ.get("REGISTER_MODE", "online")
+    REGISTER_ID = os.environ.get("REGISTER_ID", "")  # default: host name
+    REGISTER_CENTRAL_URL = os.environ.get("REGISTER_CENTRAL_URL", "")  # e.g. https://store.example.com
+    REGISTER_SYNC_TOKEN = os.environ.get("REGISTER_SYNC_TOKEN", "")  # a till's "Authorization: Bearer <token>"
+    REGISTER_SYNC_INTERVAL = int(os.environ.get("REGISTER_SYNC_INTERVAL", "30"))  # seconds; 0 = `flask register-sync` only
+    REGISTER_SYNC_BATCH = int(os.environ.get("REGISTER_SYNC_BATCH", "200"))  # sales per push
+    REGISTER_SYNC_TIMEOUT = int(os.environ.get("REGISTER_SYNC_TIMEOUT", "15"))  # seconds per HTTP request
+    # Central side: tokens accepted from tills (comma-separated), catalogue rows per page, and how
+    # far behind "now" a page stops so rows from transactions still committing are not skipped
+    REGISTER_SYNC_TOKENS = [t.strip() for t in os.environ.get("REGISTER_SYNC_TOKENS", "").split(",") if t.strip()]
+    REGISTER_CATALOG_PAGE = int(os.environ.get("REGISTER_CATALOG_PAGE", "1000"))
+    REGISTER_CATALOG_LAG = int(os.environ.get("REGISTER_CATALOG_LAG", "5"))
+
+    # Product import (/inventory/batch, `flask import-products`): rows per batch/commit, errors kept in the report
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", "1000"))
+
     # PostgreSQL connection settings (for local development)
     DB_HOST = os.environ.get("DB_HOST", "localhost")
     DB_PORT = os.environ.get("DB_PORT", "5432")
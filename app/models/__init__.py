@@ -5,22 +5,36 @@ from app import db
 from app.models.user import User
 from app.models.category import Category
 from app.models.supplier import Supplier
-from app.models.product import Product
+from app.models.product import Product, ProductTombstone
 from app.models.customer import Customer
 from app.models.sale import Sale, SaleItem
 from app.models.activity_log import ActivityLog
 from app.models.shift import Shift
 from app.models.promotion import Promotion
+from app.models.reservation import StockReservation
+from app.models.cart import PosCart
+from app.models.rollup import DailySalesRollup, DailyProductRollup
+from app.models.export_job import ExportJob
+from app.models.receipt import Receipt
+from app.models.register_state import RegisterState
 
 __all__ = [
     "User",
     "Category",
     "Supplier",
     "Product",
+    "ProductTombstone",
     "Customer",
     "Sale",
     "SaleItem",
     "ActivityLog",
     "Shift",
     "Promotion",
+    "StockReservation",
+    "PosCart",
+    "DailySalesRollup",
+    "DailyProductRollup",
+    "ExportJob",
+    "Receipt",
+    "RegisterState",
 ]
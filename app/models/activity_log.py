@@ -1,5 +1,8 @@
 """
 Activity log for audit trail of system actions.
+
+On PostgreSQL the table is range-partitioned by month on created_at (see
+app.services.activity_log_service); the partitioned table's primary key is (id, created_at).
 """
 from datetime import datetime
 from app import db
@@ -7,6 +10,13 @@ from app import db
 
 class ActivityLog(db.Model):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        db.Index("ix_activity_logs_created_at_id", "created_at", "id"),
+        # Keyset pages filtered by user / action / entity (activity_log_service.activity_page)
+        db.Index("ix_activity_logs_user_id_created_at_id", "user_id", "created_at", "id"),
+        db.Index("ix_activity_logs_action_created_at_id", "action", "created_at", "id"),
+        db.Index("ix_activity_logs_entity_created_at_id", "entity_type", "entity_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
@@ -15,7 +25,7 @@ class ActivityLog(db.Model):
     entity_id = db.Column(db.Integer, nullable=True)
     details = db.Column(db.Text, nullable=True)
     ip_address = db.Column(db.String(45), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     def __repr__(self):
         return f"<ActivityLog {self.action} {self.entity_type}:{self.entity_id}>"
@@ -0,0 +1,16 @@
+"""
+Server-side POS cart storage (used by the SQL cart store backend).
+"""
+from datetime import datetime
+from app import db
+
+
+class PosCart(db.Model):
+    __tablename__ = "pos_carts"
+
+    cart_id = db.Column(db.String(64), primary_key=True)  # register / session cart id
+    data = db.Column(db.Text, nullable=False)  # JSON list of cart lines
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<PosCart {self.cart_id}>"
@@ -7,9 +7,12 @@ from app import db
 
 class Customer(db.Model):
     __tablename__ = "customers"
+    __table_args__ = (
+        db.Index("ix_customers_name_id", "name", "id"),  # customer list keyset pages
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), nullable=True)
     phone = db.Column(db.String(30), nullable=True)
     loyalty_points = db.Column(db.Integer, default=0)
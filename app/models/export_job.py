@@ -0,0 +1,44 @@
+"""
+Background export jobs (Excel/PDF/CSV sales exports) and their cached artifacts.
+"""
+from datetime import datetime
+from app import db
+
+
+class ExportJob(db.Model):
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        db.Index("ix_export_jobs_params_hash_status", "params_hash", "status"),
+        db.Index("ix_export_jobs_status_created_at", "status", "created_at"),
+    )
+
+    STATUSES = ("queued", "running", "done", "failed")
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, handed to the client
+    kind = db.Column(db.String(20), nullable=False)  # csv, excel, pdf
+    params = db.Column(db.Text, nullable=False)  # canonical JSON
+    params_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    progress = db.Column(db.Integer, nullable=False, default=0)  # rows written so far
+    artifact_path = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # artifact TTL
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ExportJob {self.id} {self.kind} {self.status}>"
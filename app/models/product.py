@@ -8,9 +8,22 @@ from app import db
 
 class Product(db.Model):
     __tablename__ = "products"
+    __table_args__ = (
+        # Alert pages read only alerting rows: the index holds just the products at or below
+        # min_stock (a column-to-column test a plain index cannot serve) and the dated ones
+        db.Index("ix_products_low_stock", "quantity",
+                 postgresql_where=db.text("quantity <= min_stock"), sqlite_where=db.text("quantity <= min_stock")),
+        db.Index("ix_products_expiration_date", "expiration_date",
+                 postgresql_where=db.text("expiration_date IS NOT NULL"),
+                 sqlite_where=db.text("expiration_date IS NOT NULL")),
+        # Product list keyset pages (name, id); also serves lookups by name
+        db.Index("ix_products_name_id", "name", "id"),
+        # Catalogue changes since a watermark (change feed, offline register sync)
+        db.Index("ix_products_updated_at_id", "updated_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=True)
     price = db.Column(db.Numeric(12, 2), nullable=False, default=0)
     quantity = db.Column(db.Integer, nullable=False, default=0)
@@ -38,3 +51,18 @@ class Product(db.Model):
 
     def __repr__(self):
         return f"<Product {self.name} ({self.sku})>"
+
+
+class ProductTombstone(db.Model):
+    """A deleted product, kept so the catalogue change feed can tell consumers to drop it."""
+    __tablename__ = "product_tombstones"
+    __table_args__ = (
+        db.Index("ix_product_tombstones_deleted_at_id", "deleted_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)  # no FK: the product row is gone
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ProductTombstone {self.product_id}>"
@@ -1,5 +1,6 @@
 """
-Promotion for discounts (percentage or fixed) and special offers.
+Promotion for discounts (percentage or fixed) and special offers: BOGO, multi-buy and tiered
+rules on a product, a category or the whole basket (see app.services.promotion_engine).
 """
 from datetime import datetime, date
 from decimal import Decimal
@@ -11,9 +12,16 @@ class Promotion(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
-    promo_type = db.Column(db.String(20), nullable=False)  # percentage, fixed
+    promo_type = db.Column(db.String(20), nullable=False)  # percentage, fixed, bogo, multibuy, tiered
     value = db.Column(db.Numeric(12, 2), nullable=False)  # e.g. 10 for 10%, or 5.00 for $5 off
     min_purchase = db.Column(db.Numeric(12, 2), nullable=True)  # minimum cart total to apply
+    scope = db.Column(db.String(20), nullable=False, default="basket", server_default="basket")  # basket, product, category
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id", ondelete="CASCADE", name="fk_promotions_product_id"), nullable=True)  # scope product
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE", name="fk_promotions_category_id"), nullable=True)  # scope category
+    buy_quantity = db.Column(db.Integer, nullable=True)  # bogo: buy N; multibuy: N for `value`
+    get_quantity = db.Column(db.Integer, nullable=True)  # bogo: get M at `value` % off (100 = free)
+    tiers = db.Column(db.Text, nullable=True)  # tiered: JSON [{"min": 3, "value": 10}, ...] (percent off)
+    automatic = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # applied without selecting it
     valid_from = db.Column(db.DateTime, nullable=True)
     valid_to = db.Column(db.DateTime, nullable=True)
     active = db.Column(db.Boolean, default=True)
@@ -0,0 +1,18 @@
+"""
+Rendered receipts, written once at checkout and served as-is on every reprint.
+"""
+from datetime import datetime
+from app import db
+
+
+class Receipt(db.Model):
+    __tablename__ = "receipts"
+
+    sale_id = db.Column(db.Integer, db.ForeignKey("sales.id", ondelete="CASCADE"), primary_key=True)
+    html = db.Column(db.Text, nullable=False)  # receipt card fragment (QR code inlined as SVG)
+    text = db.Column(db.Text, nullable=False)  # fixed-width text for ESC/POS printers
+    pdf = db.deferred(db.Column(db.LargeBinary, nullable=True))  # built on first request unless RECEIPT_PDF_AT_CHECKOUT
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Receipt sale={self.sale_id}>"
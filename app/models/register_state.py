@@ -0,0 +1,16 @@
+"""
+Offline register sync state on a till: catalogue watermark, reference snapshot version, last runs.
+"""
+from datetime import datetime
+from app import db
+
+
+class RegisterState(db.Model):
+    __tablename__ = "register_state"
+
+    key = db.Column(db.String(64), primary_key=True)  # catalog_cursor, reference_etag, last_pull, last_push
+    value = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RegisterState {self.key}={self.value}>"
@@ -0,0 +1,23 @@
+"""
+Stock reservations held by open POS carts so parallel registers never oversell.
+"""
+from datetime import datetime
+from app import db
+
+
+class StockReservation(db.Model):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (db.UniqueConstraint("holder", "product_id", name="uq_stock_reservations_holder_product"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    holder = db.Column(db.String(64), nullable=False, index=True)  # cart / register id
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def is_active(self) -> bool:
+        return self.expires_at > datetime.utcnow()
+
+    def __repr__(self):
+        return f"<StockReservation {self.holder} product={self.product_id} qty={self.quantity}>"
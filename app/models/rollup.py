@@ -0,0 +1,34 @@
+"""
+Pre-aggregated daily sales rollups feeding report_service.
+"""
+from datetime import datetime
+from app import db
+
+
+class DailySalesRollup(db.Model):
+    __tablename__ = "daily_sales_rollup"
+
+    day = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # positive sales only, like the reports
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    tax = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    discount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    refund_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # negative totals of refund sales
+    refund_count = db.Column(db.Integer, nullable=False, default=0)
+    complete = db.Column(db.Boolean, nullable=False, default=False)  # rebuilt from raw rows after the day closed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DailySalesRollup {self.day} total={self.total}>"
+
+
+class DailyProductRollup(db.Model):
+    __tablename__ = "daily_product_rollup"
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyProductRollup {self.day} product={self.product_id} qty={self.quantity}>"
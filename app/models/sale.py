@@ -8,6 +8,18 @@ from app import db
 
 class Sale(db.Model):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Reports only ever look at positive (non-refund) sales in a date range
+        db.Index("ix_sales_created_at_positive", "created_at",
+                 postgresql_where=db.text("total > 0"), sqlite_where=db.text("total > 0")),
+        db.Index("ix_sales_customer_id_created_at", "customer_id", "created_at"),
+        # Register sync: a till's sale is recorded centrally at most once; the till's outbox is
+        # the sales it has not pushed yet
+        db.Index("ix_sales_client_ref", "client_ref", unique=True),
+        db.Index("ix_sales_unsynced", "id",
+                 postgresql_where=db.text("client_ref IS NOT NULL AND synced_at IS NULL"),
+                 sqlite_where=db.text("client_ref IS NOT NULL AND synced_at IS NULL")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -20,15 +32,21 @@ class Sale(db.Model):
     loyalty_points_used = db.Column(db.Integer, default=0)
     loyalty_points_earned = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    client_ref = db.Column(db.String(64), nullable=True)  # idempotency key of a sale made on an offline register
+    register_id = db.Column(db.String(64), nullable=True)  # till that recorded it (register mode)
+    synced_at = db.Column(db.DateTime, nullable=True)  # till: pushed to the central database; central: received
 
     items = db.relationship("SaleItem", backref="sale", lazy="dynamic", cascade="all, delete-orphan")
 
 
 class SaleItem(db.Model):
     __tablename__ = "sale_items"
+    __table_args__ = (
+        db.Index("ix_sale_items_product_id_sale_id", "product_id", "sale_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    sale_id = db.Column(db.Integer, db.ForeignKey("sales.id"), nullable=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey("sales.id"), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Numeric(12, 2), nullable=False)
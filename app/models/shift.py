@@ -8,13 +8,16 @@ from app import db
 
 class Shift(db.Model):
     __tablename__ = "shifts"
+    __table_args__ = (
+        db.Index("ix_shifts_user_id_start_at", "user_id", "start_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     register_id = db.Column(db.String(20), nullable=True)
     open_cash = db.Column(db.Numeric(12, 2), nullable=False, default=0)
     close_cash = db.Column(db.Numeric(12, 2), nullable=True)
-    start_at = db.Column(db.DateTime, default=datetime.utcnow)
+    start_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     end_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
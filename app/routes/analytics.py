@@ -2,12 +2,13 @@
 Analytics and reporting: sales reports, inventory, exports.
 """
 from datetime import datetime, date, timedelta
-from flask import Blueprint, render_template, request, send_file, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, abort, current_app, Response, stream_with_context
 from flask_login import current_user
 from app.utils.decorators import login_required, manager_required
+from app.services import job_service as jobs
+from app.services import kpi_service as kpis
 from app.services import report_service as reports
 from app.config import Config
-import io
 
 analytics_bp = Blueprint("analytics", __name__)
 
@@ -37,26 +38,21 @@ def parse_dates():
 @manager_required
 def dashboard():
     start_date, end_date = parse_dates()
-    summary = reports.sales_summary(
-        datetime.combine(start_date, datetime.min.time()),
-        datetime.combine(end_date, datetime.max.time()),
-    )
-    daily = reports.sales_report(
-        datetime.combine(start_date, datetime.min.time()),
-        datetime.combine(end_date, datetime.max.time()),
-    )
-    best = reports.best_selling_products(
-        datetime.combine(start_date, datetime.min.time()),
-        datetime.combine(end_date, datetime.max.time()),
-        limit=10,
-    )
+    # The default window (no dates picked) and today's tiles come from the KPI cache and never
+    # wait on aggregation: a cold cache renders placeholders (the page reloads once it is warm)
+    if request.args.get("start") or request.args.get("end"):
+        window = kpis.analytics_window(start_date, end_date)
+    else:
+        window = kpis.get_analytics_window(start_date, end_date, wait=False)
     return render_template(
         "analytics/dashboard.html",
-        summary=summary,
-        daily=daily,
-        best_selling=best,
+        summary=window["summary"] if window else None,
+        daily=window["daily"] if window else [],
+        best_selling=window["best_selling"] if window else [],
+        loading=window is None,
         start_date=start_date,
         end_date=end_date,
+        kpis=kpis.get_today_kpis(wait=False),
     )
 
 
@@ -102,19 +98,16 @@ def inventory_report():
 @login_required
 @manager_required
 def export_csv():
+    if request.args.get("background"):
+        return _enqueue_export("csv")
     start_date, end_date = parse_dates()
     start_dt = datetime.combine(start_date, datetime.min.time())
     end_dt = datetime.combine(end_date, datetime.max.time())
     lines = reports.export_sales_csv(start_dt, end_dt)
-    buf = io.BytesIO()
-    for line in lines:
-        buf.write(line.encode("utf-8"))
-    buf.seek(0)
-    return send_file(
-        buf,
+    return Response(
+        stream_with_context(lines),
         mimetype="text/csv",
-        as_attachment=True,
-        download_name=f"sales_{start_date}_{end_date}.csv",
+        headers={"Content-Disposition": f"attachment; filename=sales_{start_date}_{end_date}.csv"},
     )
 
 
@@ -122,37 +115,79 @@ def export_csv():
 @login_required
 @manager_required
 def export_excel():
-    start_date, end_date = parse_dates()
-    start_dt = datetime.combine(start_date, datetime.min.time())
-    end_dt = datetime.combine(end_date, datetime.max.time())
-    bio = reports.export_sales_excel_io(start_dt, end_dt)
-    if not bio:
-        return "Excel export not available", 500
-    return send_file(
-        bio,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        as_attachment=True,
-        download_name=f"sales_{start_date}_{end_date}.xlsx",
-    )
+    return _enqueue_export("excel")
 
 
 @analytics_bp.route("/export/pdf")
 @login_required
 @manager_required
 def export_pdf():
+    return _enqueue_export("pdf")
+
+
+def _wants_json():
+    return request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
+
+
+def _job_payload(job):
+    payload = job.to_dict()
+    payload["status_url"] = url_for("analytics.export_job_status", job_id=job.id)
+    if job.status == "done":
+        payload["download_url"] = url_for("analytics.export_job_download", job_id=job.id)
+    return payload
+
+
+def _enqueue_export(kind):
+    """Queue a background export; JSON clients get 202 + job id, browsers the job page."""
     start_date, end_date = parse_dates()
-    start_dt = datetime.combine(start_date, datetime.min.time())
-    end_dt = datetime.combine(end_date, datetime.max.time())
-    store_name = getattr(Config, "STORE_NAME", "Grocery Store")
-    bio = reports.export_sales_pdf_io(start_dt, end_dt, store_name=store_name)
-    if not bio:
-        return "PDF export not available", 500
-    return send_file(
-        bio,
-        mimetype="application/pdf",
-        as_attachment=True,
-        download_name=f"sales_{start_date}_{end_date}.pdf",
-    )
+    params = {"start": str(start_date), "end": str(end_date)}
+    if kind == "excel":
+        params["row_limit"] = current_app.config["EXCEL_EXPORT_ROW_LIMIT"]
+    elif kind == "pdf":
+        params["row_limit"] = current_app.config["PDF_EXPORT_ROW_LIMIT"]
+        params["store_name"] = getattr(Config, "STORE_NAME", "Grocery Store")
+    job, error = jobs.enqueue_export(kind, params, user_id=current_user.id)
+    if error:
+        if _wants_json():
+            return jsonify({"error": error}), 400
+        flash(error, "danger")
+        return redirect(url_for("analytics.dashboard"))
+    if _wants_json():
+        return jsonify(_job_payload(job)), 202
+    return redirect(url_for("analytics.export_job_page", job_id=job.id))
+
+
+@analytics_bp.route("/export/jobs/<job_id>")
+@login_required
+@manager_required
+def export_job_page(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        abort(404)
+    if _wants_json():
+        return jsonify(_job_payload(job))
+    return render_template("analytics/export_job.html", job=job)
+
+
+@analytics_bp.route("/export/jobs/<job_id>/status")
+@login_required
+@manager_required
+def export_job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Export job not found"}), 404
+    return jsonify(_job_payload(job))
+
+
+@analytics_bp.route("/export/jobs/<job_id>/download")
+@login_required
+@manager_required
+def export_job_download(job_id):
+    artifact = jobs.artifact_for(jobs.get_job(job_id))
+    if artifact is None:
+        abort(404)
+    path, mimetype, download_name = artifact
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
 
 
 @analytics_bp.route("/api/chart")
@@ -1,7 +1,7 @@
 """
 Customer management: CRUD, purchase history, loyalty.
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request
 from flask_login import current_user
 from app import db
 from sqlalchemy import or_
@@ -9,6 +9,7 @@ from app.models.customer import Customer
 from app.models.sale import Sale
 from app.utils.decorators import login_required, manager_required
 from app.utils.activity import log_activity
+from app.utils.pagination import estimated_count, paginate
 
 customers_bp = Blueprint("customers", __name__)
 
@@ -22,8 +23,14 @@ def customer_list():
     if search:
         term = f"%{search}%"
         q = q.filter(or_(Customer.name.ilike(term), Customer.email.ilike(term), Customer.phone.ilike(term)))
-    customers = q.order_by(Customer.name).limit(200).all()
-    return render_template("customers/list.html", customers=customers, search=search)
+    pagination = paginate(
+        q, (Customer.name, Customer.id),
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        per_page=current_app.config.get("ITEMS_PER_PAGE", 20),
+        total=None if search else estimated_count(Customer),
+    )
+    return render_template("customers/list.html", pagination=pagination, search=search)
 
 
 @customers_bp.route("/add", methods=["GET", "POST"])
@@ -1,12 +1,16 @@
 """
 Inventory management: products, categories, suppliers, batch, alerts.
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+import json
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, Response
 from flask_login import current_user
 from app import db
-from app.utils.decorators import login_required, manager_required
+from app.utils.decorators import login_required, login_or_register_token_required, manager_required
 from app.utils.activity import log_activity
 from app.services import inventory_service as inv
+from app.services import import_service as importer
+from app.services import catalog_changes as changes
+from app.services import event_bus as events
 from app.models.category import Category
 from app.models.supplier import Supplier
 
@@ -16,12 +20,16 @@ inventory_bp = Blueprint("inventory", __name__)
 @inventory_bp.route("/")
 @login_required
 def product_list():
-    page = request.args.get("page", 1, type=int)
     category_id = request.args.get("category_id", type=int)
     search = request.args.get("search", "").strip() or None
     low_stock = request.args.get("low_stock", type=lambda x: x == "1")
-    pagination = inv.get_products_paginated(
-        page=page, category_id=category_id, search=search, low_stock_only=low_stock
+    pagination = inv.get_products_page(
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        per_page=current_app.config.get("ITEMS_PER_PAGE", 20),
+        category_id=category_id,
+        search=search,
+        low_stock_only=low_stock,
     )
     categories = inv.get_categories_all()
     return render_template(
@@ -157,14 +165,31 @@ def product_delete(product_id):
 @login_required
 @manager_required
 def batch_update():
+    """
+    Create/update products in bulk. POST a CSV or JSON file (multipart field "file"), or a raw
+    JSON / JSON Lines / CSV body; dry_run=1 validates without saving. Returns the import report.
+    """
     if request.method == "POST":
-        data = request.get_json()
-        if not data or not isinstance(data, list):
-            return jsonify({"success": False, "error": "Expected JSON array"}), 400
-        success, errors = inv.batch_update_products(data)
-        log_activity("batch_update", "product", None, f"Batch updated {success} products")
-        db.session.commit()
-        return jsonify({"success": True, "updated": success, "errors": errors})
+        dry_run = (request.form.get("dry_run") or request.args.get("dry_run")) == "1"
+        upload = request.files.get("file")
+        if upload and upload.filename:
+            fmt = request.form.get("format") or importer.guess_format(upload.filename)
+            stream = upload.stream
+        elif request.mimetype in ("application/json", "application/x-ndjson", "text/csv"):
+            fmt = "csv" if request.mimetype == "text/csv" else "json"
+            stream = request.stream
+        else:
+            return jsonify({"success": False, "error": "Upload a CSV or JSON file"}), 400
+        if fmt not in importer.IMPORT_FORMATS:
+            return jsonify({"success": False, "error": "Unknown file format; use .csv or .json"}), 400
+        report, err = importer.import_products(importer.iter_rows(stream, fmt), dry_run=dry_run)
+        if not dry_run and report["created"] + report["updated"]:
+            log_activity(
+                "batch_update", "product", None,
+                f"Imported products: {report['created']} created, {report['updated']} updated, {report['failed']} failed",
+            )
+            db.session.commit()
+        return jsonify(dict(report, success=err is None, error=err)), 400 if err else 200
     return render_template("inventory/batch_update.html")
 
 
@@ -176,6 +201,45 @@ def alerts():
     return render_template("inventory/alerts.html", low_stock=low_stock, expired_near=expired_near)
 
 
+@inventory_bp.route("/events")
+@login_required
+def event_stream():
+    """
+    Server-Sent Events feed of stock / alert events (see event_bus). Optional filters:
+    types=stock,low_stock,... and products=1,2,3.
+    """
+    bus = events.get_event_bus()
+    types = [t for t in request.args.get("types", "").split(",") if t] or None
+    try:
+        product_ids = [int(p) for p in request.args.get("products", "").split(",") if p] or None
+    except ValueError:
+        return jsonify({"error": "products must be comma-separated ids"}), 400
+    sub = bus.subscribe(types=types, product_ids=product_ids) if bus is not None else None
+    if sub is None:
+        return jsonify({"error": "Too many live connections"}), 503
+    # Not stream_with_context: the request (and its DB session) ends before streaming starts
+    return Response(
+        events.sse_stream(sub, bus, current_app.config.get("SSE_HEARTBEAT", 15)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@inventory_bp.route("/api/changes")
+@login_or_register_token_required
+def catalog_changes():
+    """
+    Products changed / deleted since ?since=<cursor> (omit for the whole catalogue); optional
+    limit=. Apply "deleted" before "products", then follow "cursor" until "more" is false.
+    410 means the cursor is too old: start again without one.
+    """
+    payload, err = changes.changes_since(request.args.get("since"), limit=request.args.get("limit", type=int))
+    if err:
+        return jsonify({"error": err}), 410 if err == changes.CURSOR_EXPIRED else 400
+    body = json.dumps(payload, separators=(",", ":"))
+    return current_app.response_class(body, mimetype="application/json", headers={"Cache-Control": "no-store"})
+
+
 # Categories CRUD (simple)
 @inventory_bp.route("/categories")
 @login_required
@@ -1,9 +1,11 @@
 """
 Main dashboard and home routes.
 """
-from flask import Blueprint, render_template, redirect, url_for
+import hmac
+from flask import Blueprint, render_template, redirect, url_for, abort, current_app, request, Response, jsonify
 from flask_login import current_user
-from app.utils.decorators import login_required
+from app.utils.decorators import login_required, manager_required
+from app.services import kpi_service as kpis
 
 main_bp = Blueprint("main", __name__)
 
@@ -18,4 +20,32 @@ def index():
 @main_bp.route("/dashboard")
 @login_required
 def dashboard():
-    return render_template("dashboard.html")
+    # Never waits on aggregation: a cold cache renders placeholders filled from dashboard_kpis
+    today = kpis.get_today_kpis(wait=False) if current_user.is_manager_or_above() else None
+    return render_template("dashboard.html", kpis=today)
+
+
+@main_bp.route("/dashboard/kpis")
+@login_required
+@manager_required
+def dashboard_kpis():
+    """Today's tiles, or 202 {"loading": true} while the refresher is still computing them."""
+    today = kpis.get_today_kpis(wait=False)
+    if today is None:
+        return jsonify({"loading": True}), 202, {"Retry-After": "1"}
+    return jsonify(today)
+
+
+@main_bp.route("/metrics")
+def metrics():
+    """Prometheus metrics for all workers; admins, or a scraper holding METRICS_TOKEN."""
+    from app.utils.metrics import merge_snapshots, read_snapshots, render_prometheus
+    registry = current_app.extensions.get("metrics")
+    if registry is None:
+        abort(404)
+    token = current_app.config.get("METRICS_TOKEN")
+    authorized = token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not authorized and not (current_user.is_authenticated and current_user.role == "admin"):
+        abort(403)
+    merged = merge_snapshots(read_snapshots(current_app, registry), registry.slow_statements)
+    return Response(render_prometheus(merged), mimetype="text/plain; version=0.0.4")
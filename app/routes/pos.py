@@ -1,33 +1,46 @@
 """
 POS: cart, checkout, receipt, refund.
 """
+import uuid
 from decimal import Decimal
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session, abort, Response, current_app
 from flask_login import current_user
-from app import db
-from app.utils.decorators import login_required, manager_required
+from app import csrf, db
+from app.utils.decorators import login_required, manager_required, register_token_required
 from app.utils.activity import log_activity
-from app.services.inventory_service import lookup_product
+from app.utils.money import from_cents, to_cents
+from app.services.inventory_service import lookup_product_cached, lookup_products_cached
 from app.services.billing_service import (
-    calculate_cart_totals,
     create_sale,
     create_refund,
     get_active_promotions,
 )
-from app.models.sale import Sale
-from app.config import Config
+from app.services import receipt_service as receipts
+from app.services import catalog_changes as changes
+from app.services import register_sync as registers
+from app.services import reservation_service as reservations
+from app.services.cart_store import get_cart_store
 
 pos_bp = Blueprint("pos", __name__)
 
-CART_KEY = "pos_cart"
+CART_HOLDER_KEY = "pos_cart_id"
+
+
+def get_cart_holder():
+    """Stable id for this session's cart; the cart and its stock reservations are keyed by it."""
+    holder = session.get(CART_HOLDER_KEY)
+    if not holder:
+        holder = uuid.uuid4().hex
+        session[CART_HOLDER_KEY] = holder
+    return holder
 
 
 def get_cart():
-    return session.get(CART_KEY) or []
+    return get_cart_store().load(get_cart_holder())
 
 
-def set_cart(cart):
-    session[CART_KEY] = cart
+def save_cart(cart):
+    get_cart_store().save(cart)
 
 
 @pos_bp.route("/")
@@ -37,36 +50,27 @@ def index():
     add_id = request.args.get("add_id", type=int)
     add_qty = request.args.get("add_qty", type=int) or 1
     if add_id:
-        product = lookup_product(add_id)
+        product = lookup_product_cached(add_id)
         if product and product.quantity >= 1:
             qty = max(1, min(add_qty, product.quantity))
             cart = get_cart()
-            existing = next((i for i in cart if i["product_id"] == product.id), None)
-            price = float(product.price)
-            if existing:
-                new_qty = existing["quantity"] + qty
-                if product.quantity < new_qty:
-                    flash(f"Insufficient stock for {product.name} (have {product.quantity}).", "warning")
-                    return redirect(url_for("pos.index"))
-                existing["quantity"] = new_qty
-                existing["subtotal"] = round(price * new_qty, 2)
-            else:
-                cart.append({
-                    "product_id": product.id,
-                    "name": product.name,
-                    "price": price,
-                    "quantity": qty,
-                    "subtotal": round(price * qty, 2),
-                })
-            set_cart(cart)
+            new_qty = cart.quantity_of(product.id) + qty
+            _, err = reservations.reserve(cart.cart_id, product.id, new_qty)
+            if err:
+                flash(f"{err}.", "warning")
+                return redirect(url_for("pos.index"))
+            cart.set_line(product.id, product.name, product.price, new_qty, product.category_id)
+            save_cart(cart)
             flash(f"Added {product.name} x{qty} to cart.", "success")
         else:
             flash("Product not found or out of stock.", "warning")
         return redirect(url_for("pos.index"))
     cart = get_cart()
-    totals = calculate_cart_totals(cart) if cart else {}
-    promotions = get_active_promotions()
-    return render_template("pos/index.html", cart=cart, totals=totals, promotions=promotions)
+    if cart:
+        _, err = reservations.touch(cart.cart_id, {line.product_id: line.quantity for line in cart})
+        if err:
+            flash(f"Cart reservation lapsed. {err}.", "warning")
+    return render_template("pos/index.html", cart=cart, totals=cart.totals())
 
 
 @pos_bp.route("/lookup", methods=["GET", "POST"])
@@ -83,7 +87,7 @@ def lookup():
             return jsonify({"success": False, "error": "Enter barcode, SKU, or product name"}), 400
         flash("Enter barcode, SKU, or product name to search.", "warning")
         return redirect(url_for("pos.index"))
-    product = lookup_product(identifier)
+    product = lookup_product_cached(identifier)
     if not product:
         if request.is_json:
             return jsonify({"success": False, "error": "Product not found"}), 404
@@ -116,7 +120,7 @@ def cart_add():
             return jsonify({"success": False, "error": "product_id required"}), 400
         flash("Product required.", "warning")
         return redirect(url_for("pos.index"))
-    product = lookup_product(product_id)
+    product = lookup_product_cached(product_id)
     if not product:
         if request.is_json:
             return jsonify({"success": False, "error": "Product not found"}), 404
@@ -125,40 +129,83 @@ def cart_add():
     qty = int(quantity)
     if qty <= 0:
         qty = 1
-    if product.quantity < qty:
+    cart = get_cart()
+    new_qty = cart.quantity_of(product.id) + qty
+    _, err = reservations.reserve(cart.cart_id, product.id, new_qty)
+    if err:
         if request.is_json:
-            return jsonify({"success": False, "error": f"Insufficient stock (have {product.quantity})"}), 400
-        flash(f"Insufficient stock for {product.name}.", "warning")
+            return jsonify({"success": False, "error": err}), 400
+        flash(f"{err}.", "warning")
         return redirect(url_for("pos.index"))
-    price = float(product.price)
-    subtotal = price * qty
-    cart = get_cart()
-    existing = next((i for i in cart if i["product_id"] == product.id), None)
-    if existing:
-        new_qty = existing["quantity"] + qty
-        if product.quantity < new_qty:
-            if request.is_json:
-                return jsonify({"success": False, "error": f"Insufficient stock (have {product.quantity})"}), 400
-            flash(f"Insufficient stock for {product.name}.", "warning")
-            return redirect(url_for("pos.index"))
-        existing["quantity"] = new_qty
-        existing["subtotal"] = round(price * new_qty, 2)
-    else:
-        cart.append({
-            "product_id": product.id,
-            "name": product.name,
-            "price": price,
-            "quantity": qty,
-            "subtotal": round(subtotal, 2),
-        })
-    set_cart(cart)
+    cart.set_line(product.id, product.name, product.price, new_qty, product.category_id)
+    save_cart(cart)
     if request.is_json:
-        totals = calculate_cart_totals(cart)
-        return jsonify({"success": True, "cart": cart, "totals": totals})
+        return jsonify({"success": True, "cart": cart.to_dicts(), "totals": cart.totals()})
     flash(f"Added {product.name} x{qty}.", "success")
     return redirect(url_for("pos.index"))
 
 
+@pos_bp.route("/cart/add-batch", methods=["POST"])
+@login_required
+def cart_add_batch():
+    """
+    Add many products in one request (scanner bursts, quick-add keys). JSON body:
+    {"items": [{"identifier": <id, SKU or barcode>, "quantity": 2}, "<barcode>", ...]}; a bare
+    identifier or a missing quantity counts 1, and "product_id" may stand in for "identifier".
+    Everything is looked up and reserved together: if any line is unknown or short of stock,
+    nothing is added and "errors" lists the failing lines by index.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "error": "items required"}), 400
+    max_items = current_app.config.get("POS_BATCH_MAX_ITEMS", 500)
+    if len(items) > max_items:
+        return jsonify({"success": False, "error": f"At most {max_items} items per request"}), 400
+    lines, errors = [], []
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            identifier = item.get("identifier", item.get("product_id"))
+            quantity = item.get("quantity", 1)
+        else:
+            identifier, quantity = item, 1
+        if not isinstance(identifier, (str, int)) or isinstance(identifier, bool):
+            errors.append({"index": index, "identifier": None, "error": "identifier required"})
+            continue
+        try:
+            qty = int(quantity)
+        except (TypeError, ValueError):
+            errors.append({"index": index, "identifier": identifier, "error": "Bad quantity"})
+            continue
+        lines.append((index, identifier, max(qty, 1)))
+    products = lookup_products_cached([identifier for _, identifier, _ in lines])
+    added, by_id = {}, {}
+    for index, identifier, qty in lines:
+        product = products.get(identifier)
+        if product is None:
+            errors.append({"index": index, "identifier": identifier, "error": "Product not found"})
+            continue
+        added[product.id] = added.get(product.id, 0) + qty
+        by_id[product.id] = product
+    if errors:
+        errors.sort(key=lambda e: e["index"])
+        return jsonify({"success": False, "error": f"{len(errors)} item(s) could not be added", "errors": errors}), 400
+    cart = get_cart()
+    _, err = reservations.reserve_many(cart.cart_id, {pid: cart.quantity_of(pid) + qty for pid, qty in added.items()})
+    if err:
+        return jsonify({"success": False, "error": err}), 400
+    for pid, qty in added.items():
+        product = by_id[pid]
+        cart.set_line(pid, product.name, product.price, cart.quantity_of(pid) + qty, product.category_id)
+    save_cart(cart)
+    return jsonify({
+        "success": True,
+        "added": [{"product_id": pid, "name": by_id[pid].name, "quantity": qty} for pid, qty in added.items()],
+        "cart": cart.to_dicts(),
+        "totals": cart.totals(),
+    })
+
+
 @pos_bp.route("/cart/update/<int:product_id>", methods=["POST"])
 @login_required
 def cart_update(product_id):
@@ -171,29 +218,29 @@ def cart_update(product_id):
         return redirect(url_for("pos.index"))
     qty = int(quantity)
     cart = get_cart()
-    item = next((i for i in cart if i["product_id"] == product_id), None)
-    if not item:
+    if product_id not in cart:
         if request.is_json:
             return jsonify({"success": False, "error": "Item not in cart"}), 404
         return redirect(url_for("pos.index"))
     if qty <= 0:
-        cart.remove(item)
-        set_cart(cart)
+        cart.remove(product_id)
+        reservations.release(cart.cart_id, product_id)
+        save_cart(cart)
         if request.is_json:
-            return jsonify({"success": True, "cart": get_cart(), "totals": calculate_cart_totals(get_cart())})
+            return jsonify({"success": True, "cart": cart.to_dicts(), "totals": cart.totals()})
         flash("Item removed from cart.", "info")
         return redirect(url_for("pos.index"))
-    product = lookup_product(product_id)
-    if not product or product.quantity < qty:
+    product = lookup_product_cached(product_id)
+    err = "Product not found" if not product else reservations.reserve(cart.cart_id, product.id, qty)[1]
+    if err:
         if request.is_json:
-            return jsonify({"success": False, "error": "Insufficient stock"}), 400
-        flash("Insufficient stock.", "warning")
+            return jsonify({"success": False, "error": err}), 400
+        flash(f"{err}.", "warning")
         return redirect(url_for("pos.index"))
-    item["quantity"] = qty
-    item["subtotal"] = round(float(product.price) * qty, 2)
-    set_cart(cart)
+    cart.set_line(product.id, product.name, product.price, qty, product.category_id)
+    save_cart(cart)
     if request.is_json:
-        return jsonify({"success": True, "cart": get_cart(), "totals": calculate_cart_totals(get_cart())})
+        return jsonify({"success": True, "cart": cart.to_dicts(), "totals": cart.totals()})
     flash("Quantity updated.", "success")
     return redirect(url_for("pos.index"))
 
@@ -201,10 +248,12 @@ def cart_update(product_id):
 @pos_bp.route("/cart/remove/<int:product_id>", methods=["POST"])
 @login_required
 def cart_remove(product_id):
-    cart = [i for i in get_cart() if i["product_id"] != product_id]
-    set_cart(cart)
+    cart = get_cart()
+    cart.remove(product_id)
+    reservations.release(cart.cart_id, product_id)
+    save_cart(cart)
     if request.is_json:
-        return jsonify({"success": True, "cart": cart, "totals": calculate_cart_totals(cart)})
+        return jsonify({"success": True, "cart": cart.to_dicts(), "totals": cart.totals()})
     flash("Item removed.", "info")
     return redirect(url_for("pos.index"))
 
@@ -212,7 +261,9 @@ def cart_remove(product_id):
 @pos_bp.route("/cart/clear", methods=["POST"])
 @login_required
 def cart_clear():
-    set_cart([])
+    holder = get_cart_holder()
+    reservations.release(holder)
+    get_cart_store().delete(holder)
     if request.is_json:
         return jsonify({"success": True, "cart": [], "totals": {}})
     flash("Cart cleared.", "info")
@@ -236,9 +287,8 @@ def checkout():
                 customer_id = None
         else:
             customer_id = None
-        discount_amount = request.form.get("discount_amount") or 0
         try:
-            discount_amount = float(discount_amount)
+            discount_amount = from_cents(to_cents(request.form.get("discount_amount")))
         except ValueError:
             discount_amount = 0
         promotion_id = request.form.get("promotion_id")
@@ -253,22 +303,23 @@ def checkout():
             loyalty_points_used = 0
         sale, err = create_sale(
             user_id=current_user.id,
-            cart_items=cart,
+            cart_items=cart.items(),
             payment_method=payment_method,
             customer_id=customer_id,
             discount_amount=discount_amount,
             loyalty_points_used=loyalty_points_used,
             promotion_id=promotion_id,
+            holder=cart.cart_id,
         )
         if err:
             flash(err, "danger")
             return redirect(url_for("pos.checkout"))
         log_activity("create", "sale", sale.id, f"Sale #{sale.id} total {sale.total}")
         db.session.commit()
-        set_cart([])
+        get_cart_store().delete(cart.cart_id)
         flash(f"Sale completed. Receipt #{sale.id}", "success")
         return redirect(url_for("pos.receipt", sale_id=sale.id))
-    totals = calculate_cart_totals(cart)
+    totals = cart.totals()
     promotions = get_active_promotions()
     from app.models.customer import Customer
     customers = Customer.query.order_by(Customer.name).all()
@@ -278,20 +329,29 @@ def checkout():
 @pos_bp.route("/receipt/<int:sale_id>")
 @login_required
 def receipt(sale_id):
-    sale = Sale.query.get(sale_id)
-    if not sale:
+    doc = receipts.get_receipt(sale_id)
+    if not doc:
         flash("Sale not found.", "danger")
         return redirect(url_for("pos.index"))
-    store_name = getattr(Config, "STORE_NAME", "Grocery Store")
-    store_address = getattr(Config, "STORE_ADDRESS", "")
-    store_phone = getattr(Config, "STORE_PHONE", "")
-    return render_template(
-        "pos/receipt.html",
-        sale=sale,
-        store_name=store_name,
-        store_address=store_address,
-        store_phone=store_phone,
-    )
+    return render_template("pos/receipt.html", receipt=doc)
+
+
+@pos_bp.route("/receipt/<int:sale_id>.txt")
+@login_required
+def receipt_text(sale_id):
+    doc = receipts.get_receipt(sale_id)
+    if not doc:
+        abort(404)
+    return Response(doc.text, mimetype="text/plain; charset=utf-8")
+
+
+@pos_bp.route("/receipt/<int:sale_id>.pdf")
+@login_required
+def receipt_pdf(sale_id):
+    pdf = receipts.get_receipt_pdf(sale_id)
+    if pdf is None:
+        abort(404)
+    return Response(pdf, mimetype="application/pdf", headers={"Content-Disposition": f"inline; filename=receipt_{sale_id}.pdf"})
 
 
 @pos_bp.route("/refund", methods=["GET", "POST"])
@@ -318,3 +378,29 @@ def refund():
         flash(f"Refund processed. Refund # {refund_sale.id}", "success")
         return redirect(url_for("pos.receipt", sale_id=refund_sale.id))
     return render_template("pos/refund.html")
+
+
+@pos_bp.route("/api/register/catalog")
+@register_token_required
+def register_catalog():
+    """Catalogue changes for an offline till (see app.services.register_sync)."""
+    payload, err = registers.catalog_page(
+        after=request.args.get("after"),
+        reference_etag=request.args.get("reference_etag"),
+        limit=request.args.get("limit", type=int),
+    )
+    if err:
+        return jsonify({"error": err}), 410 if err == changes.CURSOR_EXPIRED else 400
+    return jsonify(payload)
+
+
+@pos_bp.route("/api/register/sales", methods=["POST"])
+@csrf.exempt
+@register_token_required
+def register_sales():
+    """Idempotent batch upload of an offline till's sales."""
+    data = request.get_json(silent=True) or {}
+    results, err = registers.apply_register_sales(data.get("register_id"), data.get("sales"))
+    if err:
+        return jsonify({"error": err}), 400
+    return jsonify({"results": results})
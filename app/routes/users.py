@@ -5,10 +5,10 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import current_user
 from app import db
 from app.models.user import User
-from app.models.activity_log import ActivityLog
 from app.models.shift import Shift
 from app.utils.decorators import login_required, admin_required
 from app.utils.activity import log_activity
+from app.services import activity_log_service as activity
 
 users_bp = Blueprint("users", __name__)
 
@@ -81,9 +81,21 @@ def user_edit(user_id):
 @login_required
 @admin_required
 def activity_log():
-    page = request.args.get("page", 1, type=int)
-    pagination = ActivityLog.query.order_by(ActivityLog.created_at.desc()).paginate(page=page, per_page=50, error_out=False)
-    return render_template("users/activity_log.html", pagination=pagination)
+    """Newest-first log with keyset paging (?after= / ?before= cursors) and optional filters."""
+    filters = {
+        "user_id": request.args.get("user_id", type=int),
+        "action": (request.args.get("action") or "").strip() or None,
+        "entity_type": (request.args.get("entity_type") or "").strip() or None,
+        "entity_id": request.args.get("entity_id", type=int),
+    }
+    pagination = activity.activity_page(after=request.args.get("after"), before=request.args.get("before"), **filters)
+    filters = {k: v for k, v in filters.items() if v is not None}
+    return render_template(
+        "users/activity_log.html",
+        pagination=pagination,
+        filters=filters,
+        users=User.query.order_by(User.username).all(),
+    )
 
 
 @users_bp.route("/shifts")
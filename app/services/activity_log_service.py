@@ -0,0 +1,184 @@
+"""
+Activity log browsing and retention.
+
+The log viewer pages newest-first with a keyset cursor on (created_at, id) (app.utils.pagination)
+instead of COUNT(*) + OFFSET, so every page costs one index range scan however deep it is. Filters by user,
+action and entity each have a matching (filter, created_at, id) index.
+
+On PostgreSQL activity_logs is range-partitioned by month (migration c1e6f0a2b8d9), with
+partitions named activity_logs_yYYYYmMM and a DEFAULT partition for anything outside them.
+ensure_partitions() creates the coming months; archive_activity() writes months older than
+the retention window to gzipped JSON Lines files and then drops their partitions (or deletes the
+rows, on SQLite or an unpartitioned table).
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date
+from flask import current_app
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.activity_log import ActivityLog
+from app.utils.pagination import paginate
+
+PARTITION_NAME = re.compile(r"^activity_logs_y(\d{4})m(\d{2})$")
+ARCHIVE_COLUMNS = ("id", "user_id", "action", "entity_type", "entity_id", "details", "ip_address", "created_at")
+
+
+def activity_page(user_id=None, action=None, entity_type=None, entity_id=None,
+                  after=None, before=None, per_page=50):
+    """A newest-first Page of logs; after / before are cursors from the neighbouring page."""
+    query = ActivityLog.query.options(joinedload(ActivityLog.user))
+    if user_id:
+        query = query.filter(ActivityLog.user_id == user_id)
+    if action:
+        query = query.filter(ActivityLog.action == action)
+    if entity_type:
+        query = query.filter(ActivityLog.entity_type == entity_type)
+        if entity_id:
+            query = query.filter(ActivityLog.entity_id == entity_id)
+    return paginate(query, (ActivityLog.created_at, ActivityLog.id), after=after, before=before,
+                    per_page=per_page, descending=True)
+
+
+def _month_start(day, offset=0):
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def is_partitioned():
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'activity_logs' AND pg_table_is_visible(c.oid)"
+    )).first() is not None
+
+
+def _partitions():
+    """{month start: partition name} for the monthly partitions of activity_logs."""
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'activity_logs'"
+    )).scalars()
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create monthly partitions from the current month through `months_ahead` more (default
+    ACTIVITY_LOG_PARTITIONS_AHEAD). Rows already in the DEFAULT partition for a new month are
+    moved into it. Returns the names created; no-op unless activity_logs is partitioned.
+    """
+    if months_ahead is None:
+        months_ahead = current_app.config.get("ACTIVITY_LOG_PARTITIONS_AHEAD", 3)
+    if not is_partitioned():
+        return []
+    existing = _partitions()
+    created = []
+    this_month = _month_start(date.today())
+    for offset in range(months_ahead + 1):
+        start, end = _month_start(this_month, offset), _month_start(this_month, offset + 1)
+        if start in existing:
+            continue
+        name = f"activity_logs_y{start.year:04d}m{start.month:02d}"
+        bounds = {"start": start, "end": end}
+        db.session.execute(text(f"CREATE TABLE {name} (LIKE activity_logs INCLUDING DEFAULTS)"))
+        db.session.execute(text(
+            f"WITH moved AS (DELETE FROM activity_logs_default WHERE created_at >= :start AND created_at < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), bounds)
+        db.session.execute(text(
+            f"ALTER TABLE activity_logs ATTACH PARTITION {name} FOR VALUES FROM (:start) TO (:end)"
+        ), bounds)
+        db.session.commit()
+        created.append(name)
+    return created
+
+
+def _archive_path(out_dir, label):
+    base = os.path.join(out_dir, f"activity_logs_{label}")
+    path, n = f"{base}.jsonl.gz", 1
+    while os.path.exists(path):
+        n += 1
+        path = f"{base}.{n}.jsonl.gz"
+    return path
+
+
+def _write_archive(out_dir, label, statement):
+    """Stream the rows of `statement` into a gzipped JSON Lines file. Returns (path, rows); no file for no rows."""
+    path = _archive_path(out_dir, label)
+    tmp_path = path + ".part"
+    rows = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+        result = db.session.execute(statement, execution_options={"stream_results": True, "yield_per": 5000})
+        for row in result:
+            record = dict(zip(ARCHIVE_COLUMNS, row))
+            record["created_at"] = record["created_at"].isoformat()
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+            rows += 1
+    if not rows:
+        os.remove(tmp_path)
+        return None, 0
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path, rows
+
+
+def archive_activity(retention_months=None, out_dir=None, dry_run=False):
+    """
+    Archive whole months older than `retention_months` (default ACTIVITY_LOG_RETENTION_MONTHS)
+    to out_dir (default ACTIVITY_LOG_ARCHIVE_DIR or instance/activity_archive), then drop them.
+    Returns ([(month, path, rows)], error).
+    """
+    if retention_months is None:
+        retention_months = current_app.config.get("ACTIVITY_LOG_RETENTION_MONTHS", 12)
+    if retention_months < 1:
+        return [], "Retention must be at least one month"
+    out_dir = (out_dir or current_app.config.get("ACTIVITY_LOG_ARCHIVE_DIR")
+               or os.path.join(current_app.instance_path, "activity_archive"))
+    cutoff = _month_start(date.today(), -retention_months)
+    columns = [getattr(ActivityLog, c) for c in ARCHIVE_COLUMNS]
+    partitioned = is_partitioned()
+    if partitioned:
+        months = sorted(m for m in _partitions() if m < cutoff)
+    else:
+        oldest = db.session.execute(select(db.func.min(ActivityLog.created_at))).scalar()
+        months = []
+        month = _month_start(oldest) if oldest else cutoff
+        while month < cutoff:
+            months.append(month)
+            month = _month_start(month, 1)
+    if dry_run:
+        db.session.rollback()
+        return [(m, None, None) for m in months], None
+    os.makedirs(out_dir, exist_ok=True)
+    archived = []
+    for month in months:
+        end = _month_start(month, 1)
+        in_month = (ActivityLog.created_at >= month, ActivityLog.created_at < end)
+        path, rows = _write_archive(out_dir, f"{month:%Y-%m}", select(*columns).where(*in_month).order_by(ActivityLog.id))
+        if partitioned:
+            name = f"activity_logs_y{month.year:04d}m{month.month:02d}"
+            db.session.execute(text(f"ALTER TABLE activity_logs DETACH PARTITION {name}"))
+            db.session.execute(text(f"DROP TABLE {name}"))
+        else:
+            db.session.execute(delete(ActivityLog).where(*in_month))
+        db.session.commit()
+        if rows or partitioned:
+            archived.append((month, path, rows))
+    # Rows that landed in the DEFAULT partition (clock skew, missing partitions) are archived too
+    if partitioned and db.session.execute(select(ActivityLog.id).where(ActivityLog.created_at < cutoff).limit(1)).first():
+        path, rows = _write_archive(out_dir, f"before-{cutoff:%Y-%m}", select(*columns).where(ActivityLog.created_at < cutoff))
+        db.session.execute(delete(ActivityLog).where(ActivityLog.created_at < cutoff))
+        db.session.commit()
+        archived.append((None, path, rows))
+    return archived, None
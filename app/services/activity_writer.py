@@ -0,0 +1,245 @@
+"""
+Asynchronous activity log writer (ACTIVITY_LOG_MODE=async).
+
+log_activity() keeps its API. In async mode the record is captured at call time (user, IP,
+timestamp) and parked on the session; when the caller's transaction commits it goes to a
+bounded in-memory queue instead of adding an INSERT to that transaction (rolled-back work is not
+logged, as before). A background thread writes the queue with multi-row INSERTs every
+ACTIVITY_LOG_BATCH_SIZE records or ACTIVITY_LOG_FLUSH_MS milliseconds.
+
+When the database is unavailable, or the queue is full, records are appended to a JSON Lines
+spill file under ACTIVITY_LOG_SPILL_DIR (one file per process) and replayed once inserts work
+again, or with `flask activity-replay`. A process replays its own file and those of processes
+that have exited, never a live process's file, which that process may be appending to. The queue
+is flushed at interpreter exit.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert
+from app import db
+from app.models.activity_log import ActivityLog
+from app.utils.process import pid_alive
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "activity_log_pending"
+REPLAY_INTERVAL = 30.0  # seconds between attempts to replay spill files
+
+
+def _encode(record):
+    return json.dumps(dict(record, created_at=record["created_at"].isoformat()), separators=(",", ":"))
+
+
+def _decode(line):
+    record = json.loads(line)
+    record["created_at"] = datetime.fromisoformat(record["created_at"])
+    return record
+
+
+class ActivityLogWriter:
+    """Bounded queue of activity records drained by one daemon thread with batched INSERTs."""
+
+    def __init__(self, app, queue_size=10000, batch_size=200, flush_ms=500, spill_dir=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.spill_dir = spill_dir or os.path.join(app.instance_path, "activity_spill")
+        self.spill_path = os.path.join(self.spill_dir, f"activity-{os.getpid()}.jsonl")
+        self._queue = queue.Queue(queue_size)
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_replay = 0.0
+        self.written = 0
+        self.spilled = 0
+
+    def submit(self, records):
+        """Queue records for writing; spills them to disk instead of blocking when the queue is full."""
+        self._ensure_thread()
+        overflow = []
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                overflow.append(record)
+        if overflow:
+            self._spill(overflow)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+                self._thread.start()
+
+    def _take_batch(self, timeout):
+        """Up to batch_size records, waiting at most `timeout` seconds after the first one."""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(timeout=self.flush_interval)
+            if batch:
+                self._write(batch)
+            if time.monotonic() - self._last_replay > REPLAY_INTERVAL:
+                self._last_replay = time.monotonic()
+                self.replay()
+        self.flush()
+
+    def _insert(self, records):
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(insert(ActivityLog), records)
+
+    def _write(self, batch):
+        try:
+            self._insert(batch)
+            self.written += len(batch)
+        except Exception:
+            logger.warning("Could not write %d activity log record(s); spilling to disk", len(batch), exc_info=True)
+            self._spill(batch)
+
+    def _spill(self, records):
+        try:
+            with self._spill_lock:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                with open(self.spill_path, "a", encoding="utf-8") as out:
+                    out.write("".join(_encode(r) + "\n" for r in records))
+                    out.flush()
+                    os.fsync(out.fileno())
+            self.spilled += len(records)
+        except OSError:
+            logger.exception("Lost %d activity log record(s): spill file not writable", len(records))
+
+    def replay(self):
+        """
+        Insert records from this process's spill file and those of exited processes, deleting each
+        file once it is written. A file is claimed by renaming it, so concurrent replays never
+        double-insert. Returns the number of records written.
+        """
+        total = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "activity-*.jsonl"))):
+            if path != self.spill_path and not self._orphaned(path):
+                continue  # its process is alive and may be appending
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                with self._spill_lock:
+                    os.replace(path, claimed)
+            except OSError:
+                continue  # another process got it first
+            try:
+                with open(claimed, encoding="utf-8") as src:
+                    records = [_decode(line) for line in src if line.strip()]
+                for start in range(0, len(records), self.batch_size):
+                    self._insert(records[start:start + self.batch_size])
+            except Exception:
+                # Put the file back for the next attempt; a partial replay may repeat a batch
+                logger.warning("Could not replay %s; will retry", path, exc_info=True)
+                with self._spill_lock, open(claimed, encoding="utf-8") as src, \
+                        open(self.spill_path, "a", encoding="utf-8") as out:
+                    out.write(src.read())
+                os.remove(claimed)
+                break
+            os.remove(claimed)
+            total += len(records)
+        self.written += total
+        return total
+
+    @staticmethod
+    def _orphaned(path):
+        try:
+            pid = int(os.path.basename(path)[len("activity-"):-len(".jsonl")])
+        except ValueError:
+            return False
+        return not pid_alive(pid)
+
+    def flush(self):
+        """Write everything queued so far on the calling thread (shutdown, tests, CLI)."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the writer thread and flush the queue."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+def init_activity_log(app):
+    """Create the async writer when ACTIVITY_LOG_MODE is "async"; None keeps synchronous logging."""
+    mode = app.config.get("ACTIVITY_LOG_MODE", "sync")
+    if mode == "sync":
+        app.extensions["activity_writer"] = None
+        return None
+    if mode != "async":
+        raise ValueError(f"Unknown ACTIVITY_LOG_MODE: {mode}")
+    writer = ActivityLogWriter(
+        app,
+        queue_size=app.config.get("ACTIVITY_LOG_QUEUE_SIZE", 10000),
+        batch_size=app.config.get("ACTIVITY_LOG_BATCH_SIZE", 200),
+        flush_ms=app.config.get("ACTIVITY_LOG_FLUSH_MS", 500),
+        spill_dir=app.config.get("ACTIVITY_LOG_SPILL_DIR"),
+    )
+    app.extensions["activity_writer"] = writer
+    atexit.register(writer.stop)
+    return writer
+
+
+def get_activity_writer():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("activity_writer")
+
+
+def write_after_commit(record):
+    """Park a record on the current session; it is handed to the writer when the session commits."""
+    db.session.info.setdefault(_PENDING_KEY, []).append(record)
+
+
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    records = session.info.pop(_PENDING_KEY, None)
+    if not records:
+        return
+    writer = get_activity_writer()
+    if writer is not None:
+        writer.submit(records)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
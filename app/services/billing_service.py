@@ -1,14 +1,25 @@
 """
 Billing / POS: cart totals, tax, discount, checkout, refund.
+
+Totals are computed in integer cents (app.utils.money) and returned as Decimals.
 """
 from decimal import Decimal
 from datetime import datetime
+from sqlalchemy import case, func, insert, select, update
 from app import db
 from app.models.product import Product
 from app.models.sale import Sale, SaleItem
 from app.models.customer import Customer
-from app.models.promotion import Promotion
 from app.config import Config
+from app.services import reservation_service as reservations
+from app.services import receipt_service as receipts
+from app.services import rollup_service as rollups
+from app.services import kpi_service as kpis
+from app.services import event_bus as events
+from app.services import promotion_engine as promotions
+from app.services import register_sync as registers
+from app.services.cart_store import CartLine
+from app.utils.money import apply_ratio, from_cents, ratio, to_cents
 
 
 def get_tax_rate():
@@ -29,37 +40,116 @@ def apply_promotion(subtotal, promotion=None):
     return discount, subtotal - discount
 
 
-def calculate_cart_totals(cart_items, discount_amount=None, promotion_id=None):
+def calculate_cart_totals(cart_items, discount_amount=None, promotion_id=None, apply_promotions=True):
+    """
+    cart_items: CartLine objects or dicts {product_id, name, price, quantity[, category_id]}
+    Returns dict: subtotal, tax_amount, discount_amount, total, promotions.
+    apply_promotions=False prices the lines as they are (refunds).
+    """
+    lines = [CartLine.coerce(item) for item in cart_items]
+    return totals_for_cents(sum(line.subtotal_cents for line in lines), discount_amount=discount_amount,
+                            promotion_id=promotion_id, lines=lines if apply_promotions else None)
+
+
+def totals_for_cents(subtotal_cents, discount_amount=None, promotion_id=None, lines=None):
     """
-    cart_items: list of {product_id, name, price, quantity, subtotal}
-    Returns dict: subtotal, tax_amount, discount_amount, total.
+    Discount, tax and total for an already-summed cart subtotal in cents. With the cart `lines`
+    (CartLine), automatic item/category/basket promotions are applied too (promotion_engine, no
+    DB access). A selected promotion that applies replaces the manual discount_amount.
     """
-    subtotal = sum(Decimal(str(item["subtotal"])) for item in cart_items)
-    discount = Decimal(str(discount_amount or 0))
-    if promotion_id:
-        promo = Promotion.query.get(promotion_id)
-        if promo and promo.is_valid_now() and (promo.min_purchase or 0) <= subtotal:
-            d, _ = apply_promotion(subtotal, promo)
-            discount = d
-    after_discount = subtotal - discount
-    tax = (after_discount * get_tax_rate()).quantize(Decimal("0.01"))
-    total = after_discount + tax
+    discount = to_cents(discount_amount)
+    applied = []
+    if lines is not None or promotion_id:
+        promo_discount, applied = promotions.active_promotions().price(lines or (), subtotal_cents, promotion_id)
+        if promotion_id and any(a["id"] == promotion_id for a in applied):
+            discount = promo_discount
+        else:
+            discount = min(discount + promo_discount, subtotal_cents)
+    after_discount = subtotal_cents - discount
+    tax = apply_ratio(after_discount, ratio(getattr(Config, "TAX_RATE", 0.08)))
     return {
-        "subtotal": subtotal,
-        "tax_amount": tax,
-        "discount_amount": discount,
-        "total": total,
+        "subtotal": from_cents(subtotal_cents),
+        "tax_amount": from_cents(tax),
+        "discount_amount": from_cents(discount),
+        "total": from_cents(after_discount + tax),
+        "promotions": [{"id": a["id"], "name": a["name"], "amount": from_cents(a["cents"])} for a in applied],
     }
 
 
+def _decrement_stock(wanted, holder=None):
+    """
+    Decrement stock for {product_id: qty} with one conditional UPDATE. Units reserved by
+    other open carts are not sellable. Returns (short_ids, remaining): the product ids that fell
+    short and, where the database reports it, {product_id: quantity left}.
+    """
+    qty_case = case(wanted, value=Product.id)
+    stmt = (
+        update(Product)
+        .where(
+            Product.id.in_(list(wanted)),
+            Product.quantity - reservations.reserved_by_others_clause(holder) >= qty_case,
+        )
+        .values(quantity=Product.quantity - qty_case)
+        .execution_options(synchronize_session=False, changed_product_ids=list(wanted))
+    )
+    if db.engine.dialect.update_returning:
+        remaining = dict(db.session.execute(stmt.returning(Product.id, Product.quantity)).all())
+        return set(wanted) - set(remaining), remaining
+    result = db.session.execute(stmt)
+    if result.rowcount == len(wanted):
+        return set(), {}
+    # No RETURNING support: roll back the partial decrement, then look up which lines fell short
+    db.session.rollback()
+    rows = db.session.execute(
+        select(Product.id, Product.quantity).where(Product.id.in_(list(wanted)))
+    ).all()
+    return {r.id for r in rows if r.quantity < wanted[r.id]} or set(wanted), {}
+
+
+def _restore_stock(restock):
+    """
+    Add {product_id: qty} back to stock with one relative UPDATE (never an absolute SET of a
+    value read earlier). Returns {product_id: quantity after}.
+    """
+    stmt = (
+        update(Product)
+        .where(Product.id.in_(list(restock)))
+        .values(quantity=Product.quantity + case(restock, value=Product.id))
+        .execution_options(synchronize_session=False, changed_product_ids=list(restock))
+    )
+    if db.engine.dialect.update_returning:
+        return dict(db.session.execute(stmt.returning(Product.id, Product.quantity)).all())
+    db.session.execute(stmt)
+    return dict(db.session.execute(select(Product.id, Product.quantity).where(Product.id.in_(list(restock)))).all())
+
+
 def create_sale(user_id, cart_items, payment_method, customer_id=None, discount_amount=0,
-                 loyalty_points_used=0, promotion_id=None):
+                 loyalty_points_used=0, promotion_id=None, holder=None):
     """
     Create Sale and SaleItems, reduce product quantities. Returns (sale, error_message).
+    Runs a constant number of statements regardless of basket size: one product fetch,
+    one sale insert, one conditional stock UPDATE, one bulk sale-item insert, the daily
+    rollup upserts and the rendered receipt insert.
+    holder: reservation holder (cart id) whose reserved stock this sale consumes.
     """
     if not cart_items:
         return None, "Cart is empty"
-    totals = calculate_cart_totals(cart_items, discount_amount=discount_amount, promotion_id=promotion_id)
+    lines = [CartLine.coerce(item) for item in cart_items]
+    wanted = {}
+    for line in lines:
+        wanted[line.product_id] = wanted.get(line.product_id, 0) + line.quantity
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(list(wanted))).all()}
+    for line in lines:
+        if line.product_id not in products:
+            db.session.rollback()
+            return None, f"Product {line.name} not found"
+    short = [products[pid] for pid, qty in wanted.items() if products[pid].quantity < qty]
+    if short:
+        db.session.rollback()
+        return None, _insufficient_stock_message(short)
+    totals = calculate_cart_totals(lines, discount_amount=discount_amount, promotion_id=promotion_id)
+    loyalty_earned = sum(wanted.values())  # simple: 1 point per item (customize as needed)
+    client_ref, register_id = registers.sale_tags()
     sale = Sale(
         user_id=user_id,
         customer_id=customer_id,
@@ -69,33 +159,53 @@ def create_sale(user_id, cart_items, payment_method, customer_id=None, discount_
         total=totals["total"],
         payment_method=payment_method,
         loyalty_points_used=loyalty_points_used,
+        loyalty_points_earned=loyalty_earned,
+        client_ref=client_ref,
+        register_id=register_id,
     )
     db.session.add(sale)
     db.session.flush()
-    loyalty_earned = 0
-    for item in cart_items:
-        product = Product.query.get(item["product_id"])
-        if not product:
-            db.session.rollback()
-            return None, f"Product {item.get('name')} not found"
-        qty = int(item["quantity"])
-        if product.quantity < qty:
-            db.session.rollback()
-            return None, f"Insufficient stock for {product.name} (have {product.quantity})"
-        unit_price = Decimal(str(item["price"]))
-        subtotal = unit_price * qty
-        db.session.add(SaleItem(sale_id=sale.id, product_id=product.id, quantity=qty, unit_price=unit_price, subtotal=subtotal))
-        product.quantity -= qty
-        loyalty_earned += int(qty)  # simple: 1 point per item (customize as needed)
-    sale.loyalty_points_earned = loyalty_earned
+    short_ids, remaining = _decrement_stock(wanted, holder)
+    if short_ids:
+        db.session.rollback()
+        current = Product.query.filter(Product.id.in_(list(short_ids))).order_by(Product.name).all()
+        return None, _insufficient_stock_message(current)
+    for pid, qty in wanted.items():
+        p = products[pid]
+        left = remaining.get(pid, p.quantity - qty)
+        events.stock_changed(pid, p.name, left + qty, left, p.min_stock)
+    sale_items = [{
+        "sale_id": sale.id,
+        "product_id": line.product_id,
+        "quantity": line.quantity,
+        "unit_price": line.price,
+        "subtotal": line.subtotal,
+    } for line in lines]
+    db.session.execute(insert(SaleItem), sale_items)
+    rollups.record_sale(sale, sale_items)
+    kpis.mark_changed()
+    receipts.record_receipt(sale, [
+        {"name": products[si["product_id"]].name, "quantity": si["quantity"], "unit_price": si["unit_price"], "subtotal": si["subtotal"]}
+        for si in sale_items
+    ])
     if customer_id:
-        cust = Customer.query.get(customer_id)
-        if cust:
-            cust.loyalty_points = (cust.loyalty_points or 0) - loyalty_points_used + loyalty_earned
+        db.session.execute(
+            update(Customer)
+            .where(Customer.id == customer_id)
+            .values(loyalty_points=func.coalesce(Customer.loyalty_points, 0) - loyalty_points_used + loyalty_earned)
+            .execution_options(synchronize_session=False)
+        )
+    if holder:
+        reservations.release(holder, commit=False)
     db.session.commit()
+    registers.sale_recorded()
     return sale, None
 
 
+def _insufficient_stock_message(products):
+    return "Insufficient stock for " + "; ".join(f"{p.name} (have {p.quantity})" for p in products)
+
+
 def create_refund(sale_id, user_id, items_to_refund=None, full_refund=True):
     """
     items_to_refund: list of {product_id, quantity}. If full_refund=True, refund all.
@@ -108,26 +218,29 @@ def create_refund(sale_id, user_id, items_to_refund=None, full_refund=True):
         items_to_refund = [{"product_id": si.product_id, "quantity": si.quantity} for si in sale.items]
     if not items_to_refund:
         return None, "Nothing to refund"
-    cart_items = []
+    sold = {si.product_id: si for si in sale.items}
+    products = {
+        row.id: row for row in db.session.execute(
+            select(Product.id, Product.name, Product.min_stock).where(Product.id.in_(list(sold)))
+        )
+    }
+    cart_items, restock = [], {}
     for ref in items_to_refund:
-        si = next((x for x in sale.items if x.product_id == ref["product_id"]), None)
-        if not si:
+        si = sold.get(ref["product_id"])
+        if not si or si.product_id not in products:
             return None, f"Product {ref['product_id']} not in original sale"
         qty = min(int(ref["quantity"]), si.quantity)
         if qty <= 0:
             continue
-        product = Product.query.get(si.product_id)
-        product.quantity += qty
-        cart_items.append({
-            "product_id": product.id,
-            "name": product.name,
-            "price": str(si.unit_price),
-            "quantity": qty,
-            "subtotal": str(si.unit_price * qty),
-        })
+        restock[si.product_id] = restock.get(si.product_id, 0) + qty
+        cart_items.append(CartLine(si.product_id, products[si.product_id].name, to_cents(si.unit_price), qty))
     if not cart_items:
         return None, "No valid items to refund"
-    totals = calculate_cart_totals(cart_items)
+    for pid, after in _restore_stock(restock).items():
+        p = products[pid]
+        events.stock_changed(pid, p.name, after - restock[pid], after, p.min_stock)
+    totals = calculate_cart_totals(cart_items, apply_promotions=False)
+    client_ref, register_id = registers.sale_tags()
     refund_sale = Sale(
         user_id=user_id,
         customer_id=sale.customer_id,
@@ -136,23 +249,30 @@ def create_refund(sale_id, user_id, items_to_refund=None, full_refund=True):
         discount_amount=Decimal(0),
         total=-totals["total"],
         payment_method="refund",
+        client_ref=client_ref,
+        register_id=register_id,
     )
     db.session.add(refund_sale)
     db.session.flush()
-    for item in cart_items:
+    for line in cart_items:
         db.session.add(SaleItem(
             sale_id=refund_sale.id,
-            product_id=item["product_id"],
-            quantity=item["quantity"],
-            unit_price=Decimal(item["price"]),
-            subtotal=Decimal(item["subtotal"]),
+            product_id=line.product_id,
+            quantity=line.quantity,
+            unit_price=line.price,
+            subtotal=line.subtotal,
         ))
+    rollups.record_sale(refund_sale, [line.to_dict() for line in cart_items])
+    kpis.mark_changed()
+    receipts.record_receipt(refund_sale, [
+        {"name": line.name, "quantity": line.quantity, "unit_price": line.price, "subtotal": line.subtotal}
+        for line in cart_items
+    ])
     db.session.commit()
+    registers.sale_recorded()
     return refund_sale, None
 
 
 def get_active_promotions():
-    return Promotion.query.filter_by(active=True).filter(
-        (Promotion.valid_from.is_(None)) | (Promotion.valid_from <= datetime.utcnow()),
-        (Promotion.valid_to.is_(None)) | (Promotion.valid_to >= datetime.utcnow()),
-    ).all()
+    """Promotions a cashier can select at checkout (automatic ones apply by themselves)."""
+    return promotions.active_promotions().selectable
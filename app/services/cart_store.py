@@ -0,0 +1,232 @@
+"""
+Server-side POS cart store: carts keyed by register/session cart id instead of the cookie session.
+
+Backends: MemoryCartStore (per-process LRU, for single-worker registers) and SqlCartStore
+(pos_carts table, shared across gunicorn workers). Pick one with CART_STORE.
+"""
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import delete
+from app import db
+from app.models.cart import PosCart
+from app.utils.money import from_cents, to_cents
+
+
+class CartLine:
+    """
+    One cart line; money in integer cents (app.utils.money). Stored compactly as
+    [product_id, name, price_cents, quantity, category_id]; price / subtotal are Decimals for
+    templates and to_dict() is the JSON shape.
+    """
+
+    __slots__ = ("product_id", "name", "price_cents", "quantity", "category_id")
+
+    def __init__(self, product_id, name, price_cents, quantity, category_id=None):
+        self.product_id = product_id
+        self.name = name
+        self.price_cents = price_cents
+        self.quantity = quantity
+        self.category_id = category_id  # for category promotions
+
+    @property
+    def subtotal_cents(self):
+        return self.price_cents * self.quantity
+
+    @property
+    def price(self):
+        return from_cents(self.price_cents)
+
+    @property
+    def subtotal(self):
+        return from_cents(self.subtotal_cents)
+
+    def pack(self):
+        return [self.product_id, self.name, self.price_cents, self.quantity, self.category_id]
+
+    def to_dict(self):
+        return {
+            "product_id": self.product_id,
+            "name": self.name,
+            "price": self.price,
+            "quantity": self.quantity,
+            "subtotal": self.subtotal,
+            "category_id": self.category_id,
+        }
+
+    @classmethod
+    def coerce(cls, data):
+        """A CartLine from a line, its packed list or a dict {product_id, name, price, quantity[, category_id]}."""
+        if isinstance(data, cls):
+            return data
+        if isinstance(data, (list, tuple)):
+            return cls(*data)
+        category_id = data.get("category_id")
+        return cls(
+            int(data["product_id"]),
+            data.get("name"),
+            data["price_cents"] if "price_cents" in data else to_cents(data["price"]),
+            int(data["quantity"]),
+            int(category_id) if category_id is not None else None,
+        )
+
+    def __repr__(self):
+        return f"<CartLine {self.product_id} x{self.quantity} @{self.price_cents}c>"
+
+
+class Cart:
+    """
+    Cart lines keyed by product id, with a running subtotal in cents. Iterating yields CartLine
+    objects in the order they were added.
+    """
+
+    def __init__(self, cart_id, lines=None):
+        self.cart_id = cart_id
+        self._lines = {}
+        self.subtotal_cents = 0
+        for line in lines or ():
+            line = CartLine.coerce(line)
+            self._lines[line.product_id] = line
+            self.subtotal_cents += line.subtotal_cents
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __contains__(self, product_id):
+        return product_id in self._lines
+
+    @property
+    def subtotal(self):
+        return from_cents(self.subtotal_cents)
+
+    def get(self, product_id):
+        return self._lines.get(product_id)
+
+    def quantity_of(self, product_id):
+        line = self._lines.get(product_id)
+        return line.quantity if line else 0
+
+    def set_line(self, product_id, name, price, quantity, category_id=None):
+        """Set a line to an absolute quantity (<= 0 removes it); price is a Decimal amount."""
+        if quantity <= 0:
+            return self.remove(product_id)
+        line = self._lines.get(product_id)
+        if line:
+            self.subtotal_cents -= line.subtotal_cents
+            line.price_cents, line.quantity, line.category_id = to_cents(price), quantity, category_id
+        else:
+            line = self._lines[product_id] = CartLine(product_id, name, to_cents(price), quantity, category_id)
+        self.subtotal_cents += line.subtotal_cents
+        return line
+
+    def remove(self, product_id):
+        line = self._lines.pop(product_id, None)
+        if line:
+            self.subtotal_cents -= line.subtotal_cents
+        return None
+
+    def clear(self):
+        self._lines.clear()
+        self.subtotal_cents = 0
+
+    def items(self):
+        return list(self._lines.values())
+
+    def to_dicts(self):
+        """Lines in their JSON shape, for API responses."""
+        return [line.to_dict() for line in self._lines.values()]
+
+    def totals(self, discount_amount=None, promotion_id=None):
+        """Same dict as calculate_cart_totals, from the running subtotal ({} when empty)."""
+        if not self._lines:
+            return {}
+        from app.services.billing_service import totals_for_cents
+        return totals_for_cents(self.subtotal_cents, discount_amount=discount_amount, promotion_id=promotion_id,
+                                lines=self._lines.values())
+
+    def to_json(self):
+        return json.dumps([line.pack() for line in self._lines.values()], separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, cart_id, data):
+        """Packed lines, or the line dicts of carts saved before money moved to cents."""
+        return cls(cart_id, json.loads(data) if data else None)
+
+
+class MemoryCartStore:
+    """In-process LRU of Cart objects. Carts are lost on restart and not shared between workers."""
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._carts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, cart_id):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            if cart is not None:
+                self._carts.move_to_end(cart_id)
+                return cart
+        return Cart(cart_id)
+
+    def save(self, cart):
+        with self._lock:
+            if not cart:
+                self._carts.pop(cart.cart_id, None)
+                return
+            self._carts[cart.cart_id] = cart
+            self._carts.move_to_end(cart.cart_id)
+            while len(self._carts) > self.maxsize:
+                self._carts.popitem(last=False)
+
+    def delete(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def purge_stale(self, max_age):
+        return 0  # bounded by maxsize already
+
+
+class SqlCartStore:
+    """Carts as JSON rows in pos_carts; one primary-key read per load and one upsert per save."""
+
+    def load(self, cart_id):
+        row = db.session.get(PosCart, cart_id)
+        return Cart.from_json(cart_id, row.data) if row else Cart(cart_id)
+
+    def save(self, cart):
+        if not cart:
+            return self.delete(cart.cart_id)
+        db.session.merge(PosCart(cart_id=cart.cart_id, data=cart.to_json(), updated_at=datetime.utcnow()))
+        db.session.commit()
+
+    def delete(self, cart_id):
+        db.session.execute(delete(PosCart).where(PosCart.cart_id == cart_id))
+        db.session.commit()
+
+    def purge_stale(self, max_age):
+        """Delete carts untouched for `max_age` (timedelta). Returns the number removed."""
+        result = db.session.execute(delete(PosCart).where(PosCart.updated_at < datetime.utcnow() - max_age))
+        db.session.commit()
+        return result.rowcount
+
+
+def init_cart_store(app):
+    backend = app.config.get("CART_STORE", "sql")
+    if backend == "memory":
+        store = MemoryCartStore(maxsize=app.config.get("CART_STORE_SIZE", 1000))
+    elif backend == "sql":
+        store = SqlCartStore()
+    else:
+        raise ValueError(f"Unknown CART_STORE backend: {backend}")
+    app.extensions["cart_store"] = store
+    return store
+
+
+def get_cart_store():
+    return current_app.extensions["cart_store"]
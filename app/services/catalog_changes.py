@@ -0,0 +1,114 @@
+"""
+Catalogue change feed: the products changed or deleted since a cursor, so registers, search
+caches and exports can stay current in O(changes) instead of re-reading the products table.
+
+Changes are read by watermark - products by (updated_at, id) on ix_products_updated_at_id,
+deletions by (deleted_at, id) on the product_tombstones written by delete_product - and merged
+into one stream ordered by (time, kind, id), deletions first at equal times. A page never goes
+past CATALOG_CHANGES_LAG seconds before now, so a row from a transaction still committing cannot
+end up behind a cursor; once caught up, the cursor moves to that horizon even if nothing changed.
+
+Consumers apply a page's "deleted" ids before its "products" rows: a product row in a page is
+still alive, so any tombstone for its id (an id reused after a delete) is older than the row.
+Tombstones are kept CATALOG_TOMBSTONE_DAYS (`flask catalog-prune`); an older cursor could miss
+deletions and is refused with CURSOR_EXPIRED - start again without a cursor.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import delete, select, tuple_
+from app import db
+from app.models.product import Product, ProductTombstone
+from app.utils.pagination import decode_cursor, encode_cursor
+
+COLUMNS = ("id", "name", "category_id", "supplier_id", "price", "quantity", "unit", "expiration_date", "sku",
+           "barcode", "min_stock", "updated_at")
+CURSOR_EXPIRED = "Cursor expired; deletions since then were pruned. Sync again from the start."
+MAX_PAGE = 10000
+
+# Cursor: (time, kind, id) of the last change returned; kinds order deletions before updates
+_DELETED, _CHANGED, _HORIZON = 0, 1, 2
+_CURSOR_KEYS = (ProductTombstone.deleted_at, ProductTombstone.id, ProductTombstone.id)
+
+
+def _dump(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _past(time_col, id_col, kind, position):
+    """Rows of `kind` after `position` in (time, kind, id) order, as an index range on (time, id)."""
+    at, position_kind, position_id = position
+    if position_kind < kind:
+        return time_col >= at
+    if position_kind > kind:
+        return time_col > at
+    return tuple_(time_col, id_col) > (at, position_id)
+
+
+def changes_since(since=None, limit=None, columns=COLUMNS, lag=None):
+    """
+    One page of changes after the cursor `since` (None = the whole catalogue). Returns
+    (payload, error): {"columns", "products": [[value, ...] in column order], "deleted": [id],
+    "cursor", "more"}; pass the cursor back until "more" is false, and keep it for next time.
+    """
+    position = decode_cursor(since, _CURSOR_KEYS)
+    if since and position is None:
+        return None, "Invalid cursor"
+    config = current_app.config
+    now = datetime.utcnow()
+    retention = config.get("CATALOG_TOMBSTONE_DAYS", 90)
+    if position is not None and retention and position[0] < now - timedelta(days=retention):
+        return None, CURSOR_EXPIRED
+    limit = max(1, min(limit or config.get("CATALOG_CHANGES_PAGE", 1000), MAX_PAGE))
+    horizon = now - timedelta(seconds=config.get("CATALOG_CHANGES_LAG", 5) if lag is None else lag)
+
+    product_criteria = [Product.updated_at <= horizon]
+    tombstone_criteria = [ProductTombstone.deleted_at <= horizon]
+    if position is not None:
+        product_criteria.append(_past(Product.updated_at, Product.id, _CHANGED, position))
+        tombstone_criteria.append(_past(ProductTombstone.deleted_at, ProductTombstone.id, _DELETED, position))
+    cols = [Product.__table__.c[name] for name in columns]
+    products = db.session.execute(
+        select(Product.updated_at, Product.id, *cols).where(*product_criteria)
+        .order_by(Product.updated_at, Product.id).limit(limit + 1)
+    ).all()
+    # A consumer starting from nothing holds none of the deleted products
+    tombstones = [] if position is None else db.session.execute(
+        select(ProductTombstone.deleted_at, ProductTombstone.id, ProductTombstone.product_id)
+        .where(*tombstone_criteria).order_by(ProductTombstone.deleted_at, ProductTombstone.id).limit(limit + 1)
+    ).all()
+
+    merged = sorted(
+        [(row[0], _CHANGED, row[1], row) for row in products]
+        + [(row.deleted_at, _DELETED, row.id, row) for row in tombstones],
+        key=lambda change: change[:3],
+    )
+    more = len(merged) > limit
+    merged = merged[:limit]
+    if more:
+        last = merged[-1][:3]
+    else:
+        # Caught up: everything up to the horizon has been returned
+        last = (horizon, _HORIZON, 0)
+        if position is not None and tuple(position) > last:
+            last = tuple(position)
+    return {
+        "columns": list(columns),
+        "products": [[_dump(value) for value in change[3][2:]] for change in merged if change[1] == _CHANGED],
+        "deleted": [change[3].product_id for change in merged if change[1] == _DELETED],
+        "cursor": encode_cursor(list(last)),
+        "more": more,
+    }, None
+
+
+def prune_tombstones(days=None):
+    """Delete tombstones older than `days` (default CATALOG_TOMBSTONE_DAYS). Returns the count."""
+    days = current_app.config.get("CATALOG_TOMBSTONE_DAYS", 90) if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = db.session.execute(delete(ProductTombstone).where(ProductTombstone.deleted_at < cutoff)).rowcount
+    db.session.commit()
+    return removed
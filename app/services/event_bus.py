@@ -0,0 +1,260 @@
+"""
+Live stock / alert events for the SSE feed (/inventory/events).
+
+Services queue events with publish_after_commit(); they reach the bus only when the transaction
+commits (and are dropped on rollback). Event types:
+
+- "stock": {product_id, name, quantity, min_stock} after a sale, refund or product edit;
+- "low_stock" / "low_stock_cleared": the product crossed its min_stock (same fields);
+- "near_expiry": {product_id, name, expiration_date} an edit moved it into the alert window;
+- "resync": sent to a subscriber whose queue overflowed; it should reload its data.
+
+Backends (EVENT_BUS): MemoryEventBus fans out inside one process (single worker, tests);
+PostgresEventBus sends NOTIFY and runs one LISTEN thread per process, so every gunicorn worker
+sees every event. Each subscriber has a bounded queue (EVENT_QUEUE_SIZE); a slow client loses
+its backlog and gets "resync" instead of holding memory or blocking publishers.
+"""
+import json
+import logging
+import queue
+import re
+import select
+import threading
+from datetime import date, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "event_bus_pending"
+NOTIFY_PAYLOAD_LIMIT = 7900  # PostgreSQL caps NOTIFY payloads at 8000 bytes
+
+
+class Subscription:
+    """One client's bounded event queue, optionally filtered by type and product id."""
+
+    def __init__(self, maxsize=100, types=None, product_ids=None):
+        self.queue = queue.Queue(maxsize)
+        self.types = set(types) if types else None
+        self.product_ids = set(product_ids) if product_ids else None
+        self.dropped = 0
+
+    def wants(self, evt):
+        if self.types is not None and evt["type"] not in self.types:
+            return False
+        return self.product_ids is None or evt.get("product_id") in self.product_ids
+
+    def offer(self, evt):
+        try:
+            self.queue.put_nowait(evt)
+        except queue.Full:
+            # Slow consumer: drop its backlog rather than grow or block the publisher
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.dropped += 1
+            self.queue.put_nowait({"type": "resync"})
+
+    def get(self, timeout=None):
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MemoryEventBus:
+    """In-process fan-out; events never leave this process."""
+
+    def __init__(self, queue_size=100, max_clients=200):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, types=None, product_ids=None):
+        """A new Subscription, or None when max_clients are already connected."""
+        sub = Subscription(self.queue_size, types, product_ids)
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, events):
+        self._fanout(events)
+
+    def _fanout(self, events):
+        with self._lock:
+            for sub in self._subscribers:
+                for evt in events:
+                    if sub.wants(evt):
+                        sub.offer(evt)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+class PostgresEventBus(MemoryEventBus):
+    """NOTIFY on publish; a LISTEN thread (started with the first subscriber) fans out locally."""
+
+    def __init__(self, app, channel="gsms_events", queue_size=100, max_clients=200, poll_interval=5.0):
+        super().__init__(queue_size, max_clients)
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", channel):
+            raise ValueError(f"Invalid EVENT_BUS_CHANNEL: {channel}")
+        self.app = app
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._listener = None
+        self._stop = threading.Event()
+
+    def subscribe(self, types=None, product_ids=None):
+        self._ensure_listener()
+        return super().subscribe(types, product_ids)
+
+    def publish(self, events):
+        payloads, batch = [], []
+        for evt in events:
+            candidate = json.dumps(batch + [evt], separators=(",", ":"))
+            if batch and len(candidate.encode()) > NOTIFY_PAYLOAD_LIMIT:
+                payloads.append(json.dumps(batch, separators=(",", ":")))
+                batch = [evt]
+            else:
+                batch.append(evt)
+        if batch:
+            payloads.append(json.dumps(batch, separators=(",", ":")))
+        with db.engine.connect() as conn:
+            for payload in payloads:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+            conn.commit()
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="event-bus-listen", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    raw = db.engine.raw_connection()
+                raw.detach()  # dedicated for LISTEN; never returned to the pool
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                backoff = 1
+                try:
+                    while not self._stop.is_set():
+                        if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            note = conn.notifies.pop(0)
+                            self._fanout(json.loads(note.payload))
+                finally:
+                    raw.close()
+            except Exception:
+                logger.exception("Event bus listener failed; reconnecting in %ss", backoff)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def stop(self):
+        self._stop.set()
+
+
+def init_event_bus(app):
+    backend = app.config.get("EVENT_BUS", "memory")
+    options = dict(
+        queue_size=app.config.get("EVENT_QUEUE_SIZE", 100),
+        max_clients=app.config.get("EVENT_MAX_CLIENTS", 200),
+    )
+    if backend == "memory":
+        bus = MemoryEventBus(**options)
+    elif backend == "postgres":
+        bus = PostgresEventBus(app, channel=app.config.get("EVENT_BUS_CHANNEL", "gsms_events"), **options)
+    else:
+        raise ValueError(f"Unknown EVENT_BUS backend: {backend}")
+    app.extensions["event_bus"] = bus
+    return bus
+
+
+def get_event_bus():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("event_bus")
+
+
+def publish_after_commit(*events):
+    """Queue events on the current session; they are published if and when it commits."""
+    db.session.info.setdefault(_PENDING_KEY, []).extend(events)
+
+
+def _product_fields(product_id, name, quantity, min_stock):
+    return {"product_id": product_id, "name": name, "quantity": quantity, "min_stock": min_stock}
+
+
+def stock_changed(product_id, name, old_quantity, new_quantity, min_stock, old_min_stock=None):
+    """Queue a "stock" event plus low_stock / low_stock_cleared when min_stock was crossed."""
+    fields = _product_fields(product_id, name, new_quantity, min_stock)
+    events = [dict(fields, type="stock")]
+    was_low = old_quantity <= (min_stock if old_min_stock is None else old_min_stock)
+    is_low = new_quantity <= min_stock
+    if is_low and not was_low:
+        events.append(dict(fields, type="low_stock"))
+    elif was_low and not is_low:
+        events.append(dict(fields, type="low_stock_cleared"))
+    publish_after_commit(*events)
+
+
+def expiry_changed(product_id, name, old_date, new_date, days_near=7):
+    """Queue "near_expiry" when an edit moves the expiration date into the alert window."""
+    threshold = date.today() + timedelta(days=days_near)
+    if new_date is not None and new_date <= threshold and (old_date is None or old_date > threshold):
+        publish_after_commit({"type": "near_expiry", "product_id": product_id, "name": name,
+                              "expiration_date": new_date.isoformat()})
+
+
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if not events:
+        return
+    bus = get_event_bus()
+    if bus is None:
+        return
+    try:
+        bus.publish(events)
+    except Exception:
+        # The data is committed; a lost live update only means clients refresh later
+        logger.exception("Could not publish %d event(s)", len(events))
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def sse_stream(sub, bus, heartbeat=15.0):
+    """Server-Sent Events text for one subscription; unsubscribes when the client goes away."""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            evt = sub.get(timeout=heartbeat)
+            if evt is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {evt['type']}\ndata: {json.dumps(evt)}\n\n"
+    finally:
+        bus.unsubscribe(sub)
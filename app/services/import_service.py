@@ -0,0 +1,491 @@
+"""
+Bulk product import (supplier price lists, stock counts): CSV or JSON, streamed in batches.
+
+Input is parsed incrementally and handled IMPORT_BATCH_SIZE rows at a time. Each batch:
+
+- validates and types every row (errors are reported per row, the rest of the batch goes on);
+- resolves the products it refers to by id, SKU or barcode with one query, and category /
+  supplier names or ids not seen earlier in the import with at most one query each;
+- updates matched products with one bulk UPDATE by primary key, and creates the rest with
+  INSERT ... ON CONFLICT (sku) DO UPDATE, so a product created concurrently is updated instead;
+- queues stock / low-stock / near-expiry events for the updated products (as update_product
+  does), from the values read during resolution;
+- commits, so a 50k-line file never holds one long transaction.
+
+dry_run does the same validation and resolution but writes nothing.
+"""
+import codecs
+import csv
+import json
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from flask import current_app, has_app_context
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models.category import Category
+from app.models.product import Product
+from app.models.supplier import Supplier
+from app.services import event_bus as events
+
+IMPORT_FORMATS = ("csv", "json")
+CENT = Decimal("0.01")
+MAX_PRICE = Decimal("9999999999.99")  # Numeric(12, 2)
+MAX_JSON_ROW = 1024 * 1024  # characters; a longer element is treated as malformed input
+_TEXT_LIMITS = {"name": 120, "unit": 20, "sku": 60, "barcode": 60}
+_NULLABLE = ("unit", "barcode", "expiration_date", "category_id", "supplier_id")
+
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def guess_format(filename):
+    """"csv" or "json" from a file name (.jsonl / .ndjson count as json), else None."""
+    ext = (filename or "").rsplit(".", 1)[-1].lower()
+    if ext in ("json", "jsonl", "ndjson"):
+        return "json"
+    return "csv" if ext in ("csv", "txt") else None
+
+
+def text_stream(binary):
+    """Incrementally decoded UTF-8 text (BOM stripped) from a binary file-like object."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while True:
+        chunk = binary.read(64 * 1024)
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+
+class _Lines:
+    """Line iterator over text chunks, for csv.reader."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = ""
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self._buf += chunk
+            *lines, self._buf = self._buf.split("\n")
+            for line in lines:
+                yield line + "\n"
+        if self._buf:
+            yield self._buf
+
+
+def iter_csv_rows(chunks):
+    """
+    (row number, dict) for each CSV record after the header row; headers are matched
+    case-insensitively and empty cells count as "not given".
+    """
+    reader = csv.reader(_Lines(chunks))
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [h.strip().lower() for h in header]
+    for record in reader:
+        if not any(cell.strip() for cell in record):
+            continue
+        yield reader.line_num, {
+            name: cell.strip() for name, cell in zip(header, record) if name and cell.strip()
+        }
+
+
+def iter_json_rows(chunks):
+    """
+    (row number, value) for each element of a JSON array, or each line of JSON Lines,
+    decoded one element at a time. Raises ValueError on malformed input.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buf, pos, n = "", 0, 0
+    in_array = None
+    exhausted = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if exhausted:
+                if in_array:
+                    raise ValueError("Unterminated JSON array")
+                return
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buf, pos = buf[pos:] + chunk, 0
+            continue
+        if in_array is None:
+            in_array = buf[pos] == "["
+            pos += in_array
+            continue
+        if in_array and buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            chunk = None if exhausted or len(buf) - pos > MAX_JSON_ROW else next(chunks, None)
+            if chunk is None:
+                raise ValueError(f"Invalid JSON in row {n + 1}")
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        if end == len(buf) and not exhausted and not isinstance(value, (dict, list)):
+            # a scalar at the end of the buffer may be cut off; read on before trusting it
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buf, pos = buf[pos:] + chunk, 0
+            continue
+        n += 1
+        pos = end
+        yield n, value
+
+
+def iter_rows(binary, fmt):
+    chunks = text_stream(binary)
+    return iter_json_rows(chunks) if fmt == "json" else iter_csv_rows(chunks)
+
+
+def _text(value, field):
+    value = str(value).strip()
+    if len(value) > _TEXT_LIMITS[field]:
+        raise ValueError(f"{field} longer than {_TEXT_LIMITS[field]} characters")
+    return value
+
+
+def _int(value, field, minimum=0):
+    if isinstance(value, bool):
+        raise ValueError(f"{field} must be a whole number")
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"{field} must be a whole number")
+    if not number.is_finite() or number != number.to_integral_value():
+        raise ValueError(f"{field} must be a whole number")
+    if number < minimum:
+        raise ValueError(f"{field} must be at least {minimum}")
+    return int(number)
+
+
+def _price(value):
+    if isinstance(value, bool):
+        raise ValueError("price must be a number")
+    try:
+        price = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError("price must be a number")
+    if not price.is_finite() or price < 0 or price > MAX_PRICE:
+        raise ValueError("price out of range")
+    return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        raise ValueError("expiration_date must be YYYY-MM-DD")
+
+
+def clean_row(raw):
+    """
+    Typed values from one input row: product columns plus the keys "id", "category" and
+    "supplier" (names) when given. Unknown fields are ignored. Raises ValueError.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Row must be an object")
+    raw = {str(k).strip().lower(): v for k, v in raw.items()}
+    out = {}
+    for field, value in raw.items():
+        if value is None or value == "":
+            if field in _NULLABLE or field in ("category", "supplier"):
+                out[field] = None
+                continue
+            if field in ("name", "price", "quantity", "min_stock", "sku"):
+                raise ValueError(f"{field} cannot be empty")
+            continue
+        if field == "id":
+            out["id"] = _int(value, "id", minimum=1)
+        elif field in ("name", "unit", "sku", "barcode"):
+            out[field] = _text(value, field)
+        elif field == "price":
+            out["price"] = _price(value)
+        elif field in ("quantity", "min_stock"):
+            out[field] = _int(value, field)
+        elif field == "expiration_date":
+            out[field] = _date(value)
+        elif field in ("category_id", "supplier_id"):
+            out[field] = _int(value, field, minimum=1)
+        elif field in ("category", "supplier"):
+            out[field] = str(value).strip()
+    if "name" in out and not out["name"]:
+        raise ValueError("name cannot be empty")
+    return out
+
+
+class _RefResolver:
+    """Category or supplier name/id -> id, cached for the whole import."""
+
+    def __init__(self, model, label):
+        self.model = model
+        self.label = label
+        self.by_name = {}  # lower(name) -> id or None when unknown
+        self.ids = {}  # id -> exists
+
+    def load(self, names, ids):
+        names = {n.lower() for n in names} - self.by_name.keys()
+        ids = set(ids) - self.ids.keys()
+        if not names and not ids:
+            return
+        rows = db.session.execute(
+            select(self.model.id, self.model.name).where(
+                or_(func.lower(self.model.name).in_(names), self.model.id.in_(ids))
+            )
+        ).all()
+        for ref_id, name in rows:
+            self.by_name.setdefault(name.lower(), ref_id)
+            self.ids[ref_id] = True
+        for name in names:
+            self.by_name.setdefault(name, None)
+        for ref_id in ids:
+            self.ids.setdefault(ref_id, False)
+
+    def resolve(self, name=None, ref_id=None):
+        if name is not None:
+            ref_id = self.by_name.get(name.lower())
+            if ref_id is None:
+                raise ValueError(f"Unknown {self.label} '{name}'")
+            return ref_id
+        if not self.ids.get(ref_id):
+            raise ValueError(f"{self.label.capitalize()} id {ref_id} not found")
+        return ref_id
+
+
+def _upsert():
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(Product)
+    if dialect == "sqlite":
+        return sqlite.insert(Product)
+    return None
+
+
+def _grouped(rows):
+    """Rows grouped by their key set, as executemany needs uniform parameters."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups.values()
+
+
+def _queue_events(updates, current):
+    """Stock and expiry events for bulk-updated products, old values from `current`."""
+    for row in updates:
+        name, quantity, min_stock, expiration = current[row["id"]]
+        new_quantity, new_min_stock = row.get("quantity", quantity), row.get("min_stock", min_stock)
+        name = row.get("name", name)
+        if (new_quantity, new_min_stock) != (quantity, min_stock):
+            events.stock_changed(row["id"], name, quantity, new_quantity, new_min_stock, min_stock)
+        if "expiration_date" in row and row["expiration_date"] != expiration:
+            events.expiry_changed(row["id"], name, expiration, row["expiration_date"])
+
+
+def _apply(updates, inserts):
+    now = datetime.utcnow()
+    if updates:
+        changed = [row["id"] for row in updates]
+        for rows in _grouped(updates):
+            db.session.execute(
+                update(Product).execution_options(changed_product_ids=changed),
+                [dict(row, updated_at=now) for row in rows],
+            )
+    for rows in _grouped(inserts):
+        rows = [dict({"quantity": 0, "min_stock": 0, "unit": "pcs"}, **row, created_at=now, updated_at=now) for row in rows]
+        stmt = _upsert()
+        if stmt is None or "sku" not in rows[0]:
+            db.session.execute(insert(Product), rows)
+            continue
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["sku"],
+            set_={name: stmt.excluded[name] for name in rows[0] if name not in ("sku", "created_at")},
+        ), rows)
+
+
+class _Import:
+    def __init__(self, dry_run, max_errors):
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.categories = _RefResolver(Category, "category")
+        self.suppliers = _RefResolver(Supplier, "supplier")
+        self.planned = set()  # dry run: ("sku"|"barcode", code) of products that would be created
+        self.report = {
+            "dry_run": dry_run,
+            "processed": 0,
+            "created": 0,
+            "updated": 0,
+            "failed": 0,
+            "errors": [],
+            "errors_truncated": False,
+        }
+
+    def error(self, row_no, key, message):
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < self.max_errors:
+            self.report["errors"].append({"row": row_no, "key": key, "error": message})
+        else:
+            self.report["errors_truncated"] = True
+
+    def batch(self, raw_rows):
+        self.report["processed"] += len(raw_rows)
+        cleaned = []
+        for row_no, raw in raw_rows:
+            try:
+                cleaned.append((row_no, clean_row(raw)))
+            except ValueError as e:
+                self.error(row_no, _row_key(raw if isinstance(raw, dict) else {}), str(e))
+
+        ids = {v["id"] for _, v in cleaned if "id" in v}
+        skus = {v["sku"] for _, v in cleaned if v.get("sku")}
+        barcodes = {v["barcode"] for _, v in cleaned if v.get("barcode")}
+        by_id, by_sku, by_barcode, current = {}, {}, {}, {}
+        if ids or skus or barcodes:
+            for pid, sku, barcode, *state in db.session.execute(
+                select(Product.id, Product.sku, Product.barcode, Product.name, Product.quantity, Product.min_stock,
+                       Product.expiration_date).where(
+                    or_(Product.id.in_(ids), Product.sku.in_(skus), Product.barcode.in_(barcodes))
+                )
+            ):
+                by_id[pid] = (sku, barcode)
+                current[pid] = state
+                if sku:
+                    by_sku[sku] = pid
+                if barcode:
+                    by_barcode[barcode] = pid
+        self.categories.load(
+            [v["category"] for _, v in cleaned if v.get("category")],
+            [v["category_id"] for _, v in cleaned if v.get("category_id")],
+        )
+        self.suppliers.load(
+            [v["supplier"] for _, v in cleaned if v.get("supplier")],
+            [v["supplier_id"] for _, v in cleaned if v.get("supplier_id")],
+        )
+
+        pending = {}  # target -> (first row number, values); later rows for the same product merge in
+        claimed = {}  # ("sku"|"barcode", code) -> target, for clashes inside the batch
+        for row_no, values in cleaned:
+            key = _row_key(values)
+            try:
+                target = self._target(values, by_id, by_sku, by_barcode)
+                for field in ("category", "supplier"):
+                    if field in values:
+                        name = values.pop(field)
+                        resolver = self.categories if field == "category" else self.suppliers
+                        values[f"{field}_id"] = resolver.resolve(name=name) if name else None
+                    elif values.get(f"{field}_id"):
+                        resolver = self.categories if field == "category" else self.suppliers
+                        resolver.resolve(ref_id=values[f"{field}_id"])
+                for field in ("sku", "barcode"):
+                    code = values.get(field)
+                    if code and claimed.setdefault((field, code), target) != target:
+                        raise ValueError(f"{field} {code} appears on another row for a different product")
+                merged = {**pending[target][1], **values} if target in pending else values
+                if target[0] != "id" and ("name" not in merged or "price" not in merged):
+                    raise ValueError("New products need name and price")
+            except ValueError as e:
+                self.error(row_no, key, str(e))
+                continue
+            pending[target] = (pending[target][0] if target in pending else row_no, merged)
+
+        updates, inserts = [], []
+        for target, (_, values) in pending.items():
+            values.pop("id", None)
+            if target[0] == "id":
+                updates.append(dict(values, id=target[1]))
+            elif self.dry_run and target in self.planned:
+                updates.append(values)
+            else:
+                inserts.append(values)
+                if self.dry_run:
+                    self.planned.add(target)
+        if not self.dry_run:
+            try:
+                _apply(updates, inserts)
+                _queue_events(updates, current)
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                message = f"Batch not saved: {getattr(e, 'orig', None) or e}"
+                for target, (row_no, values) in pending.items():
+                    self.error(row_no, _row_key(values), message)
+                return
+        self.report["updated"] += len(updates)
+        self.report["created"] += len(inserts)
+
+    def _target(self, values, by_id, by_sku, by_barcode):
+        """("id", product id) for an existing product, else ("sku"|"barcode", code) for a new one."""
+        sku, barcode = values.get("sku"), values.get("barcode")
+        if "id" in values:
+            if values["id"] not in by_id:
+                raise ValueError(f"Product id {values['id']} not found")
+            pid = values["id"]
+        elif sku:
+            pid = by_sku.get(sku)
+        elif barcode:
+            pid = by_barcode.get(barcode)
+        else:
+            raise ValueError("Row needs an id, sku or barcode")
+        if sku and by_sku.get(sku, pid) != pid:
+            raise ValueError(f"SKU {sku} already belongs to product #{by_sku[sku]}")
+        if barcode and by_barcode.get(barcode, pid) != pid:
+            raise ValueError(f"Barcode {barcode} already belongs to product #{by_barcode[barcode]}")
+        if pid is not None:
+            return ("id", pid)
+        return ("sku", sku) if sku else ("barcode", barcode)
+
+
+def _row_key(values):
+    for field in ("sku", "barcode", "id"):
+        if values.get(field) not in (None, ""):
+            return str(values[field])
+    return None
+
+
+def import_products(rows, dry_run=False, batch_size=None, max_errors=None):
+    """
+    Create/update products from (row number, dict) pairs, e.g. iter_rows(file, "csv").
+    Fields: id, sku, barcode (at least one, matched in that order), name, price, quantity,
+    unit, min_stock, expiration_date, category / category_id, supplier / supplier_id.
+    Returns (report, error): report has processed/created/updated/failed counts and per-row
+    errors [{row, key, error}]; error is set when the input could not be parsed (rows before
+    the bad one are already applied).
+    """
+    batch_size = batch_size or _config("IMPORT_BATCH_SIZE", 1000)
+    job = _Import(dry_run, max_errors or _config("IMPORT_MAX_ERRORS", 1000))
+    rows = iter(rows)
+    batch = []
+    while True:
+        try:
+            row = next(rows, None)
+        except (ValueError, csv.Error) as e:
+            if batch:
+                job.batch(batch)
+            job.report["errors"].sort(key=lambda e: e["row"])
+            return job.report, f"Could not parse input: {e}"
+        if row is None:
+            break
+        batch.append(row)
+        if len(batch) >= batch_size:
+            job.batch(batch)
+            batch = []
+    if batch:
+        job.batch(batch)
+    job.report["errors"].sort(key=lambda e: e["row"])
+    return job.report, None
@@ -4,28 +4,30 @@ Inventory business logic: CRUD, batch, alerts, search.
 from datetime import date, timedelta
 from decimal import Decimal
 from app import db
-from app.models.product import Product
+from app.models.product import Product, ProductTombstone
 from app.models.category import Category
 from app.models.supplier import Supplier
+from app.services import event_bus as events
+from app.services.product_cache import ProductSnapshot, get_product_cache
+from app.services.import_service import import_products
+from app.services.search_service import apply_product_search, search_product_by_name
+from app.utils.pagination import estimated_count, paginate
 
 
-def get_products_paginated(page=1, per_page=20, category_id=None, search=None, low_stock_only=False):
+def get_products_page(after=None, before=None, per_page=20, category_id=None, search=None, low_stock_only=False):
+    """
+    A Page of products by (name, id) keyset; searches keep their relevance order (offset cursors).
+    The unfiltered list carries an estimated total.
+    """
     q = Product.query
     if category_id is not None:
         q = q.filter(Product.category_id == category_id)
-    if search:
-        term = f"%{search}%"
-        q = q.filter(
-            db.or_(
-                Product.name.ilike(term),
-                Product.sku.ilike(term),
-                Product.barcode.ilike(term),
-            )
-        )
     if low_stock_only:
         q = q.filter(Product.quantity <= Product.min_stock)
-    q = q.order_by(Product.name)
-    return q.paginate(page=page, per_page=per_page, error_out=False)
+    if search:
+        return paginate(apply_product_search(q, search), after=after, before=before, per_page=per_page)
+    total = estimated_count(Product) if category_id is None and not low_stock_only else None
+    return paginate(q, (Product.name, Product.id), after=after, before=before, per_page=per_page, total=total)
 
 
 def get_product_by_id(product_id):
@@ -40,6 +42,18 @@ def get_product_by_barcode(barcode):
     return Product.query.filter_by(barcode=barcode).first()
 
 
+_MAX_ID = 2 ** 31 - 1  # long numeric barcodes cannot be product ids
+
+
+def _as_product_id(identifier):
+    """int id for an int or all-digit identifier within the id range, else None."""
+    if isinstance(identifier, int) or (isinstance(identifier, str) and identifier.isdigit()):
+        product_id = int(identifier)
+        if product_id <= _MAX_ID:
+            return product_id
+    return None
+
+
 def lookup_product(identifier):
     """Lookup by id, sku, barcode, or product name (partial match)."""
     if identifier is None:
@@ -49,8 +63,9 @@ def lookup_product(identifier):
         if not identifier:
             return None
     # Try by numeric ID first
-    if isinstance(identifier, int) or (isinstance(identifier, str) and identifier.isdigit()):
-        p = get_product_by_id(int(identifier))
+    product_id = _as_product_id(identifier)
+    if product_id is not None:
+        p = get_product_by_id(product_id)
         if p:
             return p
     # Try by SKU (only if non-empty - skip for empty string so we don't match products with null/empty SKU)
@@ -63,13 +78,106 @@ def lookup_product(identifier):
             return p
     # Fallback: search by product name (first match) so products with no barcode/SKU can be sold
     if isinstance(identifier, str) and len(identifier) >= 1:
-        term = f"%{identifier}%"
-        p = Product.query.filter(Product.name.ilike(term)).order_by(Product.name).first()
+        p = search_product_by_name(identifier)
         if p:
             return p
     return None
 
 
+def lookup_product_cached(identifier):
+    """
+    Same resolution order as lookup_product (id, SKU, barcode, then name) but returns a
+    ProductSnapshot, served from the per-process lookup cache when possible.
+    """
+    cache = get_product_cache()
+    if cache is None:
+        p = lookup_product(identifier)
+        return ProductSnapshot.from_product(p) if p else None
+    if identifier is None:
+        return None
+    if isinstance(identifier, str):
+        identifier = identifier.strip()
+        if not identifier:
+            return None
+    product_id = _as_product_id(identifier)
+    if product_id is not None:
+        snapshot = cache.get(product_id)
+        if snapshot:
+            return snapshot
+        if not cache.is_missing(product_id):
+            p = get_product_by_id(product_id)
+            if p:
+                return cache.put(ProductSnapshot.from_product(p))
+            cache.put_missing(product_id)
+    code = str(identifier)
+    snapshot = cache.get_by_sku(code) or cache.get_by_barcode(code)
+    if snapshot:
+        return snapshot
+    matches = Product.query.filter(db.or_(Product.sku == code, Product.barcode == code)).all()
+    if matches:
+        for p in matches:
+            cache.put(ProductSnapshot.from_product(p))
+        return cache.get_by_sku(code) or cache.get_by_barcode(code)
+    if isinstance(identifier, str):
+        p = search_product_by_name(identifier)
+        if p:
+            return cache.put(ProductSnapshot.from_product(p))
+    return None
+
+
+def lookup_products_cached(identifiers):
+    """
+    {identifier: ProductSnapshot or None} for many identifiers, resolved like lookup_product_cached
+    (id, SKU, barcode, then name) but with one query for every id / code the cache cannot answer.
+    Only the name fallback, for codes nothing else matched, still searches one by one.
+    """
+    cache = get_product_cache()
+    found, pending = {}, {}
+    for identifier in identifiers:
+        code = identifier.strip() if isinstance(identifier, str) else identifier
+        if identifier in found or identifier in pending:
+            continue
+        if code is None or code == "":
+            found[identifier] = None
+            continue
+        product_id = _as_product_id(code)
+        if cache is not None:
+            snapshot = cache.get(product_id) if product_id is not None else None
+            if snapshot is None and (product_id is None or cache.is_missing(product_id)):
+                product_id = None
+                snapshot = cache.get_by_sku(str(code)) or cache.get_by_barcode(str(code))
+            if snapshot is not None:
+                found[identifier] = snapshot
+                continue
+        pending[identifier] = (product_id, str(code))
+    if not pending:
+        return found
+
+    ids = sorted({product_id for product_id, _ in pending.values() if product_id is not None})
+    codes = sorted({code for _, code in pending.values()})
+    by_id, by_sku, by_barcode = {}, {}, {}
+    for p in Product.query.filter(db.or_(Product.id.in_(ids), Product.sku.in_(codes), Product.barcode.in_(codes))):
+        snapshot = cache.put(ProductSnapshot.from_product(p)) if cache is not None else ProductSnapshot.from_product(p)
+        by_id[p.id] = snapshot
+        if p.sku:
+            by_sku[p.sku] = snapshot
+        if p.barcode:
+            by_barcode[p.barcode] = snapshot
+    for identifier, (product_id, code) in pending.items():
+        snapshot = by_id.get(product_id) if product_id is not None else None
+        if snapshot is None and product_id is not None and cache is not None:
+            cache.put_missing(product_id)
+        snapshot = snapshot or by_sku.get(code) or by_barcode.get(code)
+        if snapshot is None and isinstance(identifier, str):
+            p = search_product_by_name(code)
+            if p:
+                snapshot = ProductSnapshot.from_product(p)
+                if cache is not None:
+                    cache.put(snapshot)
+        found[identifier] = snapshot
+    return found
+
+
 def add_product(name, price, quantity=0, category_id=None, unit="pcs", expiration_date=None,
                 sku=None, barcode=None, supplier_id=None, min_stock=0):
     if sku and get_product_by_sku(sku):
@@ -103,6 +211,7 @@ def update_product(product_id, **kwargs):
     barcode = kwargs.get("barcode")
     if barcode is not None and barcode != product.barcode and get_product_by_barcode(barcode):
         return None, "Barcode already in use"
+    old_quantity, old_min_stock, old_expiration = product.quantity, product.min_stock, product.expiration_date
     for key in ("name", "price", "quantity", "category_id", "unit", "expiration_date", "sku", "barcode", "supplier_id", "min_stock"):
         if key in kwargs:
             v = kwargs[key]
@@ -111,6 +220,10 @@ def update_product(product_id, **kwargs):
             if key in ("quantity", "min_stock", "category_id", "supplier_id"):
                 v = int(v) if v is not None else 0
             setattr(product, key, v)
+    if (product.quantity, product.min_stock) != (old_quantity, old_min_stock):
+        events.stock_changed(product.id, product.name, old_quantity, product.quantity, product.min_stock, old_min_stock)
+    if product.expiration_date != old_expiration:
+        events.expiry_changed(product.id, product.name, old_expiration, product.expiration_date)
     db.session.commit()
     return product, None
 
@@ -119,6 +232,7 @@ def delete_product(product_id):
     product = get_product_by_id(product_id)
     if not product:
         return False, "Product not found"
+    db.session.add(ProductTombstone(product_id=product.id))
     db.session.delete(product)
     db.session.commit()
     return True, None
@@ -126,44 +240,27 @@ def delete_product(product_id):
 
 def batch_update_products(updates):
     """
-    updates: list of dicts with at least 'id' and fields to update (quantity, price, etc.)
-    Returns (success_count, errors_list).
+    updates: list of dicts keyed by 'id', 'sku' or 'barcode' with the fields to set; rows with
+    an unknown SKU create products (see import_service). Returns (success_count, errors_list).
     """
-    success = 0
-    errors = []
-    for row in updates:
-        pid = row.get("id")
-        if not pid:
-            errors.append("Missing id")
-            continue
-        product = get_product_by_id(pid)
-        if not product:
-            errors.append(f"Product id {pid} not found")
-            continue
-        for key in ("quantity", "price", "min_stock", "name", "unit"):
-            if key in row:
-                v = row[key]
-                if key == "price":
-                    product.price = Decimal(str(v))
-                elif key == "quantity":
-                    product.quantity = int(v)
-                elif key == "min_stock":
-                    product.min_stock = int(v)
-                elif key in ("name", "unit"):
-                    setattr(product, key, v)
-        success += 1
-    db.session.commit()
-    return success, errors
+    report, _ = import_products(enumerate(updates, 1))
+    errors = [f"Row {e['row']}: {e['error']}" for e in report["errors"]]
+    return report["created"] + report["updated"], errors
+
+
+_ALERT_COLUMNS = (Product.id, Product.name, Product.quantity, Product.min_stock, Product.expiration_date)
 
 
 def get_low_stock_products():
-    return Product.query.filter(Product.quantity <= Product.min_stock).order_by(Product.quantity).all()
+    """Rows (id, name, quantity, min_stock, expiration_date), read through ix_products_low_stock."""
+    return db.session.query(*_ALERT_COLUMNS).filter(Product.quantity <= Product.min_stock).order_by(Product.quantity).all()
 
 
 def get_expired_or_near_products(days_near=7):
+    """Same row shape as get_low_stock_products, from ix_products_expiration_date."""
     today = date.today()
     threshold = today + timedelta(days=days_near)
-    return Product.query.filter(
+    return db.session.query(*_ALERT_COLUMNS).filter(
         Product.expiration_date.isnot(None),
         Product.expiration_date <= threshold,
     ).order_by(Product.expiration_date).all()
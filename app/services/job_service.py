@@ -0,0 +1,319 @@
+"""
+Background export jobs: a DB-backed queue (export_jobs) drained by worker threads.
+
+Export routes enqueue a job and hand back its id; a worker claims it with a conditional UPDATE
+(so any number of threads/processes can poll the same table), writes the artifact under
+EXPORT_DIR and marks it done. Requests with the same kind and parameters share one job while it
+is queued/running. A finished artifact is reused until it expires after EXPORT_ARTIFACT_TTL
+seconds, but only if its date range had already ended when it was built; a range that includes
+the day of the export is rebuilt on every request, so later sales are not missed.
+
+Workers run as EXPORT_WORKER_THREADS daemon threads in each web process, started on the first
+enqueue, or in a dedicated process with `flask export-worker` (set EXPORT_WORKER_THREADS=0).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from app import db
+from app.models.export_job import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# kind -> (file extension, mimetype)
+EXPORT_KINDS = {
+    "csv": ("csv", "text/csv"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf", "application/pdf"),
+}
+ACTIVE_STATUSES = ("queued", "running")
+PROGRESS_INTERVAL = 2.0  # seconds between progress writes
+PURGE_INTERVAL = 300.0  # seconds between artifact purges in each worker
+
+
+def get_export_dir():
+    path = current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def params_hash(kind, params):
+    canonical = json.dumps({"kind": kind, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _artifact_ready(job, now=None):
+    return (
+        job.status == "done"
+        and job.artifact_path
+        and (job.expires_at is None or job.expires_at > (now or datetime.utcnow()))
+        and os.path.exists(job.artifact_path)
+    )
+
+
+def _range_closed(job):
+    """True when the job's date range ended before the (UTC) day it ran, so no later sale can fall in it."""
+    end = json.loads(job.params).get("end")
+    return bool(end and job.started_at and date.fromisoformat(end) < job.started_at.date())
+
+
+def enqueue_export(kind, params, user_id=None):
+    """
+    Queue an export, or return the matching queued/running job or unexpired artifact of a closed
+    date range. params must be JSON-serialisable. Returns (job, error).
+    """
+    if kind not in EXPORT_KINDS:
+        return None, f"Unknown export type: {kind}"
+    digest = params_hash(kind, params)
+    candidates = ExportJob.query.filter(
+        ExportJob.params_hash == digest,
+        ExportJob.status.in_(ACTIVE_STATUSES + ("done",)),
+    ).order_by(ExportJob.created_at.desc()).all()
+    for job in candidates:
+        if job.status in ACTIVE_STATUSES or (_artifact_ready(job) and _range_closed(job)):
+            db.session.rollback()
+            _ensure_workers()
+            return job, None
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        params=json.dumps(params, sort_keys=True),
+        params_hash=digest,
+        status="queued",
+        progress=0,
+        user_id=user_id,
+    )
+    db.session.add(job)
+    db.session.commit()
+    _ensure_workers()
+    return job, None
+
+
+def get_job(job_id):
+    return db.session.get(ExportJob, job_id)
+
+
+def artifact_for(job):
+    """(path, mimetype, download_name) for a finished job, or None when not downloadable."""
+    if job is None or not _artifact_ready(job):
+        return None
+    ext, mimetype = EXPORT_KINDS[job.kind]
+    params = json.loads(job.params)
+    return job.artifact_path, mimetype, f"sales_{params['start']}_{params['end']}.{ext}"
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running. Returns its id or None."""
+    candidates = db.session.execute(
+        select(ExportJob.id).where(ExportJob.status == "queued").order_by(ExportJob.created_at).limit(5)
+    ).scalars().all()
+    for job_id in candidates:
+        result = db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status == "queued")
+            .values(status="running", started_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return job_id
+    db.session.rollback()
+    return None
+
+
+def _progress_writer(job_id):
+    """
+    progress(rows) callback that records progress at most every PROGRESS_INTERVAL seconds on a
+    separate connection (the export holds the session's cursor open). Skipped on SQLite, where
+    that write would wait on the export's read lock; progress is then only set at the end.
+    """
+    if db.engine.dialect.name == "sqlite":
+        return None
+    last = [0.0]
+
+    def progress(rows):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        with db.engine.begin() as conn:
+            conn.execute(update(ExportJob).where(ExportJob.id == job_id).values(progress=rows))
+
+    return progress
+
+
+def _write_artifact(job, path, progress):
+    from app.services import report_service as reports
+    params = json.loads(job.params)
+    start = datetime.combine(datetime.strptime(params["start"], "%Y-%m-%d").date(), datetime.min.time())
+    end = datetime.combine(datetime.strptime(params["end"], "%Y-%m-%d").date(), datetime.max.time())
+    rows = [0]
+
+    def track(done):
+        rows[0] = done
+        if progress:
+            progress(done)
+
+    with open(path, "wb") as out:
+        if job.kind == "csv":
+            for chunk in reports.export_sales_csv(start, end):
+                out.write(chunk.encode("utf-8"))
+                rows[0] += chunk.count("\n")
+            rows[0] -= 1  # header
+        elif job.kind == "excel":
+            if reports.export_sales_excel_io(start, end, row_limit=params.get("row_limit"), progress=track, out=out) is None:
+                raise RuntimeError("Excel export not available")
+        else:
+            if reports.export_sales_pdf_io(start, end, store_name=params.get("store_name", "Grocery Store"),
+                                           row_limit=params.get("row_limit"), progress=track, out=out) is None:
+                raise RuntimeError("PDF export not available")
+    return rows[0]
+
+
+def run_job(job_id):
+    """Build the artifact for a claimed (running) job and record the outcome."""
+    job = get_job(job_id)
+    if job is None or job.status != "running":
+        return None
+    ext, _ = EXPORT_KINDS[job.kind]
+    path = os.path.join(get_export_dir(), f"{job.id}.{ext}")
+    tmp_path = path + ".part"
+    try:
+        rows = _write_artifact(job, tmp_path, _progress_writer(job.id))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Export job %s failed", job_id)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job = get_job(job_id)
+        job.status = "failed"
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return job
+    db.session.rollback()
+    job = get_job(job_id)
+    now = datetime.utcnow()
+    job.status = "done"
+    job.progress = rows
+    job.artifact_path = path
+    job.finished_at = now
+    job.expires_at = now + timedelta(seconds=current_app.config.get("EXPORT_ARTIFACT_TTL", 3600))
+    db.session.commit()
+    return job
+
+
+def purge_expired_exports(stale_after=None):
+    """
+    Delete expired artifacts and their jobs (and old failed jobs), and fail jobs stuck in
+    running for longer than `stale_after` (timedelta; default EXPORT_JOB_TIMEOUT) after a
+    worker died. Returns (removed, failed_stale).
+    """
+    now = datetime.utcnow()
+    ttl = timedelta(seconds=current_app.config.get("EXPORT_ARTIFACT_TTL", 3600))
+    stale_after = stale_after or timedelta(seconds=current_app.config.get("EXPORT_JOB_TIMEOUT", 1800))
+    expired = ExportJob.query.filter(db.or_(
+        ExportJob.expires_at < now,
+        db.and_(ExportJob.status == "failed", ExportJob.finished_at < now - ttl),
+    )).all()
+    for job in expired:
+        if job.artifact_path and os.path.exists(job.artifact_path):
+            os.remove(job.artifact_path)
+        db.session.delete(job)
+    failed_stale = db.session.execute(
+        update(ExportJob)
+        .where(ExportJob.status == "running", ExportJob.started_at < now - stale_after)
+        .values(status="failed", error="Worker stopped before the export finished", finished_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return len(expired), failed_stale
+
+
+def work(app, stop_event, wake_event=None, poll_interval=1.0, once=False):
+    """
+    Worker loop: claim and run jobs until stop_event is set (or the queue is empty with once).
+    Purges expired artifacts every PURGE_INTERVAL seconds.
+    """
+    last_purge = 0.0
+    while not stop_event.is_set():
+        job_id = None
+        with app.app_context():
+            try:
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    purge_expired_exports()
+                    last_purge = time.monotonic()
+                job_id = claim_next_job()
+                if job_id:
+                    run_job(job_id)
+            except Exception:
+                logger.exception("Export worker error")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        if job_id:
+            continue
+        if once:
+            return
+        if wake_event is not None:
+            wake_event.wait(poll_interval)
+            wake_event.clear()
+        else:
+            stop_event.wait(poll_interval)
+
+
+class ExportWorkerPool:
+    """Daemon worker threads for one process; started lazily by enqueue_export."""
+
+    def __init__(self, app, threads=2, poll_interval=1.0):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started or self.threads <= 0:
+                return
+            self._started = True
+            for i in range(self.threads):
+                threading.Thread(
+                    target=work,
+                    args=(self.app, self._stop, self._wake, self.poll_interval),
+                    name=f"export-worker-{i}",
+                    daemon=True,
+                ).start()
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def init_job_queue(app):
+    pool = ExportWorkerPool(
+        app,
+        threads=app.config.get("EXPORT_WORKER_THREADS", 2),
+        poll_interval=app.config.get("EXPORT_POLL_INTERVAL", 1.0),
+    )
+    app.extensions["export_workers"] = pool
+    return pool
+
+
+def _ensure_workers():
+    pool = current_app.extensions.get("export_workers")
+    if pool is not None:
+        pool.start()
+        pool.notify()
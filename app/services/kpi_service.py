@@ -0,0 +1,212 @@
+"""
+Dashboard KPIs (today's revenue and transactions, low-stock and near-expiry counts, top sellers)
+and the default analytics window, served from a per-process stale-while-revalidate cache.
+
+Requests always get the cached value, however old; a value older than KPI_CACHE_TTL, or
+invalidated by a committed checkout/refund, is recomputed by a daemon refresher thread. Only a
+cold miss computes inline, and the dashboards avoid even that (wait=False): they render
+placeholders and poll main.dashboard_kpis, which answers 202 until the refresher has the tiles.
+Today's tiles are keyed by date, so a value computed before midnight is never served as the next
+day's.
+
+Other worker processes do not see the invalidation, so their values are up to KPI_CACHE_TTL old.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+from app import db
+from app.models.product import Product
+from app.services import report_service as reports
+
+_CHANGED_KEY = "kpi_changed"
+TODAY = "today"
+
+
+def today_kpis(top=5, near_expiry_days=7, today=None):
+    today = today or date.today()
+    start = datetime.combine(today, datetime.min.time())
+    end = datetime.combine(today, datetime.max.time())
+    summary = reports.sales_summary(start, end)
+    low_stock = db.session.query(func.count(Product.id)).filter(Product.quantity <= Product.min_stock).scalar()
+    near_expiry = db.session.query(func.count(Product.id)).filter(
+        Product.expiration_date.isnot(None),
+        Product.expiration_date <= today + timedelta(days=near_expiry_days),
+    ).scalar()
+    return {
+        "day": today.isoformat(),
+        "revenue": summary["total_sales"],
+        "transactions": summary["transaction_count"],
+        "low_stock": low_stock or 0,
+        "near_expiry": near_expiry or 0,
+        "top_sellers": reports.best_selling_products(start, end, limit=top),
+    }
+
+
+def analytics_window(start_date, end_date):
+    """Summary, daily rows and top 10 products for the analytics dashboard."""
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(end_date, datetime.max.time())
+    return {
+        "summary": reports.sales_summary(start, end),
+        "daily": reports.sales_report(start, end),
+        "best_selling": reports.best_selling_products(start, end, limit=10),
+    }
+
+
+class KPICache:
+    """
+    key -> (value, computed_at) with a loader per key. Keys not read for `idle_after` seconds
+    are dropped instead of refreshed.
+    """
+
+    def __init__(self, app, ttl=60, idle_after=3600, debounce=1.0):
+        self.app = app
+        self.ttl = ttl
+        self.idle_after = idle_after
+        self.debounce = debounce
+        self._entries = {}  # key -> {"value", "computed_at", "read_at", "stale", "loader"}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, key, loader, wait=True):
+        """
+        The cached value for key, scheduling a refresh when it is stale. On a cold miss the
+        value is computed inline when `wait`, else None is returned and the refresher loads it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["read_at"] = now
+                if entry["stale"] or now - entry["computed_at"] >= self.ttl:
+                    self._wake.set()
+                value = entry["value"]
+            else:
+                self._entries[key] = {"value": None, "computed_at": float("-inf"), "read_at": now,
+                                      "stale": True, "loader": loader}
+                value = None
+        self._ensure_thread()
+        if value is None and wait:
+            value = self._load(key, loader)
+        elif value is None:
+            self._wake.set()
+        return value
+
+    def invalidate(self):
+        """Mark every entry stale; the refresher recomputes them (readers keep the old values)."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry["stale"] = True
+        self._wake.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, key, loader):
+        value = loader()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.update(value=value, computed_at=time.monotonic(), stale=False)
+        return value
+
+    def _due(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if now - e["read_at"] > self.idle_after]:
+                del self._entries[key]
+            return [
+                (key, e["loader"]) for key, e in self._entries.items()
+                if e["stale"] or now - e["computed_at"] >= self.ttl
+            ]
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.ttl)
+            if self._stop.is_set():
+                return
+            # let a burst of checkouts settle into one refresh
+            self._stop.wait(self.debounce)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    for key, loader in self._due():
+                        self._load(key, loader)
+                except Exception:
+                    self.app.logger.exception("KPI refresh failed")
+                finally:
+                    db.session.remove()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kpi-refresh", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def init_kpi_cache(app):
+    cache = None
+    if app.config.get("KPI_CACHE_ENABLED", True):
+        cache = KPICache(
+            app,
+            ttl=app.config.get("KPI_CACHE_TTL", 60),
+            idle_after=app.config.get("KPI_CACHE_IDLE", 3600),
+        )
+    app.extensions["kpi_cache"] = cache
+    return cache
+
+
+def get_kpi_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("kpi_cache")
+
+
+def _cached(key, loader, wait):
+    cache = get_kpi_cache()
+    if cache is None:
+        return loader()
+    return cache.get(key, loader, wait=wait)
+
+
+def get_today_kpis(wait=True):
+    """Today's KPI tiles; with wait=False, None while the cache is still cold."""
+    top = current_app.config.get("KPI_TOP_SELLERS", 5)
+    days = current_app.config.get("KPI_NEAR_EXPIRY_DAYS", 7)
+    today = date.today()
+    return _cached((TODAY, today), lambda: today_kpis(top, days, today), wait)
+
+
+def get_analytics_window(start_date, end_date, wait=True):
+    """Default analytics window; with wait=False, None while the cache is still cold."""
+    return _cached(("analytics", start_date, end_date), lambda: analytics_window(start_date, end_date), wait)
+
+
+def mark_changed():
+    """Called by checkout/refund: invalidate the KPIs once the current transaction commits."""
+    db.session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    if not session.info.pop(_CHANGED_KEY, False):
+        return
+    cache = get_kpi_cache()
+    if cache is not None:
+        cache.invalidate()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_CHANGED_KEY, None)
@@ -0,0 +1,208 @@
+"""
+Per-process product lookup cache for POS scanning.
+
+Holds immutable ProductSnapshot objects indexed by id, SKU and barcode with LRU eviction, so a
+scan of a known code costs no database round trip. Entries are invalidated when a transaction
+that changed those products commits:
+
+- ORM flushes of Product rows (add/edit/delete, batch updates) are picked up in after_flush;
+- bulk UPDATE/DELETE statements on products are picked up in do_orm_execute. They can pass
+  execution_options(changed_product_ids=[...]) to invalidate only those rows; otherwise the
+  whole cache is cleared.
+
+Other worker processes do not see these events, so entries also expire after PRODUCT_CACHE_TTL
+seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from app import db
+from app.models.product import Product
+
+_CHANGED_KEY = "product_cache_changed"
+_ALL = object()
+
+
+class ProductSnapshot:
+    """Read-only copy of the Product columns the POS needs; safe to share between requests."""
+
+    __slots__ = ("id", "name", "price", "quantity", "unit", "sku", "barcode", "min_stock", "category_id")
+
+    def __init__(self, id, name, price, quantity, unit, sku, barcode, min_stock, category_id=None):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.unit = unit
+        self.sku = sku
+        self.barcode = barcode
+        self.min_stock = min_stock
+        self.category_id = category_id
+
+    @classmethod
+    def from_product(cls, p):
+        return cls(p.id, p.name, p.price, p.quantity, p.unit, p.sku, p.barcode, p.min_stock, p.category_id)
+
+    @property
+    def is_low_stock(self) -> bool:
+        return self.quantity <= self.min_stock
+
+    def __repr__(self):
+        return f"<ProductSnapshot {self.name} ({self.sku})>"
+
+
+class ProductLookupCache:
+    def __init__(self, maxsize=5000, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._by_id = OrderedDict()  # id -> (snapshot, loaded_at), LRU order
+        self._by_sku = {}
+        self._by_barcode = {}
+        self._missing_ids = OrderedDict()  # ids known not to exist -> loaded_at
+        self._lock = threading.Lock()
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at < self.ttl
+
+    def get(self, product_id):
+        with self._lock:
+            entry = self._by_id.get(product_id)
+            if entry is None:
+                return None
+            if not self._fresh(entry[1]):
+                self._drop(product_id)
+                return None
+            self._by_id.move_to_end(product_id)
+            return entry[0]
+
+    def get_by_sku(self, sku):
+        product_id = self._by_sku.get(sku)
+        return self.get(product_id) if product_id is not None else None
+
+    def get_by_barcode(self, barcode):
+        product_id = self._by_barcode.get(barcode)
+        return self.get(product_id) if product_id is not None else None
+
+    def is_missing(self, product_id):
+        with self._lock:
+            loaded_at = self._missing_ids.get(product_id)
+            return loaded_at is not None and self._fresh(loaded_at)
+
+    def put(self, snapshot):
+        with self._lock:
+            self._drop(snapshot.id)
+            self._missing_ids.pop(snapshot.id, None)
+            self._by_id[snapshot.id] = (snapshot, time.monotonic())
+            if snapshot.sku:
+                self._by_sku[snapshot.sku] = snapshot.id
+            if snapshot.barcode:
+                self._by_barcode[snapshot.barcode] = snapshot.id
+            while len(self._by_id) > self.maxsize:
+                self._drop(next(iter(self._by_id)))
+        return snapshot
+
+    def put_missing(self, product_id):
+        with self._lock:
+            self._missing_ids[product_id] = time.monotonic()
+            self._missing_ids.move_to_end(product_id)
+            while len(self._missing_ids) > self.maxsize:
+                self._missing_ids.popitem(last=False)
+
+    def _drop(self, product_id):
+        entry = self._by_id.pop(product_id, None)
+        if entry is None:
+            return
+        snapshot = entry[0]
+        if snapshot.sku and self._by_sku.get(snapshot.sku) == product_id:
+            del self._by_sku[snapshot.sku]
+        if snapshot.barcode and self._by_barcode.get(snapshot.barcode) == product_id:
+            del self._by_barcode[snapshot.barcode]
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                self._drop(product_id)
+                self._missing_ids.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_sku.clear()
+            self._by_barcode.clear()
+            self._missing_ids.clear()
+
+    def __len__(self):
+        return len(self._by_id)
+
+
+def init_product_cache(app):
+    cache = None
+    if app.config.get("PRODUCT_CACHE_ENABLED", True):
+        cache = ProductLookupCache(
+            maxsize=app.config.get("PRODUCT_CACHE_SIZE", 5000),
+            ttl=app.config.get("PRODUCT_CACHE_TTL", 30),
+        )
+    app.extensions["product_cache"] = cache
+    return cache
+
+
+def get_product_cache():
+    """The app's ProductLookupCache, or None when disabled / outside an app context."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("product_cache")
+
+
+def _mark_changed(session, product_ids):
+    changed = session.info.get(_CHANGED_KEY)
+    if changed is _ALL:
+        return
+    if product_ids is _ALL:
+        session.info[_CHANGED_KEY] = _ALL
+        return
+    if changed is None:
+        changed = session.info[_CHANGED_KEY] = set()
+    changed.update(product_ids)
+
+
+@event.listens_for(db.session, "after_flush")
+def _after_flush(session, flush_context):
+    ids = [
+        obj.id
+        for objs in (session.new, session.dirty, session.deleted)
+        for obj in objs
+        if isinstance(obj, Product) and obj.id is not None
+    ]
+    if ids:
+        _mark_changed(session, ids)
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _on_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if not any(m.class_ is Product for m in orm_execute_state.all_mappers):
+        return
+    product_ids = orm_execute_state.execution_options.get("changed_product_ids")
+    _mark_changed(orm_execute_state.session, _ALL if product_ids is None else product_ids)
+
+
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if changed is None:
+        return
+    cache = get_product_cache()
+    if cache is None:
+        return
+    if changed is _ALL:
+        cache.clear()
+    else:
+        cache.invalidate(changed)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_CHANGED_KEY, None)
@@ -0,0 +1,354 @@
+"""
+Promotion engine: prices a cart against the active promotions in memory, in one pass.
+
+Promotions are compiled once into CompiledPromotion objects and indexed by product, category
+and basket scope (ActivePromotions). A view covers the interval between two validity boundaries
+(valid_from / valid_to of any loaded promotion), so a promotion starting or ending at 09:00 takes
+effect at 09:00 without a query; the view is rebuilt from the loaded list when the clock crosses
+a boundary. PromotionCache reloads from the database when a transaction that changed promotions
+commits, and every PROMOTION_CACHE_TTL seconds (other workers' edits).
+
+Rule types (promo_type) and what `value` means:
+- percentage: value % off the matching lines (scope product/category) or the basket;
+- fixed: value off each matching unit, or off the basket;
+- bogo: buy `buy_quantity`, get `get_quantity` at value % off (100 = free), cheapest units first;
+- multibuy: `buy_quantity` units for a total of value (e.g. 3 for 5.00);
+- tiered: tiers [{"min": m, "value": pct}], the highest reached min wins; min counts matching
+  units (product/category) or basket spend (basket).
+
+Each cart line gets at most one item-level promotion: candidates are applied greedily, largest
+discount first. Then the best basket-level promotion is applied to what is left. Automatic
+promotions always take part; others only when selected at checkout (promotion_id).
+
+All arithmetic is on ints (app.utils.money): prices in cents, percentages in basis points.
+A discount is held exactly, in cents x basis points, until it is rounded half-even to cents.
+"""
+import bisect
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from app import db
+from app.models.promotion import Promotion
+from app.utils.money import PERCENT, div_round, to_basis_points, to_cents
+
+logger = logging.getLogger(__name__)
+
+PROMO_TYPES = ("percentage", "fixed", "bogo", "multibuy", "tiered")
+SCOPES = ("basket", "product", "category")
+_CHANGED_KEY = "promotions_changed"
+_EPSILON = timedelta(microseconds=1)  # valid_to is inclusive
+
+
+class CompiledPromotion:
+    """
+    Immutable, validated copy of a Promotion row; evaluates its discount on a pool of cart units.
+    value is in cents (fixed, multibuy) or basis points (percentage, bogo, tiered); both are the
+    Numeric value x 100. tiers are (min, basis points), min in units or, for a basket, cents.
+    """
+
+    __slots__ = ("id", "name", "promo_type", "scope", "value", "min_purchase", "product_id", "category_id",
+                 "buy_quantity", "get_quantity", "tiers", "automatic", "valid_from", "valid_to")
+
+    def __init__(self, id, name, promo_type, value, scope="basket", min_purchase=None, product_id=None,
+                 category_id=None, buy_quantity=None, get_quantity=None, tiers=None, automatic=False,
+                 valid_from=None, valid_to=None):
+        self.id = id
+        self.name = name
+        self.promo_type = promo_type
+        self.scope = scope or "basket"
+        self.value = to_cents(value or 0)
+        self.min_purchase = to_cents(min_purchase or 0)
+        self.product_id = product_id
+        self.category_id = category_id
+        self.buy_quantity = buy_quantity
+        self.get_quantity = get_quantity
+        self.tiers = tuple(sorted(((self._tier_min(t["min"]), to_basis_points(t["value"])) for t in tiers or ()),
+                                  reverse=True))
+        self.automatic = bool(automatic)
+        self.valid_from = valid_from
+        self.valid_to = valid_to
+        error = self.rule_error()
+        if error:
+            raise ValueError(f"Promotion {id} ({name}): {error}")
+
+    @classmethod
+    def from_model(cls, p):
+        return cls(
+            p.id, p.name, p.promo_type, p.value, scope=p.scope, min_purchase=p.min_purchase,
+            product_id=p.product_id, category_id=p.category_id, buy_quantity=p.buy_quantity,
+            get_quantity=p.get_quantity, tiers=json.loads(p.tiers) if p.tiers else None,
+            automatic=p.automatic, valid_from=p.valid_from, valid_to=p.valid_to,
+        )
+
+    def rule_error(self):
+        if self.promo_type not in PROMO_TYPES:
+            return f"unknown type {self.promo_type!r}"
+        if self.scope not in SCOPES:
+            return f"unknown scope {self.scope!r}"
+        if self.scope == "product" and self.product_id is None:
+            return "product scope needs product_id"
+        if self.scope == "category" and self.category_id is None:
+            return "category scope needs category_id"
+        if self.promo_type in ("bogo", "multibuy"):
+            if self.scope == "basket":
+                return f"{self.promo_type} needs a product or category scope"
+            if not self.buy_quantity or self.buy_quantity < 1:
+                return "buy_quantity must be at least 1"
+        if self.promo_type == "bogo" and (not self.get_quantity or self.get_quantity < 1):
+            return "get_quantity must be at least 1"
+        if self.promo_type == "tiered" and not self.tiers:
+            return "tiered promotion without tiers"
+        return None
+
+    def _tier_min(self, minimum):
+        if self.scope == "basket":
+            return to_cents(minimum)
+        return math.ceil(to_cents(minimum) / 100)  # units; 2.5 means 3
+
+    def active_at(self, now):
+        return (self.valid_from is None or self.valid_from <= now) and (self.valid_to is None or now <= self.valid_to)
+
+    def _tier(self, reached):
+        for minimum, value in self.tiers:
+            if reached >= minimum:
+                return value
+        return None
+
+    def pool_discount(self, runs, units, amount):
+        """
+        Exact discount (cents x basis points) on matching lines: runs = [(unit price cents,
+        quantity)] sorted by price ascending, units = total quantity, amount = their subtotal cents.
+        """
+        kind = self.promo_type
+        if kind == "percentage":
+            return amount * self.value
+        if kind == "fixed":
+            return sum(min(self.value, price) * qty for price, qty in runs) * PERCENT
+        if kind == "tiered":
+            return amount * (self._tier(units) or 0)
+        if kind == "bogo":
+            free = units // (self.buy_quantity + self.get_quantity) * self.get_quantity
+            return _cheapest(runs, free) * (self.value or PERCENT)
+        # multibuy
+        groups = units // self.buy_quantity
+        regular = _cheapest(runs, groups * self.buy_quantity)
+        return max(regular - self.value * groups, 0) * PERCENT
+
+    def basket_discount(self, amount):
+        """Exact discount (cents x basis points) on a basket of `amount` cents."""
+        if self.promo_type == "percentage":
+            return amount * self.value
+        if self.promo_type == "fixed":
+            return min(self.value, amount) * PERCENT
+        return amount * (self._tier(amount) or 0)  # tiered on spend
+
+    def __repr__(self):
+        return f"<CompiledPromotion {self.id} {self.promo_type}/{self.scope}>"
+
+
+def _cheapest(runs, count):
+    """Total price of the `count` cheapest units in ascending (price, quantity) runs."""
+    total = 0
+    for price, qty in runs:
+        if count <= 0:
+            break
+        take = min(qty, count)
+        total += price * take
+        count -= take
+    return total
+
+
+class ActivePromotions:
+    """The promotions active in [valid_since, valid_until), indexed for cart evaluation."""
+
+    __slots__ = ("by_id", "by_product", "by_category", "basket", "selectable", "valid_since", "valid_until")
+
+    def __init__(self, promotions, now, boundaries=None):
+        if boundaries is None:
+            boundaries = _boundaries(promotions)
+        i = bisect.bisect_right(boundaries, now)
+        self.valid_since = boundaries[i - 1] if i else None
+        self.valid_until = boundaries[i] if i < len(boundaries) else None
+        self.by_id, self.by_product, self.by_category, self.basket, self.selectable = {}, {}, {}, [], []
+        for promo in promotions:
+            if not promo.active_at(now):
+                continue
+            self.by_id[promo.id] = promo
+            if not promo.automatic:
+                self.selectable.append(promo)
+            if promo.scope == "product":
+                self.by_product.setdefault(promo.product_id, []).append(promo)
+            elif promo.scope == "category":
+                self.by_category.setdefault(promo.category_id, []).append(promo)
+            else:
+                self.basket.append(promo)
+
+    def covers(self, now):
+        return (self.valid_since is None or self.valid_since <= now) and (self.valid_until is None or now < self.valid_until)
+
+    def price(self, lines, subtotal=None, promotion_id=None):
+        """
+        (discount, applied) in cents for CartLine objects (product_id, price_cents, quantity,
+        subtotal_cents, category_id): applied is [{"id", "name", "cents"}] in the order applied.
+        No database access.
+        """
+        selected = self.by_id.get(promotion_id) if promotion_id else None
+        pools = {}  # promotion -> [line, ...]
+        total = 0
+        for line in lines:
+            total += line.subtotal_cents
+            for promo in self.by_product.get(line.product_id, ()):
+                if promo.automatic or promo is selected:
+                    pools.setdefault(promo, []).append(line)
+            category_id = line.category_id
+            if category_id is not None:
+                for promo in self.by_category.get(category_id, ()):
+                    if promo.automatic or promo is selected:
+                        pools.setdefault(promo, []).append(line)
+        subtotal = total if subtotal is None else subtotal
+
+        candidates = []
+        for promo, pool in pools.items():
+            if promo.min_purchase > subtotal:
+                continue
+            discount = _pool_discount(promo, pool)
+            if discount > 0:
+                candidates.append((discount, promo, pool))
+        candidates.sort(key=lambda c: (-c[0], c[1].id))
+        claimed, applied, item_discount = set(), [], 0
+        for discount, promo, pool in candidates:
+            ids = {line.product_id for line in pool}
+            if ids & claimed:
+                continue
+            claimed |= ids
+            discount = div_round(discount, PERCENT)
+            item_discount += discount
+            applied.append({"id": promo.id, "name": promo.name, "cents": discount})
+
+        remaining = subtotal - item_discount
+        best = None
+        for promo in self.basket:
+            if (promo.automatic or promo is selected) and promo.min_purchase <= remaining:
+                discount = div_round(min(promo.basket_discount(remaining), remaining * PERCENT), PERCENT)
+                if discount > 0 and (best is None or discount > best[0]):
+                    best = (discount, promo)
+        if best:
+            applied.append({"id": best[1].id, "name": best[1].name, "cents": best[0]})
+            item_discount += best[0]
+        return min(item_discount, subtotal), applied
+
+
+def _pool_discount(promo, pool):
+    runs = sorted((line.price_cents, line.quantity) for line in pool)
+    units = sum(qty for _, qty in runs)
+    amount = sum(line.subtotal_cents for line in pool)
+    return min(promo.pool_discount(runs, units, amount), amount * PERCENT)
+
+
+def _boundaries(promotions):
+    instants = set()
+    for promo in promotions:
+        if promo.valid_from is not None:
+            instants.add(promo.valid_from)
+        if promo.valid_to is not None:
+            instants.add(promo.valid_to + _EPSILON)
+    return sorted(instants)
+
+
+def load_promotions(now=None):
+    """Compile every enabled promotion that has not ended; invalid rules are logged and skipped."""
+    now = now or datetime.utcnow()
+    rows = Promotion.query.filter(
+        Promotion.active.is_(True),
+        (Promotion.valid_to.is_(None)) | (Promotion.valid_to >= now),
+    ).all()
+    compiled = []
+    for row in rows:
+        try:
+            compiled.append(CompiledPromotion.from_model(row))
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Skipping promotion: %s", e)
+    return compiled
+
+
+class PromotionCache:
+    """Per-process compiled promotions; a DB reload on change or TTL, a re-index at validity boundaries."""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._promotions = None
+        self._boundaries = ()
+        self._loaded_at = 0.0
+        self._view = None
+        self._lock = threading.Lock()
+
+    def view(self, now=None):
+        now = now or datetime.utcnow()
+        view = self._view
+        if view is not None and time.monotonic() - self._loaded_at < self.ttl and view.covers(now):
+            return view
+        with self._lock:
+            if self._promotions is None or time.monotonic() - self._loaded_at >= self.ttl:
+                promotions = load_promotions(now)
+                self._promotions, self._boundaries = promotions, _boundaries(promotions)
+                self._loaded_at = time.monotonic()
+            view = self._view = ActivePromotions(self._promotions, now, self._boundaries)
+        return view
+
+    def invalidate(self):
+        with self._lock:
+            self._promotions = None
+            self._view = None
+
+
+def init_promotion_cache(app):
+    cache = PromotionCache(ttl=app.config.get("PROMOTION_CACHE_TTL", 60))
+    app.extensions["promotion_cache"] = cache
+    return cache
+
+
+def get_promotion_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("promotion_cache")
+
+
+def active_promotions(now=None):
+    """The current ActivePromotions view (cached; built from the database without a cache)."""
+    cache = get_promotion_cache()
+    if cache is not None:
+        return cache.view(now)
+    now = now or datetime.utcnow()
+    return ActivePromotions(load_promotions(now), now)
+
+
+@event.listens_for(db.session, "after_flush")
+def _after_flush(session, flush_context):
+    if any(isinstance(obj, Promotion) for objs in (session.new, session.dirty, session.deleted) for obj in objs):
+        session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _on_orm_execute(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        m.class_ is Promotion for m in orm_execute_state.all_mappers
+    ):
+        orm_execute_state.session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    if session.info.pop(_CHANGED_KEY, None):
+        cache = get_promotion_cache()
+        if cache is not None:
+            cache.invalidate()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_CHANGED_KEY, None)
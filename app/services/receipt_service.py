@@ -0,0 +1,181 @@
+"""
+Receipts: rendered once and stored in `receipts`, keyed by sale id.
+
+Checkout and refund write the receipt in the same transaction as the sale, from data they
+already hold, so a reprint is a single primary-key read. Sales without a stored receipt (older
+than this cache) are rendered from one joined query on first view and stored then.
+
+Each receipt keeps an HTML card (with the QR code inlined as SVG), fixed-width text for ESC/POS
+printers and, optionally, a PDF rendered from that text.
+"""
+from decimal import Decimal
+from io import BytesIO
+from flask import current_app, render_template
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.config import Config
+from app.models.product import Product
+from app.models.receipt import Receipt
+from app.models.sale import Sale, SaleItem
+
+
+def _store_info():
+    return {
+        "name": getattr(Config, "STORE_NAME", "Grocery Store"),
+        "address": getattr(Config, "STORE_ADDRESS", ""),
+        "phone": getattr(Config, "STORE_PHONE", ""),
+    }
+
+
+def _sale_dict(sale):
+    return {
+        "id": sale.id,
+        "created_at": sale.created_at,
+        "subtotal": sale.subtotal,
+        "tax_amount": sale.tax_amount,
+        "discount_amount": sale.discount_amount,
+        "total": sale.total,
+        "payment_method": sale.payment_method,
+    }
+
+
+def load_receipt_data(sale_id):
+    """
+    Sale header and lines [{name, quantity, unit_price, subtotal}] from one joined query.
+    Returns (sale, lines), or (None, None) when the sale does not exist.
+    """
+    rows = db.session.query(Sale, SaleItem.quantity, SaleItem.unit_price, SaleItem.subtotal, Product.name).outerjoin(
+        SaleItem, SaleItem.sale_id == Sale.id
+    ).outerjoin(
+        Product, Product.id == SaleItem.product_id
+    ).filter(Sale.id == sale_id).order_by(SaleItem.id).all()
+    if not rows:
+        return None, None
+    lines = [
+        {"name": name or "-", "quantity": quantity, "unit_price": unit_price, "subtotal": subtotal}
+        for _, quantity, unit_price, subtotal, name in rows
+        if quantity is not None
+    ]
+    return _sale_dict(rows[0][0]), lines
+
+
+def qr_payload(sale):
+    created = sale["created_at"].strftime("%Y%m%d%H%M%S") if sale["created_at"] else ""
+    return f"RECEIPT:{sale['id']}:{sale['total']}:{created}"
+
+
+def _qr_svg(data):
+    try:
+        import qrcode
+        import qrcode.image.svg
+    except ImportError:
+        return None
+    img = qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage, box_size=8, border=2)
+    return img.to_string(encoding="unicode")
+
+
+def _money(value):
+    return f"{Decimal(str(value)):.2f}" if value is not None else ""
+
+
+def render_text(sale, lines, store, width=None):
+    """Fixed-width receipt for ESC/POS printers (RECEIPT_WIDTH columns)."""
+    width = width or current_app.config.get("RECEIPT_WIDTH", 42)
+    rule = "-" * width
+
+    def pair(left, right):
+        return left[:max(width - len(right) - 1, 1)].ljust(width - len(right)) + right
+
+    out = [store["name"].center(width)]
+    for extra in (store["address"], store["phone"]):
+        if extra:
+            out.append(extra.center(width))
+    out += [rule, pair(f"Receipt #{sale['id']}", sale["created_at"].strftime("%Y-%m-%d %H:%M") if sale["created_at"] else ""), rule]
+    for line in lines:
+        out.append(line["name"][:width])
+        out.append(pair(f"  {line['quantity']} x {_money(line['unit_price'])}", _money(line["subtotal"])))
+    out += [
+        rule,
+        pair("Subtotal", _money(sale["subtotal"])),
+        pair("Tax", _money(sale["tax_amount"])),
+        pair("Discount", _money(sale["discount_amount"])),
+        pair("TOTAL", _money(sale["total"])),
+        pair("Payment", sale["payment_method"] or ""),
+        rule,
+        "Thank you!".center(width),
+    ]
+    return "\n".join(out) + "\n"
+
+
+def render_pdf(text):
+    """Receipt PDF (80 mm roll) from the stored text; None if reportlab is missing."""
+    try:
+        from reportlab.lib.units import mm
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        return None
+    text_lines = text.splitlines()
+    font_size, leading = 8, 10
+    page_width = 80 * mm
+    page_height = 10 * mm + leading * len(text_lines)
+    bio = BytesIO()
+    c = canvas.Canvas(bio, pagesize=(page_width, page_height))
+    obj = c.beginText(4 * mm, page_height - 5 * mm - font_size)
+    obj.setFont("Courier", font_size)
+    obj.setLeading(leading)
+    for line in text_lines:
+        obj.textLine(line)
+    c.drawText(obj)
+    c.showPage()
+    c.save()
+    return bio.getvalue()
+
+
+def build_receipt(sale, lines):
+    """Render an (unsaved) Receipt from a sale dict and its lines."""
+    store = _store_info()
+    qr_svg = _qr_svg(qr_payload(sale)) if current_app.config.get("RECEIPT_QR", True) else None
+    html = render_template("pos/_receipt_card.html", sale=sale, lines=lines, store=store, qr_svg=qr_svg)
+    text = render_text(sale, lines, store)
+    pdf = render_pdf(text) if current_app.config.get("RECEIPT_PDF_AT_CHECKOUT", False) else None
+    return Receipt(sale_id=sale["id"], html=html, text=text, pdf=pdf)
+
+
+def record_receipt(sale, lines):
+    """
+    Add the receipt for a sale flushed in the current transaction; the caller commits.
+    lines: [{name, quantity, unit_price, subtotal}].
+    """
+    db.session.add(build_receipt(_sale_dict(sale), lines))
+
+
+def get_receipt(sale_id):
+    """The stored receipt, rendering and storing it first for sales that predate the cache."""
+    receipt = db.session.get(Receipt, sale_id)
+    if receipt is not None:
+        return receipt
+    sale, lines = load_receipt_data(sale_id)
+    if sale is None:
+        return None
+    receipt = build_receipt(sale, lines)
+    db.session.add(receipt)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # rendered concurrently by another request
+        receipt = db.session.get(Receipt, sale_id)
+    return receipt
+
+
+def get_receipt_pdf(sale_id):
+    """PDF bytes for a receipt, rendered from its text and stored on first request."""
+    receipt = get_receipt(sale_id)
+    if receipt is None:
+        return None
+    if receipt.pdf is None:
+        pdf = render_pdf(receipt.text)
+        if pdf is None:
+            return None
+        receipt.pdf = pdf
+        db.session.commit()
+    return receipt.pdf
@@ -0,0 +1,598 @@
+"""
+Offline register mode: a till runs on its own local database (normally SQLite) and syncs with
+the central one, so scans and checkouts never wait on the store's database link.
+
+Central side (any REGISTER_MODE; tills authenticate with one of REGISTER_SYNC_TOKENS):
+- catalog_page(): a page of the catalogue change feed (app.services.catalog_changes: products
+  changed and deleted since a cursor, stopping REGISTER_CATALOG_LAG seconds short of now) plus a
+  snapshot of the small reference tables checkout reads (users, categories, customers,
+  promotions), sent only when its ETag has changed.
+- apply_register_sales(): records a batch of till sales exactly once each (Sale.client_ref is
+  unique), with the same side effects as create_sale. The goods have already left the store, so
+  stock is decremented even when the central count is short - floored at 0 - and the shortfall
+  is returned to the till as a conflict.
+
+Till side (REGISTER_MODE=offline): sales get a client_ref and wait in the local outbox
+(ix_sales_unsynced). RegisterSync pushes the outbox, then pulls catalogue changes, every
+REGISTER_SYNC_INTERVAL seconds in a background thread (woken early after each checkout), or on
+`flask register-sync`. Pulled stock is the central count less the till's own unpushed sales.
+If the till has been away longer than the central app keeps deletions, it pulls everything again
+and drops the products it did not see.
+Start a till from an empty database: ids are replicated as they are on the central one.
+"""
+import hashlib
+import json
+import logging
+import socket
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app, has_app_context
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.category import Category
+from app.models.customer import Customer
+from app.models.product import Product
+from app.models.promotion import Promotion
+from app.models.register_state import RegisterState
+from app.models.sale import Sale, SaleItem
+from app.models.user import User
+from app.services import catalog_changes as changes
+from app.services import event_bus as events
+from app.services import kpi_service as kpis
+from app.services import receipt_service as receipts
+from app.services import rollup_service as rollups
+from app.utils.money import from_cents, to_cents
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_COLUMNS = ("id", "name", "category_id", "price", "quantity", "unit", "expiration_date", "sku", "barcode",
+                   "min_stock", "updated_at")
+# Reference tables replicated whole; customers without loyalty_points (kept centrally)
+REFERENCE = (
+    ("users", User, ("id", "username", "password_hash", "role", "full_name", "email", "active")),
+    ("categories", Category, ("id", "name", "description")),
+    ("customers", Customer, ("id", "name", "email", "phone")),
+    ("promotions", Promotion, ("id", "name", "promo_type", "value", "min_purchase", "scope", "product_id",
+                               "category_id", "buy_quantity", "get_quantity", "tiers", "automatic", "valid_from",
+                               "valid_to", "active")),
+)
+MAX_PUSH = 1000  # sales accepted per request
+
+
+def _dump(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _rows(model, names, *criteria, order_by=None, limit=None):
+    cols = [model.__table__.c[name] for name in names]
+    stmt = select(*cols).where(*criteria).order_by(*(order_by or (model.__table__.c.id,))).limit(limit)
+    return [{name: _dump(value) for name, value in zip(names, row)} for row in db.session.execute(stmt)]
+
+
+def _load(model, row):
+    """A row from JSON back to the column types of `model`."""
+    out = {}
+    for name, value in row.items():
+        column = model.__table__.c[name]
+        if value is not None:
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is Decimal:
+                value = Decimal(value)
+        out[name] = value
+    return out
+
+
+# -- Central side -----------------------------------------------------------------------------
+
+def reference_snapshot():
+    """(tables, etag): the reference rows a till needs for checkout, and a digest of them."""
+    now = datetime.utcnow()
+    tables = {}
+    for key, model, names in REFERENCE:
+        criteria = ()
+        if model is Promotion:
+            criteria = (Promotion.active.is_(True), (Promotion.valid_to.is_(None)) | (Promotion.valid_to >= now))
+        tables[key] = _rows(model, names, *criteria)
+    body = json.dumps(tables, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return tables, hashlib.sha256(body).hexdigest()[:32]
+
+
+def catalog_page(after=None, reference_etag=None, limit=None):
+    """
+    Catalogue changes after the cursor `after` (None = from the start), oldest first. Returns
+    (payload, error): the change feed page ({"columns", "products", "deleted", "cursor", "more"})
+    plus "reference_etag" and, when it differs from `reference_etag`, "reference".
+    """
+    config = current_app.config
+    payload, err = changes.changes_since(
+        after, limit=limit or config.get("REGISTER_CATALOG_PAGE", 1000), columns=PRODUCT_COLUMNS,
+        lag=config.get("REGISTER_CATALOG_LAG", 5),
+    )
+    if err:
+        return None, err
+    reference, etag = reference_snapshot()
+    payload["reference_etag"] = etag
+    if etag != reference_etag:
+        payload["reference"] = reference
+    return payload, None
+
+
+def apply_register_sales(register_id, sales):
+    """
+    Record a batch of sales pushed by a till. Returns (results, error); results holds one entry
+    per sale, in order: {"ref", "status": "created" | "duplicate" | "rejected", "sale_id",
+    "conflicts": [{product_id, name, wanted, available}], "error"}. A rejected sale (unknown
+    product or user, malformed data) leaves the others unaffected.
+    """
+    if not register_id or not isinstance(sales, list):
+        return None, "register_id and a list of sales are required"
+    if len(sales) > MAX_PUSH:
+        return None, f"At most {MAX_PUSH} sales per request"
+    refs = [s["ref"] for s in sales if isinstance(s, dict) and isinstance(s.get("ref"), str)]
+    existing = dict(db.session.execute(select(Sale.client_ref, Sale.id).where(Sale.client_ref.in_(refs))).all())
+    stock, user_ids = _prefetch(sales)
+    results = []
+    for data in sales:
+        ref = data.get("ref") if isinstance(data, dict) else None
+        if not isinstance(ref, str) or not ref:
+            results.append({"ref": ref, "status": "rejected", "error": "Missing ref"})
+            continue
+        if ref in existing:
+            results.append({"ref": ref, "status": "duplicate", "sale_id": existing[ref]})
+            continue
+        try:
+            with db.session.begin_nested():
+                sale, conflicts = _record_sale(register_id, ref, data, stock, user_ids)
+        except IntegrityError:
+            # Pushed concurrently by a retrying till: the other request recorded it
+            sale_id = db.session.execute(select(Sale.id).where(Sale.client_ref == ref)).scalar()
+            results.append({"ref": ref, "status": "duplicate", "sale_id": sale_id} if sale_id else
+                           {"ref": ref, "status": "rejected", "error": "Constraint violation"})
+            continue
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            results.append({"ref": ref, "status": "rejected", "error": str(e) or type(e).__name__})
+            continue
+        existing[ref] = sale.id
+        if conflicts:
+            logger.warning("Register %s sale %s oversold: %s", register_id, ref, conflicts)
+        results.append({"ref": ref, "status": "created", "sale_id": sale.id, "conflicts": conflicts})
+    db.session.commit()
+    return results, None
+
+
+def _prefetch(sales):
+    """
+    ({product_id: (name, min_stock)}, {user_id}) for a whole batch in two queries. Quantities are
+    not taken from here: _record_sale reads them from the locked rows it updates.
+    """
+    product_ids, user_ids = set(), set()
+    for data in sales:
+        if not isinstance(data, dict):
+            continue
+        try:
+            user_ids.add(int(data.get("user_id")))
+            product_ids.update(int(item["product_id"]) for item in data.get("items") or ())
+        except (KeyError, TypeError, ValueError):
+            continue  # rejected when the sale itself is recorded
+    stock = {
+        row.id: (row.name, row.min_stock)
+        for row in db.session.execute(
+            select(Product.id, Product.name, Product.min_stock).where(Product.id.in_(product_ids))
+        )
+    }
+    users = set(db.session.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    return stock, users
+
+
+def _record_sale(register_id, ref, data, stock, user_ids):
+    """Insert one till sale and its effects in the current (nested) transaction; (sale, conflicts)."""
+    wanted, lines = {}, []
+    for item in data["items"]:
+        pid, qty = int(item["product_id"]), int(item["quantity"])
+        if qty <= 0:
+            raise ValueError(f"Bad quantity for product {pid}")
+        wanted[pid] = wanted.get(pid, 0) + qty
+        lines.append((pid, qty, from_cents(to_cents(item["unit_price"]))))
+    if not wanted:
+        raise ValueError("Sale has no items")
+    missing = sorted(set(wanted) - set(stock))
+    if missing:
+        raise ValueError(f"Unknown product(s) {missing}")
+    if int(data["user_id"]) not in user_ids:
+        raise ValueError(f"Unknown user {data['user_id']}")
+    customer_id = data.get("customer_id")
+    if customer_id is not None and db.session.get(Customer, int(customer_id)) is None:
+        customer_id = None
+    total = from_cents(to_cents(data["total"]))
+    refund = total < 0
+    sale = Sale(
+        user_id=int(data["user_id"]),
+        customer_id=customer_id,
+        subtotal=from_cents(to_cents(data["subtotal"])),
+        tax_amount=from_cents(to_cents(data["tax_amount"])),
+        discount_amount=from_cents(to_cents(data["discount_amount"])),
+        total=total,
+        payment_method=str(data["payment_method"])[:30],
+        loyalty_points_used=int(data.get("loyalty_points_used") or 0),
+        loyalty_points_earned=int(data.get("loyalty_points_earned") or 0),
+        created_at=datetime.fromisoformat(data["created_at"]),
+        client_ref=ref[:64],
+        register_id=str(register_id)[:64],
+        synced_at=datetime.utcnow(),
+    )
+    db.session.add(sale)
+    db.session.flush()
+
+    # Live counts, locked in id order (like reserve_many) until the batch commits
+    before = dict(db.session.execute(
+        select(Product.id, Product.quantity)
+        .where(Product.id.in_(list(wanted)))
+        .order_by(Product.id)
+        .with_for_update()
+    ).all())
+    if len(before) < len(wanted):
+        raise ValueError(f"Unknown product(s) {sorted(set(wanted) - set(before))}")
+    qty_case = case(wanted, value=Product.id)
+    if refund:
+        new_quantity = Product.quantity + qty_case
+        conflicts = []
+    else:
+        new_quantity = case((Product.quantity >= qty_case, Product.quantity - qty_case), else_=0)
+        conflicts = [
+            {"product_id": pid, "name": stock[pid][0], "wanted": qty, "available": before[pid]}
+            for pid, qty in wanted.items() if before[pid] < qty
+        ]
+    db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(wanted)))
+        .values(quantity=new_quantity)
+        .execution_options(synchronize_session=False, changed_product_ids=list(wanted))
+    )
+    sale_items = [{
+        "sale_id": sale.id,
+        "product_id": pid,
+        "quantity": qty,
+        "unit_price": unit_price,
+        "subtotal": unit_price * qty,
+    } for pid, qty, unit_price in lines]
+    db.session.execute(insert(SaleItem), sale_items)
+    rollups.record_sale(sale, sale_items)
+    kpis.mark_changed()
+    receipts.record_receipt(sale, [
+        {"name": stock[si["product_id"]][0], "quantity": si["quantity"], "unit_price": si["unit_price"],
+         "subtotal": si["subtotal"]}
+        for si in sale_items
+    ])
+    if customer_id and not refund:
+        db.session.execute(
+            update(Customer)
+            .where(Customer.id == customer_id)
+            .values(loyalty_points=func.coalesce(Customer.loyalty_points, 0)
+                    - sale.loyalty_points_used + sale.loyalty_points_earned)
+            .execution_options(synchronize_session=False)
+        )
+    for pid, qty in wanted.items():
+        name, min_stock = stock[pid]
+        after = before[pid] + qty if refund else max(before[pid] - qty, 0)
+        events.stock_changed(pid, name, before[pid], after, min_stock)
+    return sale, conflicts
+
+
+# -- Till side --------------------------------------------------------------------------------
+
+def sale_tags():
+    """(client_ref, register_id) for a sale recorded now: set on an offline register, else (None, None)."""
+    sync = get_register_sync()
+    if sync is None:
+        return None, None
+    return uuid.uuid4().hex, sync.register_id
+
+
+def sale_recorded():
+    """Wake the till's sync thread so a new sale is pushed without waiting for the interval."""
+    sync = get_register_sync()
+    if sync is not None:
+        sync.wake()
+
+
+def _get_state(key):
+    row = db.session.get(RegisterState, key)
+    return row.value if row else None
+
+
+def _set_state(key, value):
+    db.session.merge(RegisterState(key=key, value=value, updated_at=datetime.utcnow()))
+
+
+def _upsert(model):
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return None
+
+
+def _replace_rows(model, rows):
+    """Insert or update rows by id (only the given columns are updated)."""
+    if not rows:
+        return
+    stmt = _upsert(model)
+    if stmt is None:
+        for row in rows:
+            db.session.merge(model(**row))
+        return
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={name: stmt.excluded[name] for name in rows[0] if name != "id"},
+    ), rows)
+
+
+def _drop_products(ids):
+    """Remove products deleted centrally; ones this till has sold stay (sale items need them) at 0 stock."""
+    ids = list(set(ids))
+    if not ids:
+        return
+    sold = set(db.session.execute(select(SaleItem.product_id).where(SaleItem.product_id.in_(ids)).distinct()).scalars())
+    if sold:
+        db.session.execute(update(Product).where(Product.id.in_(sold)).values(quantity=0)
+                           .execution_options(synchronize_session=False))
+    db.session.execute(delete(Product).where(Product.id.in_(ids), Product.id.notin_(sold))
+                       .execution_options(synchronize_session=False))
+
+
+def unsynced_quantities():
+    """{product_id: units} sold (net of refunds) by this till's sales not pushed yet."""
+    sign = case((Sale.total < 0, -SaleItem.quantity), else_=SaleItem.quantity)
+    rows = db.session.execute(
+        select(SaleItem.product_id, func.sum(sign))
+        .join(Sale, Sale.id == SaleItem.sale_id)
+        .where(Sale.client_ref.isnot(None), Sale.synced_at.is_(None))
+        .group_by(SaleItem.product_id)
+    ).all()
+    return {pid: int(units) for pid, units in rows}
+
+
+def unsynced_count():
+    return db.session.execute(
+        select(func.count()).select_from(Sale).where(Sale.client_ref.isnot(None), Sale.synced_at.is_(None))
+    ).scalar()
+
+
+def _sale_payload(sale, items):
+    return {
+        "ref": sale.client_ref,
+        "user_id": sale.user_id,
+        "customer_id": sale.customer_id,
+        "payment_method": sale.payment_method,
+        "subtotal": str(sale.subtotal),
+        "tax_amount": str(sale.tax_amount),
+        "discount_amount": str(sale.discount_amount),
+        "total": str(sale.total),
+        "loyalty_points_used": sale.loyalty_points_used or 0,
+        "loyalty_points_earned": sale.loyalty_points_earned or 0,
+        "created_at": (sale.created_at or datetime.utcnow()).isoformat(),
+        "items": [{"product_id": si.product_id, "quantity": si.quantity, "unit_price": str(si.unit_price)}
+                  for si in items],
+    }
+
+
+class RegisterSync:
+    """Pushes this till's outbox to the central API and pulls catalogue changes from it."""
+
+    def __init__(self, app, central_url, token, register_id=None, interval=30, batch_size=200, timeout=15):
+        self.app = app
+        self.central_url = central_url.rstrip("/")
+        self.token = token
+        self.register_id = register_id or socket.gethostname()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+
+    def _request(self, method, path, payload=None, params=None):
+        url = self.central_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload, separators=(",", ":")).encode("utf-8") if payload is not None else None,
+            method=method,
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json",
+                     "Accept": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def push(self):
+        """Send unsynced sales in batches. Returns {"created", "duplicate", "rejected", "conflicts"}."""
+        report = {"created": 0, "duplicate": 0, "rejected": 0, "conflicts": 0}
+        last_id = 0
+        while True:
+            sales = (Sale.query
+                     .filter(Sale.client_ref.isnot(None), Sale.synced_at.is_(None), Sale.id > last_id)
+                     .order_by(Sale.id).limit(self.batch_size).all())
+            if not sales:
+                break
+            last_id = sales[-1].id
+            items = {}
+            for si in SaleItem.query.filter(SaleItem.sale_id.in_([s.id for s in sales])).order_by(SaleItem.id):
+                items.setdefault(si.sale_id, []).append(si)
+            response = self._request("POST", "/pos/api/register/sales", {
+                "register_id": self.register_id,
+                "sales": [_sale_payload(s, items.get(s.id, ())) for s in sales],
+            })
+            done = []
+            for result in response["results"]:
+                report[result["status"]] = report.get(result["status"], 0) + 1
+                if result["status"] == "rejected":
+                    logger.warning("Central rejected sale %s: %s", result.get("ref"), result.get("error"))
+                    continue
+                done.append(result["ref"])
+                for conflict in result.get("conflicts") or ():
+                    report["conflicts"] += 1
+                    logger.warning("Sale %s oversold %s: sold %s, central stock was %s", result["ref"],
+                                   conflict["name"], conflict["wanted"], conflict["available"])
+            if done:
+                db.session.execute(
+                    update(Sale).where(Sale.client_ref.in_(done)).values(synced_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+            _set_state("last_push", datetime.utcnow().isoformat())
+            db.session.commit()
+            if len(sales) < self.batch_size:
+                break
+        return report
+
+    def pull(self):
+        """Apply catalogue pages since the stored cursor. Returns {"products", "deleted", "reference"}."""
+        cursor = _get_state("catalog_cursor")
+        etag = _get_state("reference_etag")
+        pending = unsynced_quantities()
+        report = {"products": 0, "deleted": 0, "reference": False}
+        reference = None
+        seen = None  # product ids pulled, during a full resync
+        while True:
+            try:
+                page = self._request("GET", "/pos/api/register/catalog",
+                                     params={"after": cursor, "reference_etag": etag})
+            except urllib.error.HTTPError as e:
+                if e.code != 410 or seen is not None:
+                    raise
+                # Away longer than the central app keeps deletions: pull everything again
+                logger.warning("Catalogue cursor expired; pulling the whole catalogue")
+                cursor, seen = None, set()
+                continue
+            if "reference" in page and reference is None:
+                reference, new_etag = page["reference"], page["reference_etag"]
+                for key, model, _ in REFERENCE:
+                    if model is not Promotion:
+                        _replace_rows(model, [_load(model, row) for row in reference[key]])
+            _drop_products(page["deleted"])
+            rows = [_load(Product, dict(zip(page["columns"], values))) for values in page["products"]]
+            for row in rows:
+                row["quantity"] = max(row["quantity"] - pending.get(row["id"], 0), 0)
+            _replace_rows(Product, rows)
+            report["products"] += len(rows)
+            report["deleted"] += len(page["deleted"])
+            cursor = page["cursor"]
+            if seen is None:
+                _set_state("catalog_cursor", cursor)  # resumable; a resync is only saved once complete
+            else:
+                seen.update(row["id"] for row in rows)
+            db.session.commit()
+            if not page["more"]:
+                break
+        if seen is not None:
+            gone = [pid for pid in db.session.execute(select(Product.id)).scalars() if pid not in seen]
+            _drop_products(gone)
+            report["deleted"] += len(gone)
+            _set_state("catalog_cursor", cursor)
+        if reference is not None:
+            # Promotions last (they reference products); the set is replaced, so ended ones go
+            rows = [_load(Promotion, row) for row in reference["promotions"]]
+            db.session.execute(delete(Promotion).where(Promotion.id.notin_([r["id"] for r in rows])))
+            _replace_rows(Promotion, rows)
+            _set_state("reference_etag", new_etag)
+            report["reference"] = True
+        _set_state("last_pull", datetime.utcnow().isoformat())
+        db.session.commit()
+        self._invalidate_caches(report)
+        return report
+
+    def _invalidate_caches(self, report):
+        # Upserts bypass the ORM events that normally keep the per-process caches fresh
+        from app.services.product_cache import get_product_cache
+        from app.services.promotion_engine import get_promotion_cache
+        product_cache, promotion_cache = get_product_cache(), get_promotion_cache()
+        if (report["products"] or report["deleted"]) and product_cache is not None:
+            product_cache.clear()
+        if report["reference"] and promotion_cache is not None:
+            promotion_cache.invalidate()
+
+    def sync(self, push=True, pull=True):
+        """Push, then pull (so pulled stock already includes this till's sales). Returns (report, error)."""
+        report = {}
+        with self._sync_lock:
+            try:
+                if push:
+                    report["push"] = self.push()
+                if pull:
+                    report["pull"] = self.pull()
+            except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+                db.session.rollback()
+                return report, f"Sync with {self.central_url} failed: {e}"
+        return report, None
+
+    def wake(self):
+        self._wake.set()
+
+    def ensure_started(self):
+        """Start the background sync thread (once; registered as a before_request hook)."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name="register-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    _, err = self.sync()
+                    if err:
+                        logger.warning("%s; %d sale(s) waiting", err, unsynced_count())
+                except Exception:
+                    logger.exception("Register sync failed")
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def init_register_sync(app):
+    """Set up the till's RegisterSync when REGISTER_MODE is "offline"; None otherwise."""
+    if app.config.get("REGISTER_MODE", "online") != "offline":
+        return None
+    sync = RegisterSync(
+        app,
+        central_url=app.config.get("REGISTER_CENTRAL_URL", ""),
+        token=app.config.get("REGISTER_SYNC_TOKEN", ""),
+        register_id=app.config.get("REGISTER_ID") or None,
+        interval=app.config.get("REGISTER_SYNC_INTERVAL", 30),
+        batch_size=app.config.get("REGISTER_SYNC_BATCH", 200),
+        timeout=app.config.get("REGISTER_SYNC_TIMEOUT", 15),
+    )
+    app.extensions["register_sync"] = sync
+    app.before_request(sync.ensure_started)  # not at import, so CLI commands do not start it
+    return sync
+
+
+def get_register_sync():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("register_sync")
@@ -1,59 +1,98 @@
 # Analytics and reporting: sales, inventory turnover, exports
+import tempfile
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from app import db
 from app.models.sale import Sale, SaleItem
 from app.models.product import Product
-from sqlalchemy import func
+from app.models.rollup import DailyProductRollup
+from app.services.rollup_service import in_ranges, plan_window
+from sqlalchemy import func, select
 
 
 def sales_report(start_date, end_date, group_by="day"):
-    q = db.session.query(
-        func.date(Sale.created_at).label("dt"),
-        func.sum(Sale.total).label("total"),
-        func.count(Sale.id).label("count"),
-        func.sum(Sale.tax_amount).label("tax"),
-        func.sum(Sale.discount_amount).label("discount"),
-    ).filter(
-        Sale.total > 0,
-        Sale.created_at >= start_date,
-        Sale.created_at < end_date + timedelta(days=1),
-    ).group_by(func.date(Sale.created_at)).order_by("dt")
-    rows = q.all()
-    return [{"period": str(r.dt), "total_sales": float(r.total or 0), "count": r.count, "tax": float(r.tax or 0), "discount": float(r.discount or 0)} for r in rows]
+    rollup_rows, ranges = plan_window(start_date, end_date + timedelta(days=1))
+    by_day = {
+        str(r.day): {"period": str(r.day), "total_sales": float(r.total or 0), "count": r.sale_count, "tax": float(r.tax or 0), "discount": float(r.discount or 0)}
+        for r in rollup_rows if r.sale_count
+    }
+    if ranges:
+        q = db.session.query(
+            func.date(Sale.created_at).label("dt"),
+            func.sum(Sale.total).label("total"),
+            func.count(Sale.id).label("count"),
+            func.sum(Sale.tax_amount).label("tax"),
+            func.sum(Sale.discount_amount).label("discount"),
+        ).filter(
+            Sale.total > 0,
+            in_ranges(Sale.created_at, ranges),
+        ).group_by(func.date(Sale.created_at))
+        for r in q.all():
+            row = by_day.setdefault(str(r.dt), {"period": str(r.dt), "total_sales": 0.0, "count": 0, "tax": 0.0, "discount": 0.0})
+            row["total_sales"] += float(r.total or 0)
+            row["count"] += r.count
+            row["tax"] += float(r.tax or 0)
+            row["discount"] += float(r.discount or 0)
+    return [by_day[k] for k in sorted(by_day)]
 
 
 def sales_summary(start_date, end_date):
-    q = db.session.query(
-        func.sum(Sale.total).label("total"),
-        func.count(Sale.id).label("count"),
-        func.sum(Sale.tax_amount).label("tax"),
-        func.sum(Sale.discount_amount).label("discount"),
-    ).filter(
-        Sale.total > 0,
-        Sale.created_at >= start_date,
-        Sale.created_at < end_date + timedelta(days=1),
-    ).first()
+    rollup_rows, ranges = plan_window(start_date, end_date + timedelta(days=1))
+    total = sum((r.total or 0 for r in rollup_rows), Decimal(0))
+    count = sum(r.sale_count or 0 for r in rollup_rows)
+    tax = sum((r.tax or 0 for r in rollup_rows), Decimal(0))
+    discount = sum((r.discount or 0 for r in rollup_rows), Decimal(0))
+    if ranges:
+        q = db.session.query(
+            func.sum(Sale.total).label("total"),
+            func.count(Sale.id).label("count"),
+            func.sum(Sale.tax_amount).label("tax"),
+            func.sum(Sale.discount_amount).label("discount"),
+        ).filter(
+            Sale.total > 0,
+            in_ranges(Sale.created_at, ranges),
+        ).first()
+        total += q.total or 0
+        count += q.count or 0
+        tax += q.tax or 0
+        discount += q.discount or 0
     return {
-        "total_sales": float(q.total or 0),
-        "transaction_count": q.count or 0,
-        "total_tax": float(q.tax or 0),
-        "total_discount": float(q.discount or 0),
+        "total_sales": float(total),
+        "transaction_count": count,
+        "total_tax": float(tax),
+        "total_discount": float(discount),
     }
 
 
 def best_selling_products(start_date, end_date, limit=10):
-    q = db.session.query(
-        SaleItem.product_id,
-        Product.name,
-        func.sum(SaleItem.quantity).label("qty"),
-        func.sum(SaleItem.subtotal).label("revenue"),
-    ).join(Product, Product.id == SaleItem.product_id).join(Sale, Sale.id == SaleItem.sale_id).filter(
-        Sale.total > 0,
-        Sale.created_at >= start_date,
-        Sale.created_at < end_date + timedelta(days=1),
-    ).group_by(SaleItem.product_id, Product.name).order_by(func.sum(SaleItem.quantity).desc()).limit(limit)
-    return [{"product_id": r.product_id, "name": r.name, "quantity_sold": r.qty, "revenue": float(r.revenue or 0)} for r in q.all()]
+    rollup_rows, ranges = plan_window(start_date, end_date + timedelta(days=1))
+    sold = {}
+    if rollup_rows:
+        q = db.session.query(
+            DailyProductRollup.product_id,
+            func.sum(DailyProductRollup.quantity).label("qty"),
+            func.sum(DailyProductRollup.revenue).label("revenue"),
+        ).filter(DailyProductRollup.day.in_([r.day for r in rollup_rows])).group_by(DailyProductRollup.product_id)
+        for r in q.all():
+            sold[r.product_id] = [r.qty or 0, r.revenue or 0]
+    if ranges:
+        q = db.session.query(
+            SaleItem.product_id,
+            func.sum(SaleItem.quantity).label("qty"),
+            func.sum(SaleItem.subtotal).label("revenue"),
+        ).join(Sale, Sale.id == SaleItem.sale_id).filter(
+            Sale.total > 0,
+            in_ranges(Sale.created_at, ranges),
+        ).group_by(SaleItem.product_id)
+        for r in q.all():
+            entry = sold.setdefault(r.product_id, [0, 0])
+            entry[0] += r.qty or 0
+            entry[1] += r.revenue or 0
+    if not sold:
+        return []
+    names = dict(db.session.query(Product.id, Product.name).filter(Product.id.in_(list(sold))).all())
+    top = sorted((pid for pid in sold if pid in names), key=lambda pid: (-sold[pid][0], pid))[:limit]
+    return [{"product_id": pid, "name": names[pid], "quantity_sold": sold[pid][0], "revenue": float(sold[pid][1] or 0)} for pid in top]
 
 
 def slow_moving_products(limit=10):
@@ -74,67 +113,158 @@ def inventory_turnover(start_date, end_date):
     return {"total_revenue": total_revenue, "inventory_value_approx": float(avg_value)}
 
 
-def export_sales_csv(start_date, end_date):
-    sales = Sale.query.filter(
-        Sale.total > 0,
-        Sale.created_at >= start_date,
-        Sale.created_at < end_date + timedelta(days=1),
-    ).order_by(Sale.created_at).all()
-    yield "sale_id,created_at,user_id,total,tax,discount,payment_method\n"
-    for s in sales:
-        yield f"{s.id},{s.created_at.isoformat() if s.created_at else ''},{s.user_id},{s.total},{s.tax_amount},{s.discount_amount},{s.payment_method}\n"
+SALES_CSV_HEADER = "sale_id,created_at,user_id,total,tax,discount,payment_method\n"
+EXPORT_BATCH_SIZE = 2000
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024  # export files bigger than this spill to disk
+PDF_ROWS_PER_PAGE = 40
 
 
-def export_sales_excel_io(start_date, end_date):
+def _sales_export_rows(start_date, end_date, batch_size=EXPORT_BATCH_SIZE, limit=None):
+    """
+    Column tuples for the sales exports, read through a server-side cursor in batches of
+    `batch_size` (no ORM entities, constant memory for any range).
+    """
+    stmt = (
+        select(Sale.id, Sale.created_at, Sale.user_id, Sale.total, Sale.tax_amount, Sale.discount_amount, Sale.payment_method)
+        .where(
+            Sale.total > 0,
+            Sale.created_at >= start_date,
+            Sale.created_at < end_date + timedelta(days=1),
+        )
+        .order_by(Sale.created_at)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = db.session.execute(stmt)
+    try:
+        for rows in result.partitions():
+            yield rows
+    finally:
+        result.close()
+
+
+def _limited_export_rows(start_date, end_date, row_limit, progress):
+    """
+    Yield export batches up to `row_limit` rows (None = unlimited), calling progress(rows_done)
+    after each batch. The generator's return value is True when the range was truncated.
+    """
+    fetch_limit = row_limit + 1 if row_limit is not None else None
+    done = 0
+    for rows in _sales_export_rows(start_date, end_date, limit=fetch_limit):
+        if row_limit is not None and done + len(rows) > row_limit:
+            rows = rows[:row_limit - done]
+            done += len(rows)
+            if rows:
+                yield rows
+            if progress:
+                progress(done)
+            return True
+        done += len(rows)
+        yield rows
+        if progress:
+            progress(done)
+    return False
+
+
+def export_sales_csv(start_date, end_date, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the sales CSV in chunks of up to `batch_size` lines."""
+    yield SALES_CSV_HEADER
+    for rows in _sales_export_rows(start_date, end_date, batch_size):
+        yield "".join(
+            f"{sale_id},{created_at.isoformat() if created_at else ''},{user_id},{total},{tax},{discount},{payment}\n"
+            for sale_id, created_at, user_id, total, tax, discount, payment in rows
+        )
+
+
+def export_sales_excel_io(start_date, end_date, row_limit=None, progress=None, out=None):
+    """
+    Sales as an .xlsx in a temp file (rewound), written row by row in openpyxl write-only mode.
+    Stops after `row_limit` rows with a note in the sheet; progress(rows_done) is called per batch.
+    Pass a binary file as `out` to write there instead.
+    """
     try:
         from openpyxl import Workbook
-        from io import BytesIO
     except ImportError:
         return None
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Sales"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sales")
     ws.append(["Sale ID", "Date", "User ID", "Total", "Tax", "Discount", "Payment"])
-    sales = Sale.query.filter(
-        Sale.total > 0,
-        Sale.created_at >= start_date,
-        Sale.created_at < end_date + timedelta(days=1),
-    ).order_by(Sale.created_at).all()
-    for s in sales:
-        ws.append([s.id, s.created_at, s.user_id, float(s.total), float(s.tax_amount), float(s.discount_amount), s.payment_method])
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-    return bio
-
-
-def export_sales_pdf_io(start_date, end_date, store_name="Grocery Store"):
+    batches = _limited_export_rows(start_date, end_date, row_limit, progress)
+    while True:
+        try:
+            rows = next(batches)
+        except StopIteration as stop:
+            truncated = stop.value
+            break
+        for sale_id, created_at, user_id, total, tax, discount, payment in rows:
+            ws.append([sale_id, created_at, user_id, float(total), float(tax), float(discount), payment])
+    if truncated:
+        ws.append([f"Truncated at {row_limit} rows; narrow the date range for the rest."])
+    if out is None:
+        out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+def export_sales_pdf_io(start_date, end_date, store_name="Grocery Store", row_limit=None, progress=None, out=None):
+    """
+    Sales as a PDF in a temp file (rewound). Rows are drawn as one fixed-size table per page
+    (PDF_ROWS_PER_PAGE rows), so layout cost is linear in the number of rows.
+    Stops after `row_limit` rows with a note; progress(rows_done) is called per batch.
+    Pass a binary file as `out` to write there instead.
+    """
     try:
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import letter
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
         from reportlab.lib.styles import getSampleStyleSheet
-        from io import BytesIO
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import Paragraph, Table, TableStyle
     except ImportError:
         return None
-    bio = BytesIO()
-    doc = SimpleDocTemplate(bio, pagesize=letter)
+    if out is None:
+        out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    c = canvas.Canvas(out, pagesize=letter, pageCompression=1)
+    page_width, page_height = letter
+    margin = 36
     styles = getSampleStyleSheet()
-    elements = []
-    elements.append(Paragraph("Sales Report: %s to %s" % (start_date, end_date), styles["Title"]))
-    elements.append(Paragraph(store_name, styles["Normal"]))
-    elements.append(Spacer(1, 12))
-    sales = Sale.query.filter(
-        Sale.total > 0,
-        Sale.created_at >= start_date,
-        Sale.created_at < end_date + timedelta(days=1),
-    ).order_by(Sale.created_at).all()
-    data = [["ID", "Date", "Total", "Tax", "Discount", "Payment"]]
-    for s in sales:
-        data.append([str(s.id), s.created_at.strftime("%Y-%m-%d %H:%M") if s.created_at else "", str(s.total), str(s.tax_amount), str(s.discount_amount), s.payment_method])
-    t = Table(data)
-    t.setStyle(TableStyle([("BACKGROUND", (0, 0), (-1, 0), colors.grey), ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke), ("ALIGN", (0, 0), (-1, -1), "CENTER"), ("FONTSIZE", (0, 0), (-1, 0), 10), ("BOTTOMPADDING", (0, 0), (-1, 0), 12), ("BACKGROUND", (0, 1), (-1, -1), colors.beige), ("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
-    elements.append(t)
-    doc.build(elements)
-    bio.seek(0)
-    return bio
+    header = ["ID", "Date", "Total", "Tax", "Discount", "Payment"]
+    col_widths = [60, 110, 80, 70, 70, 80]
+    style = TableStyle([("BACKGROUND", (0, 0), (-1, 0), colors.grey), ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke), ("ALIGN", (0, 0), (-1, -1), "CENTER"), ("FONTSIZE", (0, 0), (-1, -1), 9), ("BACKGROUND", (0, 1), (-1, -1), colors.beige), ("GRID", (0, 0), (-1, -1), 0.5, colors.black)])
+    state = {"top": page_height - margin}
+
+    def draw(flowable):
+        w, h = flowable.wrapOn(c, page_width - 2 * margin, state["top"] - margin)
+        flowable.drawOn(c, (page_width - w) / 2, state["top"] - h)
+        state["top"] -= h + 6
+
+    def draw_table(page_rows):
+        t = Table([header] + page_rows, colWidths=col_widths, rowHeights=15)
+        t.setStyle(style)
+        draw(t)
+
+    draw(Paragraph("Sales Report: %s to %s" % (start_date, end_date), styles["Title"]))
+    draw(Paragraph(store_name, styles["Normal"]))
+    page_rows = []
+    batches = _limited_export_rows(start_date, end_date, row_limit, progress)
+    while True:
+        try:
+            rows = next(batches)
+        except StopIteration as stop:
+            truncated = stop.value
+            break
+        for sale_id, created_at, user_id, total, tax, discount, payment in rows:
+            page_rows.append([str(sale_id), created_at.strftime("%Y-%m-%d %H:%M") if created_at else "", str(total), str(tax), str(discount), payment])
+            if len(page_rows) == PDF_ROWS_PER_PAGE:
+                draw_table(page_rows)
+                c.showPage()
+                state["top"] = page_height - margin
+                page_rows = []
+    if page_rows or c.getPageNumber() == 1:
+        draw_table(page_rows)
+    if truncated:
+        draw(Paragraph(f"Truncated at {row_limit} rows; narrow the date range for the rest.", styles["Normal"]))
+    c.save()  # emits the last page if it has content
+    out.seek(0)
+    return out
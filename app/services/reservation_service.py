@@ -0,0 +1,173 @@
+"""
+Stock reservations: open carts hold stock so parallel registers never oversell.
+
+Product rows are locked with SELECT ... FOR UPDATE in ascending id order, so two registers
+reserving overlapping baskets always queue on the same row first and cannot deadlock.
+Reservations expire after STOCK_RESERVATION_TTL seconds; expired rows are ignored by every
+query and removed by purge_expired().
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select, update
+from app import db
+from app.models.product import Product
+from app.models.reservation import StockReservation
+from app.config import Config
+
+
+def get_reservation_ttl():
+    return timedelta(seconds=getattr(Config, "STOCK_RESERVATION_TTL", 900))
+
+
+def reserved_by_others_clause(holder=None):
+    """Correlated scalar: active units of products.id reserved by carts other than `holder`."""
+    q = select(func.coalesce(func.sum(StockReservation.quantity), 0)).where(
+        StockReservation.product_id == Product.id,
+        StockReservation.expires_at > datetime.utcnow(),
+    )
+    if holder:
+        q = q.where(StockReservation.holder != holder)
+    return q.correlate(Product).scalar_subquery()
+
+
+def _reserved_by_others(holder, product_ids):
+    rows = db.session.execute(
+        select(StockReservation.product_id, func.sum(StockReservation.quantity))
+        .where(
+            StockReservation.product_id.in_(product_ids),
+            StockReservation.holder != holder,
+            StockReservation.expires_at > datetime.utcnow(),
+        )
+        .group_by(StockReservation.product_id)
+    ).all()
+    return {pid: qty or 0 for pid, qty in rows}
+
+
+def available_quantity(product_id, holder=None):
+    """Physical stock minus units reserved by other carts."""
+    product = db.session.get(Product, product_id)
+    if not product:
+        return 0
+    others = _reserved_by_others(holder or "", [product_id]).get(product_id, 0)
+    return product.quantity - others
+
+
+def reserve_many(holder, quantities):
+    """
+    Set the reservation for each {product_id: quantity} held by `holder` (absolute, not additive;
+    0 releases the line). Returns ({product_id: quantity} now held, error_message); nothing
+    changes on error. New lines go in as one multi-row INSERT, so a large basket costs the same
+    handful of statements as a single product.
+    """
+    if not holder:
+        return None, "Reservation holder required"
+    product_ids = sorted(int(pid) for pid in quantities)
+    if not product_ids:
+        return {}, None
+    # Lock in a consistent id order so overlapping baskets cannot deadlock
+    products = {
+        p.id: p
+        for p in Product.query.filter(Product.id.in_(product_ids)).order_by(Product.id).with_for_update().all()
+    }
+    others = _reserved_by_others(holder, product_ids)
+    errors = []
+    for pid in product_ids:
+        product = products.get(pid)
+        qty = int(quantities[pid])
+        if not product:
+            errors.append(f"Product {pid} not found")
+        elif qty > product.quantity - others.get(pid, 0):
+            errors.append(f"{product.name} (available {max(product.quantity - others.get(pid, 0), 0)})")
+    if errors:
+        db.session.rollback()
+        return None, "Insufficient stock for " + "; ".join(errors)
+    existing = {
+        r.product_id: r
+        for r in StockReservation.query.filter(
+            StockReservation.holder == holder, StockReservation.product_id.in_(product_ids)
+        ).all()
+    }
+    expires_at = datetime.utcnow() + get_reservation_ttl()
+    held, new_rows = {}, []
+    for pid in product_ids:
+        qty = int(quantities[pid])
+        res = existing.get(pid)
+        if qty <= 0:
+            if res:
+                db.session.delete(res)
+            continue
+        if res:
+            res.quantity = qty
+            res.expires_at = expires_at
+        else:
+            new_rows.append({"holder": holder, "product_id": pid, "quantity": qty, "expires_at": expires_at})
+        held[pid] = qty
+    if new_rows:
+        db.session.execute(insert(StockReservation), new_rows)
+    # Keep the rest of the cart alive too; lapsed lines are re-checked by touch(), not revived here
+    db.session.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.holder == holder,
+            StockReservation.product_id.notin_(product_ids),
+            StockReservation.expires_at > datetime.utcnow(),
+        )
+        .values(expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return held, None
+
+
+def reserve(holder, product_id, quantity):
+    """Reserve `quantity` units of one product for `holder`. Returns (quantity held, error_message)."""
+    held, err = reserve_many(holder, {int(product_id): quantity})
+    if err:
+        return None, err
+    return held.get(int(product_id)), None
+
+
+def touch(holder, quantities):
+    """
+    Keep `holder`'s open cart ({product_id: quantity}) reserved. Lines whose reservation lapsed
+    go back through reserve_many, so their stock is checked again; otherwise the active rows are
+    extended, and only once the earliest is past half its TTL, so most page views write nothing.
+    Returns ({product_id: quantity} re-reserved, error_message).
+    """
+    now = datetime.utcnow()
+    active = dict(db.session.execute(
+        select(StockReservation.product_id, StockReservation.expires_at)
+        .where(StockReservation.holder == holder, StockReservation.expires_at > now)
+    ).all())
+    lapsed = {int(pid): qty for pid, qty in quantities.items() if int(pid) not in active}
+    if lapsed:
+        return reserve_many(holder, lapsed)
+    if active and min(active.values()) - now < get_reservation_ttl() / 2:
+        db.session.execute(
+            update(StockReservation)
+            .where(StockReservation.holder == holder, StockReservation.expires_at > now)
+            .values(expires_at=now + get_reservation_ttl())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    return {}, None
+
+
+def release(holder, product_id=None, commit=True):
+    """Drop `holder`'s reservation for one product, or all of them."""
+    stmt = delete(StockReservation).where(StockReservation.holder == holder)
+    if product_id is not None:
+        stmt = stmt.where(StockReservation.product_id == product_id)
+    db.session.execute(stmt.execution_options(synchronize_session="fetch"))
+    if commit:
+        db.session.commit()
+
+
+def purge_expired():
+    """Delete expired reservations. Returns the number removed."""
+    result = db.session.execute(
+        delete(StockReservation)
+        .where(StockReservation.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session="fetch")
+    )
+    db.session.commit()
+    return result.rowcount
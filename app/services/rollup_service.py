@@ -0,0 +1,239 @@
+"""
+Daily sales rollups: incremental upserts at checkout/refund, a catch-up builder and a
+consistency checker.
+
+Sales rows are never edited, so a closed day is final. build_rollups() recomputes closed days
+from the raw tables and marks them complete; checkout/refund upserts keep them exact when a sale
+commits just after midnight. Reports (report_service) read complete days from the rollups and
+everything else - today, partial edge days, days not built yet - from the raw rows.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.rollup import DailyProductRollup, DailySalesRollup
+from app.models.sale import Sale, SaleItem
+
+CENT = Decimal("0.01")
+_DAY_SUMS = ("total", "sale_count", "tax", "discount", "refund_total", "refund_count")
+
+
+def rollups_enabled():
+    return not has_app_context() or current_app.config.get("REPORT_USE_ROLLUPS", True)
+
+
+def _upsert(model):
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return None
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min)
+
+
+def record_sale(sale, items):
+    """
+    Add a sale (or refund) flushed in the current transaction to its day's rollups; the caller
+    commits. items: [{product_id, quantity, subtotal}]. No-op on databases without upserts.
+    """
+    ins = _upsert(DailySalesRollup)
+    if ins is None or not sale.total:
+        return
+    day = (sale.created_at or datetime.utcnow()).date()
+    values = dict(day=day, total=0, sale_count=0, tax=0, discount=0, refund_total=0, refund_count=0, complete=False)
+    if sale.total > 0:
+        values.update(total=sale.total, sale_count=1, tax=sale.tax_amount, discount=sale.discount_amount)
+    else:
+        values.update(refund_total=sale.total, refund_count=1)  # reports exclude refunds, as before
+    cols = DailySalesRollup.__table__.c
+    stmt = ins.values(**values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={name: cols[name] + stmt.excluded[name] for name in _DAY_SUMS},
+    ))
+    if sale.total < 0 or not items:
+        return
+    per_product = {}
+    for item in items:
+        qty, revenue = per_product.get(item["product_id"], (0, Decimal(0)))
+        per_product[item["product_id"]] = (qty + int(item["quantity"]), revenue + Decimal(str(item["subtotal"])))
+    pcols = DailyProductRollup.__table__.c
+    stmt = _upsert(DailyProductRollup).values([
+        {"day": day, "product_id": pid, "quantity": qty, "revenue": revenue}
+        for pid, (qty, revenue) in per_product.items()
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["day", "product_id"],
+        set_={"quantity": pcols.quantity + stmt.excluded.quantity, "revenue": pcols.revenue + stmt.excluded.revenue},
+    ))
+
+
+def plan_window(start, end):
+    """
+    Split the report window [start, end) into complete rollup days and raw datetime ranges.
+    Returns (rollup_rows, raw_ranges); rollup_rows are DailySalesRollup rows for full,
+    closed, complete days inside the window, raw_ranges cover the rest.
+    """
+    if not rollups_enabled():
+        return [], [(start, end)]
+    today = datetime.utcnow().date()
+    first_full = start.date() if start == _midnight(start.date()) else start.date() + timedelta(days=1)
+    last_full_excl = min(end.date(), today)
+    rows = []
+    if first_full < last_full_excl:
+        rows = DailySalesRollup.query.filter(
+            DailySalesRollup.complete.is_(True),
+            DailySalesRollup.day >= first_full,
+            DailySalesRollup.day < last_full_excl,
+        ).order_by(DailySalesRollup.day).all()
+    ranges = []
+    cursor = start
+    for row in rows:
+        day_start = _midnight(row.day)
+        if cursor < day_start:
+            ranges.append((cursor, day_start))
+        cursor = day_start + timedelta(days=1)
+    if cursor < end:
+        ranges.append((cursor, end))
+    return rows, ranges
+
+
+def in_ranges(column, ranges):
+    """SQL condition: column falls in any of the [start, end) ranges."""
+    return or_(*[and_(column >= a, column < b) for a, b in ranges])
+
+
+def _raw_day_totals(ranges):
+    positive = Sale.total > 0
+    q = select(
+        func.date(Sale.created_at).label("d"),
+        func.sum(case((positive, Sale.total), else_=0)),
+        func.sum(case((positive, 1), else_=0)),
+        func.sum(case((positive, Sale.tax_amount), else_=0)),
+        func.sum(case((positive, Sale.discount_amount), else_=0)),
+        func.sum(case((Sale.total < 0, Sale.total), else_=0)),
+        func.sum(case((Sale.total < 0, 1), else_=0)),
+    ).where(in_ranges(Sale.created_at, ranges)).group_by(func.date(Sale.created_at))
+    return {_as_date(r[0]): dict(zip(_DAY_SUMS, r[1:])) for r in db.session.execute(q)}
+
+
+def _raw_product_totals(ranges):
+    q = select(
+        func.date(Sale.created_at).label("d"),
+        SaleItem.product_id,
+        func.sum(SaleItem.quantity),
+        func.sum(SaleItem.subtotal),
+    ).join(Sale, Sale.id == SaleItem.sale_id).where(
+        Sale.total > 0, in_ranges(Sale.created_at, ranges)
+    ).group_by(func.date(Sale.created_at), SaleItem.product_id)
+    return {(_as_date(r[0]), r[1]): (r[2] or 0, r[3] or 0) for r in db.session.execute(q)}
+
+
+def _closed_days(start_day, end_day):
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    end_day = min(end_day or yesterday, yesterday)
+    if start_day is None:
+        first = db.session.execute(select(func.min(Sale.created_at))).scalar()
+        if first is None:
+            return None, None
+        start_day = _as_date(first)
+    return start_day, end_day
+
+
+def build_rollups(start_day=None, end_day=None, force=False, chunk_days=31):
+    """
+    Catch-up job: rebuild closed days in [start_day, end_day] (default: first sale to yesterday)
+    that are missing or incomplete, or all of them with force. Returns the number of days built.
+    """
+    start_day, end_day = _closed_days(start_day, end_day)
+    if start_day is None or start_day > end_day:
+        return 0
+    built = 0
+    chunk_start = start_day
+    while chunk_start <= end_day:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_day)
+        done = set() if force else set(db.session.execute(
+            select(DailySalesRollup.day).where(
+                DailySalesRollup.complete.is_(True),
+                DailySalesRollup.day >= chunk_start,
+                DailySalesRollup.day <= chunk_end,
+            )
+        ).scalars())
+        days = [chunk_start + timedelta(days=i) for i in range((chunk_end - chunk_start).days + 1)]
+        days = [d for d in days if d not in done]
+        if days:
+            ranges = [(_midnight(d), _midnight(d) + timedelta(days=1)) for d in days]
+            day_totals = _raw_day_totals(ranges)
+            product_totals = _raw_product_totals(ranges)
+            db.session.execute(delete(DailyProductRollup).where(DailyProductRollup.day.in_(days)))
+            db.session.execute(delete(DailySalesRollup).where(DailySalesRollup.day.in_(days)))
+            empty = dict.fromkeys(_DAY_SUMS, 0)
+            db.session.execute(insert(DailySalesRollup), [
+                dict(day_totals.get(d, empty), day=d, complete=True, updated_at=datetime.utcnow()) for d in days
+            ])
+            if product_totals:
+                db.session.execute(insert(DailyProductRollup), [
+                    {"day": d, "product_id": pid, "quantity": qty, "revenue": revenue}
+                    for (d, pid), (qty, revenue) in product_totals.items()
+                ])
+            db.session.commit()
+            built += len(days)
+        chunk_start = chunk_end + timedelta(days=1)
+    return built
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def check_rollups(start_day=None, end_day=None):
+    """
+    Consistency checker: compare complete rollup days against the raw tables.
+    Returns a list of human-readable mismatch descriptions (empty when consistent).
+    """
+    start_day, end_day = _closed_days(start_day, end_day)
+    if start_day is None or start_day > end_day:
+        return []
+    rows = DailySalesRollup.query.filter(
+        DailySalesRollup.complete.is_(True),
+        DailySalesRollup.day >= start_day,
+        DailySalesRollup.day <= end_day,
+    ).all()
+    if not rows:
+        return []
+    days = [r.day for r in rows]
+    ranges = [(_midnight(d), _midnight(d) + timedelta(days=1)) for d in days]
+    raw_days = _raw_day_totals(ranges)
+    raw_products = _raw_product_totals(ranges)
+    problems = []
+    for row in rows:
+        raw = raw_days.get(row.day, dict.fromkeys(_DAY_SUMS, 0))
+        for name in _DAY_SUMS:
+            if _money(getattr(row, name)) != _money(raw[name]):
+                problems.append(f"{row.day} {name}: rollup {getattr(row, name)} != raw {raw[name]}")
+    rolled_products = {
+        (r.day, r.product_id): (r.quantity, r.revenue)
+        for r in DailyProductRollup.query.filter(DailyProductRollup.day.in_(days)).all()
+    }
+    for key in set(rolled_products) | set(raw_products):
+        rolled_qty, rolled_rev = rolled_products.get(key, (0, 0))
+        raw_qty, raw_rev = raw_products.get(key, (0, 0))
+        if int(rolled_qty) != int(raw_qty) or _money(rolled_rev) != _money(raw_rev):
+            problems.append(
+                f"{key[0]} product {key[1]}: rollup qty={rolled_qty} revenue={rolled_rev} "
+                f"!= raw qty={raw_qty} revenue={raw_rev}"
+            )
+    db.session.rollback()
+    return problems
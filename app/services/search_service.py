@@ -0,0 +1,106 @@
+"""
+Product search: relevance-ranked, index-backed matching on name, SKU and barcode.
+
+Backends, detected once per engine:
+- "trgm": PostgreSQL with pg_trgm. GIN trigram indexes (migration c4d8e1f2a9b0) serve the
+  ILIKE '%term%' filters; results are ranked by similarity(name, term).
+- "fts5": SQLite with the products_fts trigram table (created by ensure_search_index()).
+  Ranked by bm25. Terms shorter than 3 characters fall back to "like".
+- "like": plain ILIKE scan ordered by name, used when neither index is available.
+Exact SKU/barcode hits always rank first.
+"""
+from sqlalchemy import Float, Integer, case, func, inspect, text
+from app import db
+from app.models.product import Product
+
+_backends = {}
+
+FTS5_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, sku, barcode, content='products', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, name, sku, barcode) VALUES (new.id, new.name, new.sku, new.barcode); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, sku, barcode) "
+    "VALUES ('delete', old.id, old.name, old.sku, old.barcode); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku, barcode ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, sku, barcode) "
+    "VALUES ('delete', old.id, old.name, old.sku, old.barcode); "
+    "INSERT INTO products_fts(rowid, name, sku, barcode) VALUES (new.id, new.name, new.sku, new.barcode); END",
+)
+
+
+def ensure_search_index(engine=None):
+    """Create the SQLite FTS5 table and triggers if missing (PostgreSQL uses the migration)."""
+    engine = engine or db.engine
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")).first()
+        try:
+            for ddl in FTS5_DDL:
+                conn.exec_driver_sql(ddl)
+        except Exception:
+            return False  # SQLite built without FTS5 / trigram tokenizer
+        if not exists:
+            conn.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+    _backends.pop(engine.url, None)
+    return True
+
+
+def get_search_backend(engine=None):
+    engine = engine or db.engine
+    backend = _backends.get(engine.url)
+    if backend is None:
+        backend = _backends[engine.url] = _detect_backend(engine)
+    return backend
+
+
+def _detect_backend(engine):
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                found = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+                return "trgm" if found else "like"
+            if engine.dialect.name == "sqlite" and inspect(conn).has_table("products_fts"):
+                return "fts5"
+    except Exception:
+        pass
+    return "like"
+
+
+def apply_product_search(query, term, backend=None):
+    """Filter a Product query to `term` and order it by relevance."""
+    backend = backend or get_search_backend()
+    exact_first = case((Product.sku == term, 0), (Product.barcode == term, 0), else_=1)
+    if backend == "fts5" and len(term) >= 3:
+        fts = (
+            text("SELECT rowid AS id, rank FROM products_fts WHERE products_fts MATCH :q")
+            .bindparams(q='"' + term.replace('"', '""') + '"')
+            .columns(id=Integer, rank=Float)
+            .subquery("fts")
+        )
+        return query.join(fts, fts.c.id == Product.id).order_by(exact_first, fts.c.rank, Product.name)
+    like = f"%{term}%"
+    query = query.filter(db.or_(Product.name.ilike(like), Product.sku.ilike(like), Product.barcode.ilike(like)))
+    if backend == "trgm":
+        return query.order_by(exact_first, func.similarity(Product.name, term).desc(), Product.name)
+    return query.order_by(exact_first, Product.name)
+
+
+def search_product_by_name(term, backend=None):
+    """Best name match for the POS lookup fallback (name only, like the original ILIKE fallback)."""
+    backend = backend or get_search_backend()
+    query = Product.query
+    if backend == "fts5" and len(term) >= 3:
+        fts = (
+            text("SELECT rowid AS id, rank FROM products_fts WHERE products_fts MATCH :q")
+            .bindparams(q='name : "' + term.replace('"', '""') + '"')
+            .columns(id=Integer, rank=Float)
+            .subquery("fts")
+        )
+        return query.join(fts, fts.c.id == Product.id).order_by(fts.c.rank, Product.name).first()
+    query = query.filter(Product.name.ilike(f"%{term}%"))
+    if backend == "trgm":
+        return query.order_by(func.similarity(Product.name, term).desc(), Product.name).first()
+    return query.order_by(Product.name).first()
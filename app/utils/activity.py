@@ -1,9 +1,11 @@
 """
 Activity logging for audit trail.
 """
+from datetime import datetime
 from flask import request
 from app import db
 from app.models.activity_log import ActivityLog
+from app.services.activity_writer import get_activity_writer, write_after_commit
 
 
 def log_activity(action: str, entity_type: str = None, entity_id: int = None, details: str = None):
@@ -16,7 +18,7 @@ def log_activity(action: str, entity_type: str = None, entity_id: int = None, de
     except Exception:
         pass
     ip = request.remote_addr if request else None
-    log = ActivityLog(
+    record = dict(
         user_id=user_id,
         action=action,
         entity_type=entity_type,
@@ -24,5 +26,9 @@ def log_activity(action: str, entity_type: str = None, entity_id: int = None, de
         details=details,
         ip_address=ip,
     )
-    db.session.add(log)
+    if get_activity_writer() is not None:
+        # Async mode: written in the background once the caller's transaction commits
+        write_after_commit(dict(record, created_at=datetime.utcnow()))
+        return
+    db.session.add(ActivityLog(**record))
     # Caller should commit; avoid committing here to stay in same transaction
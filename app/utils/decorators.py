@@ -1,8 +1,9 @@
 """
 Role-based access control decorators.
 """
+import hmac
 from functools import wraps
-from flask import redirect, url_for, flash, abort
+from flask import redirect, url_for, flash, abort, current_app, jsonify, request
 from flask_login import current_user
 
 
@@ -42,3 +43,29 @@ def admin_required(f):
 
 def manager_required(f):
     return role_required("admin", "manager")(f)
+
+
+def _has_register_token():
+    header = request.headers.get("Authorization", "")
+    tokens = current_app.config.get("REGISTER_SYNC_TOKENS") or ()
+    return any(hmac.compare_digest(header, f"Bearer {token}") for token in tokens)
+
+
+def register_token_required(f):
+    """Require "Authorization: Bearer <token>" with one of REGISTER_SYNC_TOKENS (till sync API)."""
+    @wraps(f)
+    def decorated_view(*args, **kwargs):
+        if not _has_register_token():
+            return jsonify({"error": "Invalid register token"}), 401
+        return f(*args, **kwargs)
+    return decorated_view
+
+
+def login_or_register_token_required(f):
+    """JSON APIs read by both the UI and other services: a logged-in user or a register token."""
+    @wraps(f)
+    def decorated_view(*args, **kwargs):
+        if not (current_user.is_authenticated and current_user.active) and not _has_register_token():
+            return jsonify({"error": "Authentication required"}), 401
+        return f(*args, **kwargs)
+    return decorated_view
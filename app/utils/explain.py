@@ -0,0 +1,107 @@
+"""
+EXPLAIN audit for report and history queries: catches index regressions (sequential scans).
+
+Each audited query is run once for real while its SQL is captured, then every captured SELECT
+is EXPLAINed with the same parameters. Used by `flask db-explain`.
+"""
+import itertools
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import db
+
+# Tables a query is expected to scan in full (e.g. inventory valuation sums every product)
+ALLOWED_SEQ_SCANS = {
+    "inventory_turnover": {"products"},
+    "slow_moving_products": {"products"},
+}
+
+_PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+_SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)")
+
+
+def _audited_queries(start, end):
+    from app.models.customer import Customer
+    from app.models.sale import Sale
+    from app.services import activity_log_service as activity
+    from app.services import catalog_changes as changes
+    from app.services import inventory_service as inv
+    from app.services import kpi_service as kpis
+    from app.services import report_service as reports
+    from app.utils.pagination import encode_cursor, paginate
+
+    return [
+        ("sales_report", lambda: reports.sales_report(start, end)),
+        ("sales_summary", lambda: reports.sales_summary(start, end)),
+        ("best_selling_products", lambda: reports.best_selling_products(start, end)),
+        ("slow_moving_products", lambda: reports.slow_moving_products()),
+        ("inventory_turnover", lambda: reports.inventory_turnover(start, end)),
+        ("export_sales_csv", lambda: list(itertools.islice(reports.export_sales_csv(start, end), 2))),
+        ("customer_history", lambda: Sale.query.filter_by(customer_id=1).order_by(Sale.created_at.desc()).limit(50).all()),
+        ("activity_log_page", lambda: activity.activity_page(after=encode_cursor([end, 0]))),
+        ("activity_log_by_user", lambda: activity.activity_page(user_id=1, after=encode_cursor([end, 0]))),
+        ("activity_log_by_entity", lambda: activity.activity_page(entity_type="product", entity_id=1,
+                                                                  before=encode_cursor([start, 0]))),
+        ("product_list_page", lambda: inv.get_products_page(after=encode_cursor(["M", 0]))),
+        ("customer_list_page", lambda: paginate(Customer.query, (Customer.name, Customer.id),
+                                                after=encode_cursor(["M", 0])).items),
+        ("low_stock_alerts", lambda: inv.get_low_stock_products()),
+        ("expiry_alerts", lambda: inv.get_expired_or_near_products()),
+        ("dashboard_kpis", lambda: kpis.today_kpis()),
+        ("catalog_changes", lambda: changes.changes_since(encode_cursor([start, 1, 0]), lag=0)),
+    ]
+
+
+def _capture(fn):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+        db.session.rollback()
+    return statements
+
+
+def explain(statement, parameters):
+    """Return the plan lines for one statement."""
+    conn = db.session.connection()
+    if db.engine.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).all()
+    return [row[0] for row in rows]
+
+
+def find_seq_scans(plan_lines):
+    pattern = _SQLITE_SCAN if db.engine.dialect.name == "sqlite" else _PG_SEQ_SCAN
+    return {m.group(1) for line in plan_lines for m in pattern.finditer(line)}
+
+
+def run_explain_audit(days=30):
+    """
+    EXPLAIN every audited query. Returns a list of dicts:
+    {query, statement, plan, seq_scans, unexpected} where `unexpected` excludes allowed tables.
+    """
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    results = []
+    for name, fn in _audited_queries(start, end):
+        for statement, parameters in _capture(fn):
+            plan = explain(statement, parameters)
+            seq_scans = find_seq_scans(plan)
+            results.append({
+                "query": name,
+                "statement": statement,
+                "plan": plan,
+                "seq_scans": seq_scans,
+                "unexpected": seq_scans - ALLOWED_SEQ_SCANS.get(name, set()),
+            })
+        db.session.rollback()
+    return results
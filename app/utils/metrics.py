@@ -0,0 +1,304 @@
+"""
+Opt-in request/SQL instrumentation (METRICS_ENABLED=1).
+
+Per endpoint it records a request latency histogram, SQL statements per request, and total DB
+time. It also keeps the slowest statements seen. Hooks: SQLAlchemy before/after_cursor_execute
+on the app's engines and the Flask request_started / request_finished signals. The per-statement
+cost is two perf_counter() calls and no locking; the registry lock is taken once per request.
+
+Each process periodically writes its totals to METRICS_DIR/<pid>.json, so /metrics (Prometheus
+text format) and `flask perf-report` can merge all gunicorn workers. Files left by workers that
+have exited are deleted when read; an idle worker's file is kept however old, since its counters
+are cumulative and dropping them would read as a reset.
+"""
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from flask import current_app, request, request_finished, request_started
+from sqlalchemy import event
+from app import db
+from app.utils.process import pid_alive
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+STATEMENT_TEXT_LIMIT = 300
+
+_current = ContextVar("metrics_request", default=None)
+
+
+class _RequestStats:
+    __slots__ = ("started", "statements", "db_time", "slowest", "slowest_sql")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+
+
+def _endpoint_entry():
+    return {
+        "count": 0,
+        "latency_buckets": [0] * len(LATENCY_BUCKETS),
+        "latency_sum": 0.0,
+        "statement_buckets": [0] * len(STATEMENT_BUCKETS),
+        "statements": 0,
+        "max_statements": 0,
+        "db_time": 0.0,
+        "errors": 0,
+    }
+
+
+def _keep_slowest(slow, item, seconds, limit):
+    """Record `seconds` for item in the bounded {item: worst seconds} map."""
+    if item in slow:
+        slow[item] = max(slow[item], seconds)
+    elif len(slow) < limit:
+        slow[item] = seconds
+    else:
+        fastest = min(slow, key=slow.get)
+        if seconds > slow[fastest]:
+            del slow[fastest]
+            slow[item] = seconds
+
+
+def _observe(buckets, bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            buckets[i] += 1
+            return
+
+
+class MetricsRegistry:
+    """Per-process totals keyed by "<endpoint> <METHOD>"."""
+
+    def __init__(self, slow_statements=20):
+        self.slow_statements = slow_statements
+        self.endpoints = {}
+        self.slow = {}  # (endpoint, statement) -> worst seconds, at most slow_statements entries
+        self._lock = threading.Lock()
+
+    def record(self, key, latency, stats, error):
+        with self._lock:
+            entry = self.endpoints.get(key)
+            if entry is None:
+                entry = self.endpoints[key] = _endpoint_entry()
+            entry["count"] += 1
+            entry["latency_sum"] += latency
+            _observe(entry["latency_buckets"], LATENCY_BUCKETS, latency)
+            entry["statements"] += stats.statements
+            entry["max_statements"] = max(entry["max_statements"], stats.statements)
+            _observe(entry["statement_buckets"], STATEMENT_BUCKETS, stats.statements)
+            entry["db_time"] += stats.db_time
+            entry["errors"] += error
+            if stats.slowest_sql is not None:
+                _keep_slowest(self.slow, (key, stats.slowest_sql), stats.slowest, self.slow_statements)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "endpoints": json.loads(json.dumps(self.endpoints)),
+                "slow": sorted(((t, k, sql) for (k, sql), t in self.slow.items()), reverse=True),
+            }
+
+
+def merge_snapshots(snapshots, slow_statements=20):
+    """Combine per-process snapshots into one {endpoints, slow} dict."""
+    endpoints = {}
+    slow = {}
+    for snap in snapshots:
+        for key, src in snap.get("endpoints", {}).items():
+            dst = endpoints.setdefault(key, _endpoint_entry())
+            for name in ("count", "latency_sum", "statements", "db_time", "errors"):
+                dst[name] += src.get(name, 0)
+            dst["max_statements"] = max(dst["max_statements"], src.get("max_statements", 0))
+            for name in ("latency_buckets", "statement_buckets"):
+                dst[name] = [a + b for a, b in zip(dst[name], src.get(name, []))]
+        for seconds, key, statement in snap.get("slow", []):
+            _keep_slowest(slow, (key, statement), seconds, slow_statements)
+    return {"endpoints": endpoints, "slow": sorted(((t, k, sql) for (k, sql), t in slow.items()), reverse=True)}
+
+
+def quantile(q, buckets, bounds, count):
+    """Estimate a quantile from non-cumulative histogram buckets (like histogram_quantile)."""
+    if not count:
+        return 0.0
+    rank = q * count
+    seen = 0
+    lower = 0.0
+    for n, upper in zip(buckets, bounds):
+        if n and seen + n >= rank:
+            return lower + (upper - lower) * (rank - seen) / n
+        seen += n
+        lower = upper
+    return float(bounds[-1])  # in the +Inf bucket
+
+
+def get_metrics_dir(app=None):
+    app = app or current_app
+    path = app.config.get("METRICS_DIR") or os.path.join(app.instance_path, "metrics")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_snapshot(app, registry):
+    path = os.path.join(get_metrics_dir(app), f"{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def read_snapshots(app, registry=None):
+    """
+    All live processes' snapshots; this process's live registry replaces its own file. Snapshots
+    of exited workers are removed.
+    """
+    snapshots = []
+    directory = get_metrics_dir(app)
+    own = f"{os.getpid()}.json"
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or (registry is not None and name == own):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            pid = int(name[:-len(".json")])
+            if not pid_alive(pid):
+                os.remove(path)
+                continue
+        except ValueError:
+            continue  # not a snapshot
+        except OSError:
+            continue  # replaced or removed meanwhile
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being replaced
+    if registry is not None:
+        snapshots.append(registry.snapshot())
+    return snapshots
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.pop("metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.statements += 1
+    stats.db_time += elapsed
+    if elapsed > stats.slowest:
+        stats.slowest = elapsed
+        stats.slowest_sql = statement[:STATEMENT_TEXT_LIMIT]
+
+
+def init_metrics(app):
+    """Register the hooks when METRICS_ENABLED; returns the registry or None."""
+    if not app.config.get("METRICS_ENABLED", False):
+        app.extensions["metrics"] = None
+        return None
+    registry = MetricsRegistry(slow_statements=app.config.get("METRICS_SLOW_STATEMENTS", 20))
+    app.extensions["metrics"] = registry
+    flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", 10)
+    last_flush = [time.monotonic()]
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    def on_started(sender, **extra):
+        _current.set(_RequestStats())
+
+    def on_finished(sender, response, **extra):
+        stats = _current.get()
+        if stats is None:
+            return
+        _current.set(None)
+        latency = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "<unmatched>"
+        registry.record(f"{endpoint} {request.method}", latency, stats, response.status_code >= 500)
+        now = time.monotonic()
+        if now - last_flush[0] >= flush_interval:
+            last_flush[0] = now
+            try:
+                write_snapshot(sender, registry)
+            except OSError:
+                sender.logger.warning("Could not write metrics snapshot", exc_info=True)
+
+    # Keep strong references: blinker holds receivers weakly
+    app.extensions["metrics_receivers"] = (on_started, on_finished)
+    request_started.connect(on_started, app)
+    request_finished.connect(on_finished, app)
+    return registry
+
+
+def _escape(value):
+    """Prometheus label value escaping: backslash first, then quote and newline."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key):
+    endpoint, _, method = key.rpartition(" ")
+    return 'endpoint="%s",method="%s"' % (_escape(endpoint), _escape(method))
+
+
+def render_prometheus(merged):
+    """Prometheus text exposition of merged snapshots."""
+    out = [
+        "# HELP gsms_request_duration_seconds Request latency by endpoint.",
+        "# TYPE gsms_request_duration_seconds histogram",
+    ]
+    endpoints = sorted(merged["endpoints"].items())
+    for key, e in endpoints:
+        labels = _labels(key)
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, e["latency_buckets"]):
+            cumulative += n
+            out.append(f'gsms_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'gsms_request_duration_seconds_bucket{{{labels},le="+Inf"}} {e["count"]}')
+        out.append(f"gsms_request_duration_seconds_sum{{{labels}}} {e['latency_sum']:.6f}")
+        out.append(f"gsms_request_duration_seconds_count{{{labels}}} {e['count']}")
+    out += [
+        "# HELP gsms_request_db_statements SQL statements per request by endpoint.",
+        "# TYPE gsms_request_db_statements histogram",
+    ]
+    for key, e in endpoints:
+        labels = _labels(key)
+        cumulative = 0
+        for bound, n in zip(STATEMENT_BUCKETS, e["statement_buckets"]):
+            cumulative += n
+            out.append(f'gsms_request_db_statements_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'gsms_request_db_statements_bucket{{{labels},le="+Inf"}} {e["count"]}')
+        out.append(f"gsms_request_db_statements_sum{{{labels}}} {e['statements']}")
+        out.append(f"gsms_request_db_statements_count{{{labels}}} {e['count']}")
+    out += [
+        "# HELP gsms_request_db_seconds_total Time spent in SQL statements by endpoint.",
+        "# TYPE gsms_request_db_seconds_total counter",
+    ]
+    out += [f"gsms_request_db_seconds_total{{{_labels(k)}}} {e['db_time']:.6f}" for k, e in endpoints]
+    out += [
+        "# HELP gsms_request_errors_total Requests answered with a 5xx status by endpoint.",
+        "# TYPE gsms_request_errors_total counter",
+    ]
+    out += [f"gsms_request_errors_total{{{_labels(k)}}} {e['errors']}" for k, e in endpoints]
+    out += [
+        "# HELP gsms_slow_statement_seconds Slowest SQL statements seen (statement truncated).",
+        "# TYPE gsms_slow_statement_seconds gauge",
+    ]
+    for rank, (seconds, key, statement) in enumerate(merged["slow"], 1):
+        sql = _escape(" ".join(statement.split())[:120])
+        out.append(f'gsms_slow_statement_seconds{{rank="{rank}",{_labels(key)},statement="{sql}"}} {seconds:.6f}')
+    return "\n".join(out) + "\n"
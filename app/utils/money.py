@@ -0,0 +1,61 @@
+"""
+Money as integer minor units (cents).
+
+Cart lines, totals, tax, promotions and refunds do their arithmetic on ints. Decimals appear only
+at the edges: to_cents() when a price or amount comes in (Numeric column, form field, JSON),
+from_cents() when a result goes out (Numeric column, template, receipt). Rounding is half-even,
+the same as Decimal.quantize() in the default context, so results match the Decimal code to the
+cent.
+
+Percentages (promotion values, tiers) are held in basis points: 12.5% -> 1250. Rates with more
+decimals (TAX_RATE) are held as an exact integer ratio, see ratio().
+"""
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+PERCENT = 10000  # basis points in 100%
+
+
+def to_cents(value):
+    """Cents in an amount (Decimal, str, int or float in currency units), rounded half-even."""
+    if value is None or value == "":
+        return 0
+    if not isinstance(value, Decimal):
+        try:
+            value = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"Not an amount: {value!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"Not an amount: {value!r}")
+    return int(value.scaleb(2).to_integral_value())
+
+
+def from_cents(cents):
+    """Decimal amount with two places, e.g. 1234 -> Decimal('12.34')."""
+    return Decimal(cents).scaleb(-2)
+
+
+def to_basis_points(percent):
+    """Basis points in a percentage (10 -> 1000, '12.5' -> 1250), rounded half-even."""
+    return to_cents(percent)  # 1% = 100 bp, the same scaling as currency units to cents
+
+
+def div_round(numerator, denominator):
+    """numerator / denominator rounded half-even to an int (denominator > 0)."""
+    q, r = divmod(numerator, denominator)
+    twice = 2 * r
+    if twice > denominator or (twice == denominator and q % 2):
+        q += 1
+    return q
+
+
+@lru_cache(maxsize=32)
+def ratio(rate):
+    """Exact (numerator, denominator) of a rate such as 0.0825, for use with apply_ratio()."""
+    return Decimal(str(rate)).as_integer_ratio()
+
+
+def apply_ratio(cents, rate_ratio):
+    """cents * rate rounded half-even, e.g. tax on an amount."""
+    numerator, denominator = rate_ratio
+    return div_round(cents * numerator, denominator)
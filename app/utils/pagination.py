@@ -0,0 +1,164 @@
+"""
+Cursor (keyset) pagination for list pages.
+
+paginate() seeks past the last row shown - WHERE (name, id) > (:name, :id) ORDER BY name, id
+LIMIT n+1 - instead of COUNT(*) + OFFSET, so page 1000 costs the same index range scan as page 1.
+Cursors are opaque URL-safe strings holding the sort key of a boundary row; ?after= is the next
+page and ?before= the previous one, in list order. Lists ordered by something that is not a
+unique key (e.g. search relevance) pass keys=None and get offset cursors with the same interface.
+
+estimated_count() gives a cheap total for unfiltered lists: pg_class.reltuples on PostgreSQL,
+otherwise a COUNT(*) cached per process for PAGINATION_COUNT_TTL seconds.
+"""
+import base64
+import binascii
+import json
+import threading
+import time
+from datetime import date, datetime
+from flask import current_app, has_app_context
+from sqlalchemy import func, select, text, tuple_
+from app import db
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+class Page:
+    """One page of items plus the cursors to its neighbours (None when there is no such page)."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total  # approximate; None when not counted
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _dump(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _load(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if not isinstance(value, python_type):
+        raise ValueError(f"Bad cursor value for {column.key}")
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, keys=None):
+    """Key values from a cursor, typed like `keys` (or a single offset); None if missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if keys is None:
+            offset, = values
+            return offset if isinstance(offset, int) and offset >= 0 else None
+        if len(values) != len(keys):
+            return None
+        return tuple(_load(key, value) for key, value in zip(keys, values))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _key_of(item, keys):
+    return [getattr(item, key.key) for key in keys]
+
+
+def paginate(query, keys=None, after=None, before=None, per_page=20, descending=False, total=None):
+    """
+    A Page of `query`, which must not be ordered yet when `keys` are given.
+
+    keys: mapped columns forming a unique sort key, e.g. (Product.name, Product.id); the query is
+    ordered by them (all descending with `descending`). keys=None keeps the query's own order and
+    pages with OFFSET. after / before: cursor strings from a previous Page; malformed ones are
+    ignored (first page). total: optional count to show, e.g. from estimated_count().
+    """
+    if keys is None:
+        return _offset_page(query, decode_cursor(after), decode_cursor(before), per_page, total)
+    after, before = decode_cursor(after, keys), decode_cursor(before, keys)
+    row_key = tuple_(*keys)
+    backwards = after is None and before is not None
+    if after is not None:
+        query = query.filter(row_key < after if descending else row_key > after)
+    elif backwards:
+        query = query.filter(row_key > before if descending else row_key < before)
+    # Walking backwards reads the previous page in reverse order, then flips it
+    reverse = descending != backwards
+    items = query.order_by(*(key.desc() if reverse else key.asc() for key in keys)).limit(per_page + 1).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, after is not None
+    return Page(
+        items,
+        next_cursor=encode_cursor(_key_of(items[-1], keys)) if items and has_next else None,
+        prev_cursor=encode_cursor(_key_of(items[0], keys)) if items and has_prev else None,
+        total=total,
+    )
+
+
+def _offset_page(query, after, before, per_page, total):
+    if after is not None:
+        offset = after
+    elif before is not None:
+        offset = max(before - per_page, 0)
+    else:
+        offset = 0
+    items = query.offset(offset).limit(per_page + 1).all()
+    more = len(items) > per_page
+    return Page(
+        items[:per_page],
+        next_cursor=encode_cursor([offset + per_page]) if more else None,
+        prev_cursor=encode_cursor([offset]) if offset > 0 else None,
+        total=total,
+    )
+
+
+def estimated_count(model):
+    """
+    Approximate row count of model's table: the planner's estimate on PostgreSQL (exact enough
+    after ANALYZE / autovacuum), otherwise COUNT(*) cached for PAGINATION_COUNT_TTL seconds.
+    """
+    table = model.__table__
+    if db.engine.dialect.name == "postgresql":
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table.name}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+    ttl = current_app.config.get("PAGINATION_COUNT_TTL", 60) if has_app_context() else 60
+    cache_key = (str(db.engine.url), table.name)
+    now = time.monotonic()
+    with _counts_lock:
+        cached = _counts.get(cache_key)
+    if cached and now - cached[1] < ttl:
+        return cached[0]
+    count = db.session.execute(select(func.count()).select_from(table)).scalar()
+    with _counts_lock:
+        _counts[cache_key] = (count, now)
+    return count
@@ -0,0 +1,18 @@
+"""
+Process helpers for the per-process files left under instance/ (metrics snapshots, activity log
+spill files).
+"""
+import os
+
+
+def pid_alive(pid):
+    """False only when no process `pid` exists (always True off POSIX)."""
+    if os.name != "posix":
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # exists but belongs to another user
+    return True
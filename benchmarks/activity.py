@@ -0,0 +1,100 @@
+"""
+Activity log paging: COUNT(*) + OFFSET (the old paginate()) vs keyset cursors, at increasing depth.
+
+    python -m benchmarks.activity [--rows 1000000] [--pages 1,100,500,5000] [--repeat 10]
+
+Seeds a log spread over a year across a handful of users and actions, then times reaching page N
+both ways (unfiltered and filtered by user). Keyset cursors for page N are taken from a walk
+beforehand, so only the request for page N itself is timed.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from benchmarks import create_bench_app, seed_user
+
+PER_PAGE = 50
+ACTIONS = ("login", "logout", "create", "update", "delete", "refund")
+
+
+def seed_logs(db, count, user_ids):
+    from app.models.activity_log import ActivityLog
+    rng = random.Random(19)
+    start = datetime.utcnow() - timedelta(days=365)
+    step = 365 * 86400 / count
+    batch = []
+    for i in range(count):
+        batch.append({
+            "user_id": rng.choice(user_ids),
+            "action": rng.choice(ACTIONS),
+            "entity_type": "product",
+            "entity_id": rng.randint(1, 5000),
+            "details": f"bench {i}",
+            "created_at": start + timedelta(seconds=i * step),
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(ActivityLog), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(ActivityLog), batch)
+    db.session.commit()
+
+
+def timed(db, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--pages", default="1,100,500,5000")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    pages = sorted(int(p) for p in args.pages.split(","))
+
+    app = create_bench_app()
+    from app import db
+    from app.models.activity_log import ActivityLog
+    from app.services import activity_log_service as activity
+
+    with app.app_context():
+        user_ids = [seed_user(db, f"bench-activity-{i}").id for i in range(5)]
+        t0 = time.perf_counter()
+        seed_logs(db, args.rows, user_ids)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        print(f"seeded {args.rows:,} log rows in {time.perf_counter() - t0:.1f}s on {db.engine.dialect.name}")
+
+        for label, filters in (("all", {}), ("one user", {"user_id": user_ids[0]})):
+            print(f"\n{label}:")
+            cursors, cursor, page = {1: None}, None, 1
+            while page < pages[-1]:
+                cursor = activity.activity_page(after=cursor, per_page=PER_PAGE, **filters).next_cursor
+                if cursor is None:
+                    break
+                page += 1
+                cursors[page] = cursor
+            db.session.rollback()
+            for n in pages:
+                if n not in cursors:
+                    print(f"  page {n:>6}: beyond the end of the log")
+                    continue
+                query = ActivityLog.query.filter_by(**filters).order_by(ActivityLog.created_at.desc())
+                offset_ms = timed(db, lambda: query.paginate(page=n, per_page=PER_PAGE, error_out=False).items, args.repeat)
+                keyset_ms = timed(db, lambda: activity.activity_page(after=cursors[n], per_page=PER_PAGE, **filters).items,
+                                  args.repeat)
+                print(f"  page {n:>6}: offset={offset_ms:8.2f} ms  keyset={keyset_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
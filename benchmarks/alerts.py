@@ -0,0 +1,101 @@
+"""
+Low-stock / expiry alert queries on a large catalogue: partial indexes vs full-table scans.
+
+    python -m benchmarks.alerts [--products 500000] [--repeat 20]
+
+Seeds products where ~1% are at or below min_stock and ~20% carry an expiration date (a tenth of
+those inside the alert window), then times get_low_stock_products, get_expired_or_near_products
+and the dashboard KPI counts with the alert indexes, and again after dropping them.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
+from benchmarks import create_bench_app
+
+ALERT_INDEXES = ("ix_products_low_stock", "ix_products_expiration_date")
+
+
+def seed_catalogue(db, count):
+    from app.models.product import Product
+    rng = random.Random(5)
+    today = date.today()
+    batch = []
+    for i in range(count):
+        dated = i % 5 == 0
+        batch.append({
+            "name": f"ALERT product {i:07d}",
+            "price": 1 + (i % 900) / 100,
+            "quantity": rng.randint(0, 10) if i % 100 == 0 else rng.randint(11, 500),
+            "min_stock": 10,
+            "sku": f"ALRT-{i:07d}",
+            "barcode": f"66{i:011d}",
+            "expiration_date": today + timedelta(days=rng.randint(-2, 7) if i % 50 == 0 else rng.randint(30, 365))
+            if dated else None,
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(Product), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Product), batch)
+    db.session.commit()
+
+
+def measure(db, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    timings.sort()
+    return result, statistics.median(timings), timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app import db
+    from app.services import inventory_service as inv
+    from app.services import kpi_service as kpis
+    from app.utils.explain import _capture, explain
+
+    queries = [
+        ("low stock list", lambda: len(inv.get_low_stock_products())),
+        ("expiry list", lambda: len(inv.get_expired_or_near_products(days_near=7))),
+        ("dashboard KPIs", lambda: kpis.today_kpis()["low_stock"]),
+    ]
+    with app.app_context():
+        t0 = time.perf_counter()
+        seed_catalogue(db, args.products)
+        if db.engine.dialect.name == "sqlite":
+            db.session.execute(text("ANALYZE"))
+        else:
+            db.session.execute(text("ANALYZE products"))
+        db.session.commit()
+        print(f"seeded {args.products:,} products in {time.perf_counter() - t0:.1f}s on {db.engine.dialect.name}")
+        for label in ("indexed", "full scan"):
+            if label == "full scan":
+                for name in ALERT_INDEXES:
+                    db.session.execute(text(f"DROP INDEX {name}"))
+                db.session.commit()
+                db.engine.dispose()  # SQLite keeps cached EXPLAIN statements planned against the old schema
+            print(f"\n{label}:")
+            for name, fn in queries:
+                rows, median, p95 = measure(db, fn, args.repeat)
+                print(f"  {name:<16} rows={rows:<7} median={median:8.2f} ms  p95={p95:8.2f} ms")
+            for name, fn in queries[:2]:
+                for statement, parameters in _capture(fn):
+                    print(f"  plan ({name}): " + " | ".join(explain(statement, parameters)))
+
+
+if __name__ == "__main__":
+    main()
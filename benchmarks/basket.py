@@ -0,0 +1,110 @@
+"""
+Large baskets through the POS cart API: one POST /pos/cart/add per scan vs one
+POST /pos/cart/add-batch per scanner burst.
+
+    python -m benchmarks.basket [--products 20000] [--sizes 10,30,100] [--baskets 20] [--db-rtt-ms 0]
+
+Fills the same baskets both ways (fresh cart and empty lookup cache each time, random known
+barcodes, some scanned twice) and reports milliseconds and SQL statements per basket.
+--db-rtt-ms adds that much latency to every statement, standing in for a database across the
+network. Checks that both ways end with the same cart and totals; exits non-zero if they do not.
+"""
+import argparse
+import random
+import sys
+import time
+
+from sqlalchemy import event
+
+from benchmarks import count_queries, create_bench_app, seed_products, seed_user
+
+
+def add_latency(engine, ms):
+    if ms <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(ms / 1000.0)
+
+
+def new_client(app, user_id, cart_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+        session["pos_cart_id"] = cart_id
+    return client
+
+
+def fill_single(client, codes):
+    for code in codes:
+        # cart_add resolves barcodes itself (lookup_product_cached)
+        response = client.post("/pos/cart/add", json={"product_id": code, "quantity": 1})
+        if response.status_code != 200:
+            raise RuntimeError(response.get_data(as_text=True))
+    return response.get_json()
+
+
+def fill_batch(client, codes):
+    response = client.post("/pos/cart/add-batch", json={"items": codes})
+    if response.status_code != 200:
+        raise RuntimeError(response.get_data(as_text=True))
+    return response.get_json()
+
+
+def run(app, db, user_id, label, fill, baskets):
+    from app.services.product_cache import get_product_cache
+    timings, statements, results = [], 0, []
+    for n, codes in enumerate(baskets):
+        client = new_client(app, user_id, f"bench-{label}-{len(codes)}-{n}")
+        cache = get_product_cache()
+        if cache is not None:
+            cache.clear()  # both ways start cold; the other run scanned the same codes
+        with count_queries(db.engine) as counter:
+            start = time.perf_counter()
+            results.append(fill(client, codes))
+            timings.append(time.perf_counter() - start)
+        statements += counter.count
+        client.post("/pos/cart/clear")
+    per_basket = sum(timings) / len(timings) * 1000
+    return per_basket, statements / len(baskets), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--sizes", default="10,30,100")
+    parser.add_argument("--baskets", type=int, default=20)
+    parser.add_argument("--db-rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    from app import db
+
+    with app.app_context():
+        seed_products(db, args.products, prefix="BSKT")
+        user_id = seed_user(db, "bench-basket").id
+        add_latency(db.engine, args.db_rtt_ms)
+        rng = random.Random(25)
+        mismatches = 0
+        print(f"{args.products} products, {args.db_rtt_ms} ms per statement")
+        for size in (int(s) for s in args.sizes.split(",")):
+            baskets = []
+            for _ in range(args.baskets):
+                codes = [f"BSKT{i:010d}" for i in rng.sample(range(args.products), size)]
+                codes += rng.sample(codes, size // 10)  # rescans of the same item
+                baskets.append(codes)
+            single_ms, single_sql, single = run(app, db, user_id, "single", fill_single, baskets)
+            batch_ms, batch_sql, batch = run(app, db, user_id, "batch", fill_batch, baskets)
+            mismatches += sum(a["cart"] != b["cart"] or a["totals"] != b["totals"] for a, b in zip(single, batch))
+            print(f"{len(baskets[0]):>4} scans: single={single_ms:8.1f} ms {single_sql:6.0f} statements  "
+                  f"batch={batch_ms:7.1f} ms {batch_sql:4.0f} statements  ({single_ms / batch_ms:.1f}x)")
+    print(f"same cart and totals both ways: {'yes' if not mismatches else f'NO ({mismatches} basket(s) differ)'}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Catalogue change feed: keeping a downstream copy of the catalogue current from
+/inventory/api/changes vs re-reading the whole products table.
+
+    python -m benchmarks.changes [--products 100000] [--updates 200] [--deletes 20] [--inserts 20]
+
+Builds a replica from the feed (full pull, paged), changes a few products (price updates,
+deletions through delete_product, new products), then times the delta pull against a fresh full
+pull and reports rows and bytes transferred. Checks that the replica matches the products table
+after the delta; exits non-zero if it does not.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from sqlalchemy import select, update
+
+from benchmarks import create_bench_app, seed_products
+
+TOKEN = "bench-changes-token"
+
+
+def pull(client, cursor, replica):
+    """Follow the feed from `cursor`, applying it to `replica`; (cursor, pages, rows, bytes, seconds)."""
+    pages = rows = size = 0
+    start = time.perf_counter()
+    while True:
+        response = client.get("/inventory/api/changes", query_string={"since": cursor} if cursor else None,
+                              headers={"Authorization": f"Bearer {TOKEN}"})
+        if response.status_code != 200:
+            raise RuntimeError(response.get_data(as_text=True))
+        size += len(response.data)
+        page = json.loads(response.data)
+        for product_id in page["deleted"]:
+            replica.pop(product_id, None)
+        id_at = page["columns"].index("id")
+        for values in page["products"]:
+            replica[values[id_at]] = values
+        pages += 1
+        rows += len(page["products"]) + len(page["deleted"])
+        cursor = page["cursor"]
+        if not page["more"]:
+            return cursor, pages, rows, size, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--deletes", type=int, default=20)
+    parser.add_argument("--inserts", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    app.config.update(REGISTER_SYNC_TOKENS=[TOKEN], CATALOG_CHANGES_LAG=0)
+    from app import db
+    from app.models.product import Product
+    from app.services.inventory_service import delete_product
+
+    with app.app_context():
+        product_ids = seed_products(db, args.products, quantity=100, prefix="FEED")
+    print(f"{args.products} products; then {args.updates} updated, {args.deletes} deleted, {args.inserts} added")
+
+    client = app.test_client()
+    replica = {}
+    cursor, pages, rows, size, seconds = pull(client, None, replica)
+    print(f"\ninitial pull:  {rows:>7} rows  {pages:>4} pages  {size / 1e6:7.2f} MB  {seconds * 1000:8.1f} ms")
+
+    rng = random.Random(24)
+    changed = rng.sample(product_ids, args.updates + args.deletes)
+    with app.app_context():
+        db.session.execute(update(Product).where(Product.id.in_(changed[:args.updates]))
+                           .values(price=Product.price + 1))
+        db.session.commit()
+        for product_id in changed[args.updates:]:
+            delete_product(product_id)
+        seed_products(db, args.inserts, quantity=100, prefix="FEED-NEW")
+
+    cursor, pages, rows, size, seconds = pull(client, cursor, replica)
+    print(f"delta pull:    {rows:>7} rows  {pages:>4} pages  {size / 1e6:7.2f} MB  {seconds * 1000:8.1f} ms")
+    full = {}
+    _, pages, rows, size, full_seconds = pull(client, None, full)
+    print(f"full re-read:  {rows:>7} rows  {pages:>4} pages  {size / 1e6:7.2f} MB  {full_seconds * 1000:8.1f} ms"
+          f"  ({full_seconds / seconds:,.0f}x the delta)")
+
+    with app.app_context():
+        ids = set(db.session.execute(select(Product.id)).scalars())
+    ok = replica == full and set(replica) == ids
+    print(f"\nreplica matches the products table: {'yes' if ok else 'NO'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
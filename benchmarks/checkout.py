@@ -0,0 +1,39 @@
+"""
+Checkout round trips vs basket size.
+
+    python -m benchmarks.checkout
+
+Prints the number of SQL statements and wall time per create_sale call for growing baskets;
+the statement count should stay flat.
+"""
+import time
+
+from benchmarks import create_bench_app, count_queries, seed_products, seed_user
+
+BASKET_SIZES = (1, 10, 40, 100, 250)
+
+
+def main():
+    app = create_bench_app()
+    from app import db
+    from app.services.billing_service import create_sale
+    with app.app_context():
+        user = seed_user(db)
+        product_ids = seed_products(db, max(BASKET_SIZES), prefix="CHK")
+        print(f"{'items':>6} {'statements':>11} {'ms':>9}")
+        for size in BASKET_SIZES:
+            cart = [
+                {"product_id": pid, "name": str(pid), "price": 1.5, "quantity": 1, "subtotal": 1.5}
+                for pid in product_ids[:size]
+            ]
+            with count_queries(db.engine) as counter:
+                start = time.perf_counter()
+                sale, err = create_sale(user.id, cart, "cash")
+                elapsed = (time.perf_counter() - start) * 1000
+            if err:
+                raise SystemExit(err)
+            print(f"{size:>6} {counter.count:>11} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Time and memory of the sales exports (CSV, Excel, PDF) for growing date ranges.
+
+    python -m benchmarks.export [--sizes 10000,100000,1000000] [--formats csv,excel,pdf]
+                                [--max-rss-mb 64]
+
+Seeds synthetic sales (1000 per day), then exports ranges of each size with no row limit,
+sampling RSS after every batch. CSV and Excel should stay under --max-rss-mb of RSS growth at
+any size; the run exits non-zero when they do not or a row count is off. PDF memory is reported
+only: ReportLab keeps the finished pages in memory until the file is saved.
+"""
+import argparse
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import create_bench_app, seed_user
+
+SEED_CHUNK = 50_000
+SALES_PER_DAY = 1000
+BOUNDED_FORMATS = {"csv", "excel"}
+
+
+def rss_mb():
+    """Current resident set size (Linux), falling back to the peak from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed_sales(db, user_id, count, start):
+    from sqlalchemy import insert
+    from app.models.sale import Sale
+    step = timedelta(days=1) / SALES_PER_DAY
+    for offset in range(0, count, SEED_CHUNK):
+        db.session.execute(insert(Sale), [
+            {
+                "user_id": user_id,
+                "subtotal": 10 + i % 90,
+                "tax_amount": 1,
+                "discount_amount": 0,
+                "total": 11 + i % 90,
+                "payment_method": "cash",
+                "created_at": start + step * i,
+            }
+            for i in range(offset, min(offset + SEED_CHUNK, count))
+        ])
+        db.session.commit()
+
+
+def export(fmt, start, end, sample):
+    """Run one export; returns (rows, bytes)."""
+    from app.services import report_service as reports
+    if fmt == "csv":
+        rows = size = 0
+        for chunk in reports.export_sales_csv(start, end):
+            rows += chunk.count("\n")
+            size += len(chunk)
+            sample()
+        return rows - 1, size
+    done = []
+
+    def progress(rows):
+        done.append(rows)
+        sample()
+
+    if fmt == "excel":
+        out = reports.export_sales_excel_io(start, end, progress=progress)
+    else:
+        out = reports.export_sales_pdf_io(start, end, progress=progress)
+    size = out.seek(0, 2)
+    out.close()
+    return (done[-1] if done else 0), size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--formats", default="csv,excel,pdf")
+    parser.add_argument("--max-rss-mb", type=float, default=64)
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    formats = args.formats.split(",")
+
+    app = create_bench_app()
+    from app import db
+
+    failures = []
+    with app.app_context():
+        user = seed_user(db)
+        start = datetime(2020, 1, 1)
+        t0 = time.perf_counter()
+        seed_sales(db, user.id, sizes[-1], start)
+        print(f"seeded {sizes[-1]:,} sales in {time.perf_counter() - t0:.1f}s")
+        db.session.expunge_all()
+
+        print(f"{'format':<6} {'rows':>9} {'seconds':>8} {'rows/s':>9} {'MiB out':>8} {'RSS +MiB':>9}")
+        for fmt in formats:
+            for size in sizes:
+                end = start + timedelta(days=-(-size // SALES_PER_DAY) - 1)  # inclusive last day
+                base = rss_mb()
+                peak = [base]
+
+                def sample():
+                    peak[0] = max(peak[0], rss_mb())
+
+                t0 = time.perf_counter()
+                rows, out_bytes = export(fmt, start, end, sample)
+                elapsed = time.perf_counter() - t0
+                db.session.rollback()
+                growth = peak[0] - base
+                print(f"{fmt:<6} {rows:>9,} {elapsed:>8.1f} {rows / elapsed:>9,.0f} "
+                      f"{out_bytes / 2**20:>8.1f} {growth:>9.1f}")
+                if rows != size:
+                    failures.append(f"{fmt} {size}: exported {rows} rows")
+                if fmt in BOUNDED_FORMATS and growth > args.max_rss_mb:
+                    failures.append(f"{fmt} {size}: RSS grew {growth:.1f} MiB")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Multi-threaded load test over the POS, inventory and analytics hot paths.
+
+    python -m benchmarks.load [--threads 4] [--duration 30] [--skus 2000] [--months 3]
+                              [--save baseline.json] [--compare baseline.json] [--tolerance 0.5]
+
+Seeds a synthetic store (see benchmarks.seed), then each thread logs in with its own Flask test
+client and runs weighted scenarios until the duration is up:
+
+- pos:       scan (lookup by barcode) -> cart add, 1-5 lines -> checkout -> receipt
+- search:    product list search
+- alerts:    low stock / expiry alerts
+- analytics: dashboard, sales report, inventory report, chart API (last 30 days)
+
+Reports p50/p95/p99 latency, throughput and SQL statements per request for every step.
+--save writes the results as a JSON baseline; --compare exits non-zero when a step's p50 is
+more than --tolerance slower or it issues more statements than the baseline (a slower p95 is
+reported as a warning). Compare runs with the same options and database; --threads 1 gives the
+steadiest numbers on SQLite.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from benchmarks import create_bench_app, sqlite_immediate_transactions
+
+SCENARIO_WEIGHTS = {"pos": 5, "search": 2, "alerts": 1, "analytics": 2}
+MIN_LATENCY_MS = 2.0  # below this, latency differences are noise
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Latency and per-request statement counts per step, safe to share between threads."""
+
+    def __init__(self, engine):
+        self.samples = defaultdict(list)  # step -> [(seconds, statements)]
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.statements = getattr(self._local, "statements", 0) + 1
+
+    def request(self, client, step, method, url, expect=(200, 302), **kwargs):
+        self._local.statements = 0
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[step].append((elapsed, self._local.statements))
+            if response.status_code not in expect:
+                self.errors[step] += 1
+        return response
+
+    def record(self, step, elapsed):
+        with self._lock:
+            self.samples[step].append((elapsed, None))
+
+    def summary(self, wall_seconds):
+        results = {}
+        for step, samples in sorted(self.samples.items()):
+            latencies = sorted(s for s, _ in samples)
+            counts = [q for _, q in samples if q is not None]
+            results[step] = {
+                "count": len(samples),
+                "errors": self.errors.get(step, 0),
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "per_second": len(samples) / wall_seconds,
+                "queries": sum(counts) / len(counts) if counts else None,
+                "max_queries": max(counts) if counts else None,
+            }
+        return results
+
+
+def pos_flow(client, store, rng, rec):
+    start = time.perf_counter()
+    for _ in range(rng.randint(1, 5)):
+        barcode = rng.choice(store["sellable_barcodes"])
+        r = rec.request(client, "pos.lookup", "GET", f"/pos/lookup?q={barcode}",
+                        headers={"X-Requested-With": "XMLHttpRequest"}, expect=(200,))
+        if r.status_code != 200:
+            continue
+        rec.request(client, "pos.cart_add", "POST", "/pos/cart/add",
+                    json={"product_id": r.json["product"]["id"], "quantity": 1}, expect=(200,))
+    r = rec.request(client, "pos.checkout", "POST", "/pos/checkout", data={"payment_method": "cash"}, expect=(302,))
+    location = r.headers.get("Location", "")
+    if "/pos/receipt/" in location:
+        rec.request(client, "pos.receipt", "GET", location, expect=(200,))
+    rec.record("flow.pos", time.perf_counter() - start)
+
+
+def search_flow(client, store, rng, rec):
+    rec.request(client, "inventory.search", "GET", f"/inventory/?search={rng.choice(store['search_terms'])}", expect=(200,))
+
+
+def alerts_flow(client, store, rng, rec):
+    rec.request(client, "inventory.alerts", "GET", "/inventory/alerts", expect=(200,))
+
+
+def analytics_flow(client, store, rng, rec):
+    end = date.today()
+    qs = f"start={end - timedelta(days=30)}&end={end}"
+    rec.request(client, "analytics.dashboard", "GET", f"/analytics/?{qs}", expect=(200,))
+    rec.request(client, "analytics.sales", "GET", f"/analytics/sales?{qs}", expect=(200,))
+    rec.request(client, "analytics.inventory", "GET", f"/analytics/inventory?{qs}", expect=(200,))
+    rec.request(client, "analytics.chart", "GET", f"/analytics/api/chart?{qs}", expect=(200,))
+
+
+SCENARIOS = {"pos": pos_flow, "search": search_flow, "alerts": alerts_flow, "analytics": analytics_flow}
+
+
+def worker(app, store, rec, deadline, seed, counters):
+    rng = random.Random(seed)
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "bench", "password": "bench"})
+    names = list(SCENARIO_WEIGHTS)
+    weights = [SCENARIO_WEIGHTS[n] for n in names]
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        SCENARIOS[name](client, store, rng, rec)
+        counters[name] += 1
+
+
+def compare(results, baseline, tolerance):
+    """
+    (regressions, warnings) against a saved baseline. A step regresses when its p50 is more than
+    `tolerance` slower or it issues more statements; a slower p95 only warns, since tail latency
+    under concurrent SQLite writers is dominated by lock waits.
+    """
+    problems, warnings = [], []
+    for step, base in baseline.get("results", {}).items():
+        cur = results.get(step)
+        if cur is None:
+            continue
+        if base["p50_ms"] >= MIN_LATENCY_MS and cur["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            problems.append(f"{step}: p50 {cur['p50_ms']:.1f} ms vs baseline {base['p50_ms']:.1f} ms")
+        if base.get("queries") is not None and cur["queries"] is not None and cur["queries"] > base["queries"] + 0.5:
+            problems.append(f"{step}: {cur['queries']:.1f} statements/request vs baseline {base['queries']:.1f}")
+        if base["p95_ms"] >= MIN_LATENCY_MS and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            warnings.append(f"{step}: p95 {cur['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+    return problems, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load after seeding.")
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--sales-per-day", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Write results to this JSON baseline.")
+    parser.add_argument("--compare", help="Compare against this JSON baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed p50 slowdown (0.5 = 50%%).")
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app import db
+    from benchmarks.seed import seed_store
+
+    with app.app_context():
+        sqlite_immediate_transactions(db.engine)
+        # Detect the search backend before any session transaction is open: detection uses its
+        # own connection, which would wait on that transaction's BEGIN IMMEDIATE under SQLite
+        from app.services.search_service import get_search_backend
+        search_backend = get_search_backend()
+        t0 = time.perf_counter()
+        store = seed_store(db, args.skus, args.customers, args.months, args.sales_per_day, seed=args.seed)
+        from app.models.product import Product
+        store["sellable_barcodes"] = [
+            b for (b,) in db.session.query(Product.barcode).filter(Product.quantity > 100, Product.barcode.isnot(None))
+        ]
+        db.session.remove()
+        engine = db.engine
+        dialect = engine.dialect.name
+    print(f"seeded {len(store['product_ids']):,} SKUs, {len(store['sale_ids']):,} sales "
+          f"on {dialect} (search: {search_backend}) in {time.perf_counter() - t0:.1f}s")
+
+    rec = Recorder(engine)
+    counters = defaultdict(int)
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(app, store, rec, deadline, args.seed + i, counters))
+        for i in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    results = rec.summary(wall)
+
+    total_requests = sum(r["count"] for step, r in results.items() if not step.startswith("flow."))
+    print(f"{args.threads} thread(s), {wall:.1f}s, {total_requests:,} requests, {total_requests / wall:,.1f} req/s, "
+          + ", ".join(f"{n}={c}" for n, c in sorted(counters.items())))
+    print(f"{'step':<22} {'count':>7} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'/s':>7} {'q/req':>6} {'max q':>6}")
+    for step, r in results.items():
+        q = f"{r['queries']:>6.1f}" if r["queries"] is not None else f"{'-':>6}"
+        mq = f"{r['max_queries']:>6}" if r["max_queries"] is not None else f"{'-':>6}"
+        print(f"{step:<22} {r['count']:>7} {r['errors']:>4} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['per_second']:>7.1f} {q} {mq}")
+
+    report = {
+        "meta": {
+            "dialect": dialect,
+            "search_backend": search_backend,
+            "threads": args.threads,
+            "duration": args.duration,
+            "skus": args.skus,
+            "customers": args.customers,
+            "months": args.months,
+            "sales_per_day": args.sales_per_day,
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "throughput": total_requests / wall,
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save}")
+    failed = any(r["errors"] for r in results.values())
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        problems, warnings = compare(results, baseline, args.tolerance)
+        for warning in warnings:
+            print("WARN " + warning)
+        for problem in problems:
+            print("REGRESSION " + problem)
+        failed = failed or bool(problems)
+        if not problems:
+            print(f"no regressions against {args.compare}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Cart totals in integer cents vs the Decimal(str(float)) path they replaced.
+
+    python -m benchmarks.money [--lines 5,20,100] [--carts 2000] [--repeat 5]
+
+First checks, on random carts and discounts, that calculate_cart_totals (cents) gives the same
+subtotal, discount, tax and total as exact Decimal arithmetic, and that a cart survives a
+storage round trip unchanged; exits non-zero on any mismatch. Then times totals for carts of
+each size both ways, and an add-line + totals + save cycle on a Cart against the old float /
+dict cart line.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks import create_bench_app
+
+CENT = Decimal("0.01")
+
+
+def decimal_totals(items, discount_amount, tax_rate):
+    """The pre-cents calculate_cart_totals (no promotions): float lines summed via Decimal(str())."""
+    subtotal = sum((Decimal(str(item["subtotal"])) for item in items), Decimal(0))
+    discount = Decimal(str(discount_amount or 0))
+    after_discount = subtotal - discount
+    tax = (after_discount * tax_rate).quantize(CENT)
+    return subtotal, discount, tax, after_discount + tax
+
+
+def legacy_set_line(lines, subtotal, product_id, name, price, quantity):
+    """The pre-cents Cart.set_line: a dict line with float price / subtotal and a Decimal running subtotal."""
+    price = float(price)
+    line_subtotal = round(price * quantity, 2)
+    line = lines.get(product_id)
+    if line:
+        subtotal -= Decimal(str(line["subtotal"]))
+        line.update(price=price, quantity=quantity, subtotal=line_subtotal)
+    else:
+        lines[product_id] = {"product_id": product_id, "name": name, "price": price,
+                             "quantity": quantity, "subtotal": line_subtotal}
+    return subtotal + Decimal(str(line_subtotal))
+
+
+def random_cart(rng, size):
+    return [(pid, f"Product {pid}", Decimal(rng.randint(1, 99999)) / 100, rng.randint(1, 12))
+            for pid in rng.sample(range(1, 100000), size)]
+
+
+def check_parity(rng, carts, tax_rate):
+    from app.services.billing_service import calculate_cart_totals
+    from app.services.cart_store import Cart, CartLine
+    from app.utils.money import to_cents
+    failures = 0
+    for cart in carts:
+        lines = [CartLine(pid, name, to_cents(price), qty) for pid, name, price, qty in cart]
+        discount = Decimal(rng.randint(0, 2000)) / 100
+        exact = [{"subtotal": str(price * qty)} for _, _, price, qty in cart]
+        want = decimal_totals(exact, discount, tax_rate)
+        got = calculate_cart_totals(lines, discount_amount=discount, apply_promotions=False)
+        if want != (got["subtotal"], got["discount_amount"], got["tax_amount"], got["total"]):
+            failures += 1
+            print(f"totals mismatch: decimal={want} cents={got}")
+        stored = Cart("parity", lines)
+        loaded = Cart.from_json("parity", stored.to_json())
+        if loaded.subtotal_cents != stored.subtotal_cents or [l.pack() for l in loaded] != [l.pack() for l in stored]:
+            failures += 1
+            print(f"round trip mismatch: {stored.to_json()} -> {loaded.to_json()}")
+    return failures
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", default="5,20,100")
+    parser.add_argument("--carts", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app.services.billing_service import calculate_cart_totals, get_tax_rate
+    from app.services.cart_store import Cart, CartLine
+    from app.utils.money import to_cents
+
+    rng = random.Random(22)
+    tax_rate = get_tax_rate()
+    with app.app_context():
+        failures = check_parity(rng, [random_cart(rng, rng.randint(1, 60)) for _ in range(args.carts)], tax_rate)
+        print(f"parity: {args.carts} random carts, {failures} mismatch(es)")
+        if failures:
+            sys.exit(1)
+
+        for size in (int(n) for n in args.lines.split(",")):
+            carts = [random_cart(rng, size) for _ in range(200)]
+            legacy = [[{"subtotal": round(float(price) * qty, 2)} for _, _, price, qty in cart] for cart in carts]
+            lines = [[CartLine(pid, name, to_cents(price), qty) for pid, name, price, qty in cart] for cart in carts]
+            decimal_s = best_of(lambda: [decimal_totals(items, 0, tax_rate) for items in legacy], args.repeat)
+            cents_s = best_of(lambda: [calculate_cart_totals(items, apply_promotions=False) for items in lines],
+                              args.repeat)
+            print(f"totals, {size:>3} lines: decimal={decimal_s * 1e6 / len(carts):7.1f} us  "
+                  f"cents={cents_s * 1e6 / len(carts):7.1f} us  ({decimal_s / cents_s:.1f}x)")
+
+            def legacy_cycle():
+                for cart in carts:
+                    items, subtotal = {}, Decimal(0)
+                    for pid, name, price, qty in cart:
+                        subtotal = legacy_set_line(items, subtotal, pid, name, price, qty)
+                    decimal_totals(items.values(), 0, tax_rate)
+                    json.dumps(list(items.values()), separators=(",", ":"))
+
+            def cents_cycle():
+                for cart in carts:
+                    c = Cart("bench")
+                    for pid, name, price, qty in cart:
+                        c.set_line(pid, name, price, qty)
+                    calculate_cart_totals(c, apply_promotions=False)
+                    c.to_json()
+
+            legacy_s, cart_s = best_of(legacy_cycle, args.repeat), best_of(cents_cycle, args.repeat)
+            print(f"build + totals + save, {size:>3} lines: legacy={legacy_s * 1e6 / len(carts):7.1f} us  "
+                  f"cents={cart_s * 1e6 / len(carts):7.1f} us  ({legacy_s / cart_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
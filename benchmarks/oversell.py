@@ -0,0 +1,86 @@
+"""
+Oversell stress run: many simulated registers selling one hot SKU in parallel.
+
+    python -m benchmarks.oversell [--registers 16] [--stock 200]
+
+Each register reserves 1-3 units, then checks out. The run fails unless units sold equal the
+stock decrement, stock never goes negative, and no deadlock was raised. Point DATABASE_URL at
+PostgreSQL for real row-lock contention; on SQLite transactions use BEGIN IMMEDIATE instead.
+"""
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import create_bench_app, seed_products, seed_user, sqlite_immediate_transactions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--registers", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app import db
+    from app.models.product import Product
+    from app.services import reservation_service as reservations
+    from app.services.billing_service import create_sale
+
+    with app.app_context():
+        sqlite_immediate_transactions(db.engine)
+        user_id = seed_user(db).id
+        product_id = seed_products(db, 1, quantity=args.stock, prefix=f"HOT{random.randint(0, 10**6)}")[0]
+
+    stats = {"sold": 0, "rejected": 0, "busy": 0, "deadlocks": 0}
+    lock = threading.Lock()
+
+    def register(n):
+        holder = f"register-{n}"
+        rng = random.Random(n)
+        with app.app_context():
+            while True:
+                qty = rng.randint(1, 3)
+                try:
+                    _, err = reservations.reserve(holder, product_id, qty)
+                    if not err:
+                        cart = [{"product_id": product_id, "name": "hot", "price": 1, "quantity": qty, "subtotal": qty}]
+                        sale, err = create_sale(user_id, cart, "cash", holder=holder)
+                except OperationalError as e:
+                    db.session.rollback()
+                    key = "deadlocks" if "deadlock" in str(e).lower() else "busy"
+                    with lock:
+                        stats[key] += 1
+                    continue
+                with lock:
+                    if err:
+                        stats["rejected"] += 1
+                    else:
+                        stats["sold"] += qty
+                sold_out = err and db.session.get(Product, product_id).quantity == 0
+                db.session.rollback()  # end the read transaction so SQLite writers are not blocked
+                if sold_out:
+                    return
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=register, args=(n,)) for n in range(args.registers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        final = db.session.get(Product, product_id).quantity
+    print(f"registers={args.registers} stock={args.stock} elapsed={elapsed:.2f}s")
+    print(f"sold={stats['sold']} final_stock={final} rejected={stats['rejected']} "
+          f"busy_retries={stats['busy']} deadlocks={stats['deadlocks']}")
+    ok = final >= 0 and stats["sold"] == args.stock - final and stats["deadlocks"] == 0
+    print("OK: no oversell" if ok else "FAIL: oversell or deadlock detected")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Promotion engine throughput: carts priced per second against hundreds of active promotions.
+
+    python -m benchmarks.promotions [--promotions 500] [--carts 20000] [--lines 5-40] [--threads 1,4]
+
+Seeds products in categories and a mix of product, category and basket promotions (percentage,
+fixed, BOGO, multi-buy, tiered), then prices random carts through calculate_cart_totals - the
+same path as the POS totals and checkout - and counts the SQL statements that costs (0 once the
+promotion cache is warm).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from benchmarks import count_queries, create_bench_app
+
+CATEGORIES = 50
+
+
+def seed(db, products, promotions, rng):
+    from app.models.category import Category
+    from app.models.product import Product
+    from app.models.promotion import Promotion
+    db.session.execute(insert(Category), [{"name": f"PROMO category {i}"} for i in range(CATEGORIES)])
+    category_ids = [c.id for c in Category.query.filter(Category.name.like("PROMO category %")).all()]
+    db.session.execute(insert(Product), [{
+        "name": f"PROMO product {i:06d}",
+        "price": Decimal(rng.randint(50, 2000)) / 100,
+        "quantity": 1000,
+        "sku": f"PRM-{i:06d}",
+        "category_id": category_ids[i % len(category_ids)],
+    } for i in range(products)])
+    product_rows = Product.query.filter(Product.sku.like("PRM-%")).with_entities(
+        Product.id, Product.name, Product.price, Product.category_id).all()
+    rows = []
+    for i in range(promotions):
+        kind = ("percentage", "fixed", "bogo", "multibuy", "tiered")[i % 5]
+        scope = "basket" if i % 25 == 0 and kind in ("percentage", "fixed", "tiered") else ("product", "category")[i % 3 == 0]
+        rows.append({
+            "name": f"PROMO {kind} {scope} {i}",
+            "promo_type": kind,
+            "scope": scope,
+            "value": {"percentage": 10, "fixed": 0.5, "bogo": 100, "multibuy": 5, "tiered": 0}[kind],
+            "product_id": rng.choice(product_rows).id if scope == "product" else None,
+            "category_id": rng.choice(category_ids) if scope == "category" else None,
+            "buy_quantity": 2 if kind in ("bogo", "multibuy") else None,
+            "get_quantity": 1 if kind == "bogo" else None,
+            "tiers": json.dumps([{"min": 3, "value": 5}, {"min": 6, "value": 10}] if scope != "basket"
+                                else [{"min": 50, "value": 5}, {"min": 100, "value": 8}]) if kind == "tiered" else None,
+            "min_purchase": None,
+            "automatic": True,
+            "active": True,
+        })
+    db.session.execute(insert(Promotion), rows)
+    db.session.commit()
+    return product_rows
+
+
+def random_cart(rng, product_rows, lines):
+    cart = []
+    for p in rng.sample(product_rows, rng.randint(*lines)):
+        qty = rng.randint(1, 6)
+        cart.append({"product_id": p.id, "name": p.name, "price": str(p.price), "quantity": qty,
+                     "subtotal": str(p.price * qty), "category_id": p.category_id})
+    return cart
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--promotions", type=int, default=500)
+    parser.add_argument("--carts", type=int, default=20000)
+    parser.add_argument("--lines", default="5-40", help="Lines per cart, min-max.")
+    parser.add_argument("--threads", default="1,4")
+    args = parser.parse_args()
+    lines = tuple(int(n) for n in args.lines.split("-"))
+
+    app = create_bench_app()
+    from app import db
+    from app.services.billing_service import calculate_cart_totals
+    from app.services.promotion_engine import active_promotions
+
+    rng = random.Random(21)
+    with app.app_context():
+        product_rows = seed(db, args.products, args.promotions, rng)
+        carts = [random_cart(rng, product_rows, lines) for _ in range(min(args.carts, 2000))]
+        view = active_promotions()
+        print(f"{len(view.by_id)} active promotions ({sum(map(len, view.by_product.values()))} product, "
+              f"{sum(map(len, view.by_category.values()))} category, {len(view.basket)} basket) "
+              f"on {db.engine.dialect.name}")
+        with count_queries(db.engine) as counter:
+            applied = sum(len(calculate_cart_totals(cart)["promotions"]) for cart in carts)
+        print(f"warm cache: {counter.count} statement(s) for {len(carts)} carts, "
+              f"{applied / len(carts):.1f} promotions applied per cart")
+
+    for threads in (int(t) for t in args.threads.split(",")):
+        per_thread = args.carts // threads
+
+        def work(offset):
+            with app.app_context():
+                for i in range(per_thread):
+                    calculate_cart_totals(carts[(offset + i) % len(carts)])
+
+        workers = [threading.Thread(target=work, args=(t * 997,)) for t in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        print(f"threads={threads}: {per_thread * threads / elapsed:,.0f} carts/s "
+              f"({elapsed * 1e6 / (per_thread * threads):.0f} us per cart, {lines[0]}-{lines[1]} lines)")
+
+
+if __name__ == "__main__":
+    main()
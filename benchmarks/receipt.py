@@ -0,0 +1,70 @@
+"""
+Receipt rendering round trips vs basket size.
+
+    python -m benchmarks.receipt
+
+For growing baskets, counts the SQL statements of:
+- the old lazy template walk (sale.items, then item.product per line), for comparison;
+- a reprint served from the stored receipt;
+- a first view of a sale with no stored receipt (one joined query, then stored);
+- GET /pos/receipt/<id> end to end.
+tests/test_statement_counts.py asserts that the new paths stay flat.
+"""
+import sys
+
+from benchmarks import count_queries, create_bench_app, seed_products, seed_user
+
+BASKET_SIZES = (1, 10, 50, 200)
+
+
+def main():
+    app = create_bench_app()
+    from app import db
+    from app.models.receipt import Receipt
+    from app.models.sale import Sale
+    from app.services.billing_service import create_sale
+    from app.services.receipt_service import get_receipt
+
+    client = app.test_client()
+    with app.app_context():
+        seed_user(db)
+        product_ids = seed_products(db, max(BASKET_SIZES), prefix="RCPT")
+    client.post("/auth/login", data={"username": "bench", "password": "bench"})
+    print(f"{'items':>6} {'lazy walk':>10} {'stored':>7} {'first view':>11} {'GET':>5}")
+    for size in BASKET_SIZES:
+        with app.app_context():
+            user = seed_user(db)
+            cart = [
+                {"product_id": pid, "name": str(pid), "price": 1.25, "quantity": 2, "subtotal": 2.5}
+                for pid in product_ids[:size]
+            ]
+            sale, error = create_sale(user.id, cart, "cash")
+            if error:
+                sys.exit(error)
+            sale_id = sale.id
+            db.session.expunge_all()
+
+            with count_queries(db.engine) as lazy:
+                old = db.session.get(Sale, sale_id)
+                [item.product.name for item in old.items]
+            db.session.expunge_all()
+
+            with count_queries(db.engine) as stored:
+                get_receipt(sale_id).html
+            db.session.expunge_all()
+
+            db.session.query(Receipt).filter_by(sale_id=sale_id).delete()
+            db.session.commit()
+            db.session.expunge_all()
+            with count_queries(db.engine) as first:
+                get_receipt(sale_id)
+            engine = db.engine
+        with count_queries(engine) as http:
+            response = client.get(f"/pos/receipt/{sale_id}")
+        if response.status_code != 200:
+            sys.exit(f"GET /pos/receipt/{sale_id} returned {response.status_code}")
+        print(f"{size:>6} {lazy.count:>10} {stored.count:>7} {first.count:>11} {http.count:>5}")
+
+
+if __name__ == "__main__":
+    main()
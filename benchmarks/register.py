@@ -0,0 +1,191 @@
+"""
+Offline register mode end to end: a central app and a till, each on its own database, syncing
+over HTTP (the central app is served on a local port).
+
+    python -m benchmarks.register [--products 20000] [--sales 500] [--db-rtt-ms 2]
+                                  [--central-db URL] [--till-db URL]
+
+Defaults to two throwaway SQLite files; pass database URLs for PostgreSQL. --db-rtt-ms adds that
+much latency to every statement on the central database, standing in for a slow store link.
+
+Reports the initial catalogue pull, checkout latency at the till vs directly against the central
+database, and push throughput; then checks that a re-push is recorded once, that an oversold
+product is reported as a conflict, that the till keeps selling while the central app is down,
+and that stock and deletions converge after the next sync. Exits non-zero if a check fails.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy import event, func, select, update
+from werkzeug.serving import make_server
+
+from benchmarks import seed_products, seed_user
+
+TOKEN = "bench-register-token"
+
+
+def make_app(url):
+    os.environ["DATABASE_URL"] = url
+    from app import create_app
+    return create_app("testing")
+
+
+def serve(app):
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def add_latency(engine, ms):
+    if ms <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(ms / 1000.0)
+
+
+def checkout(db, user_id, lines):
+    from app.services.billing_service import create_sale
+    start = time.perf_counter()
+    sale, err = create_sale(user_id, lines, "cash")
+    elapsed = (time.perf_counter() - start) * 1000
+    if err:
+        raise RuntimeError(err)
+    return sale, elapsed
+
+
+def cart(rng_state, product_ids, names, prices):
+    i = rng_state[0] = (rng_state[0] * 1103515245 + 12345) % 2**31
+    picked = [product_ids[(i + k * 7919) % len(product_ids)] for k in range(3 + i % 5)]
+    return [{"product_id": pid, "name": names[pid], "price": prices[pid], "quantity": 1} for pid in dict.fromkeys(picked)]
+
+
+def summary(timings):
+    ordered = sorted(timings)
+    return f"p50={statistics.median(ordered):6.2f} ms  p95={ordered[int(len(ordered) * 0.95) - 1]:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--sales", type=int, default=500)
+    parser.add_argument("--db-rtt-ms", type=float, default=2.0)
+    parser.add_argument("--central-db")
+    parser.add_argument("--till-db")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix="gsms-register-")
+    central_url = args.central_db or f"sqlite:///{os.path.join(tmp, 'central.db')}"
+    till_url = args.till_db or f"sqlite:///{os.path.join(tmp, 'till.db')}"
+    failures = []
+
+    def check(ok, label):
+        print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+        if not ok:
+            failures.append(label)
+
+    central = make_app(central_url)
+    central.config.update(REGISTER_SYNC_TOKENS=[TOKEN], REGISTER_CATALOG_LAG=0)
+    till = make_app(till_url)
+    from app import db
+    from app.models.product import Product
+    from app.models.sale import Sale
+    from app.services.inventory_service import delete_product
+    from app.services.register_sync import init_register_sync, unsynced_count
+    server, base_url = serve(central)
+    till.config.update(REGISTER_MODE="offline", REGISTER_CENTRAL_URL=base_url, REGISTER_SYNC_TOKEN=TOKEN,
+                       REGISTER_ID="bench-till", REGISTER_SYNC_INTERVAL=0)
+    sync = init_register_sync(till)
+
+    with central.app_context():
+        user_id = seed_user(db, "bench-register").id
+        product_ids = seed_products(db, args.products, quantity=100000, prefix="REG")
+        # Never in a basket, so it can be deleted centrally whatever --products / --sales are
+        discontinued = seed_products(db, 1, quantity=100000, prefix="REGGONE")[0]
+        rows = db.session.execute(select(Product.id, Product.name, Product.price)).all()
+        names, prices = {r.id: r.name for r in rows}, {r.id: str(r.price) for r in rows}
+        add_latency(db.engine, args.db_rtt_ms)
+    print(f"central: {central_url}\ntill:    {till_url}\n{args.products} products, "
+          f"{args.db_rtt_ms} ms per central statement")
+
+    with till.app_context():
+        start = time.perf_counter()
+        report, err = sync.sync()
+        print(f"\ninitial pull: {report.get('pull', {}).get('products', 0)} products in "
+              f"{time.perf_counter() - start:.2f}s" + (f" ({err})" if err else ""))
+
+        rng_state = [7]
+        till_ms = [checkout(db, user_id, cart(rng_state, product_ids, names, prices))[1] for _ in range(args.sales)]
+    with central.app_context():
+        rng_state = [7]
+        n = max(args.sales // 5, 20)
+        central_ms = [checkout(db, user_id, cart(rng_state, product_ids, names, prices))[1] for _ in range(n)]
+        central_sales_before = db.session.execute(select(func.count()).select_from(Sale)).scalar()
+    print(f"\ncheckout at the till    ({args.sales} sales): {summary(till_ms)}")
+    print(f"checkout against central ({n} sales):  {summary(central_ms)}")
+
+    print("\nchecks:")
+    with till.app_context():
+        start = time.perf_counter()
+        report, err = sync.sync(pull=False)
+        elapsed = time.perf_counter() - start
+        print(f"  push: {report['push']['created']} sales in {elapsed:.2f}s "
+              f"({report['push']['created'] / elapsed:,.0f} sales/s)" if not err else f"  push failed: {err}")
+        check(not err and report["push"]["created"] == args.sales and unsynced_count() == 0, "all till sales pushed")
+
+        # Re-push everything, as a till would after losing the response
+        db.session.execute(update(Sale).values(synced_at=None))
+        db.session.commit()
+        report, err = sync.sync(pull=False)
+        check(not err and report["push"]["duplicate"] == args.sales and report["push"]["created"] == 0,
+              "re-pushed sales are recognised as duplicates")
+    with central.app_context():
+        total = db.session.execute(select(func.count()).select_from(Sale)).scalar()
+        check(total == central_sales_before + args.sales, "central recorded each till sale once")
+        oversold = product_ids[0]
+        db.session.execute(update(Product).where(Product.id == oversold).values(quantity=1))
+        db.session.commit()
+        delete_product(discontinued)
+
+    with till.app_context():
+        db.session.execute(update(Product).where(Product.id == oversold).values(quantity=10))
+        db.session.commit()
+        checkout(db, user_id, [{"product_id": oversold, "name": names[oversold], "price": prices[oversold],
+                                "quantity": 3}])
+        report, err = sync.sync(pull=False)
+        check(not err and report["push"]["conflicts"] == 1, "overselling central stock is reported as a conflict")
+
+        server.shutdown()
+        try:
+            checkout(db, user_id, cart(rng_state, product_ids, names, prices))
+            sold_offline = True
+        except RuntimeError:
+            sold_offline = False
+        report, err = sync.sync()
+        check(sold_offline and err is not None and unsynced_count() == 1,
+              "the till sells while the central app is down and keeps the sale queued")
+
+        server, base_url = serve(central)
+        sync.central_url = base_url
+        report, err = sync.sync()
+        check(not err and unsynced_count() == 0, "the queued sale is pushed once the central app is back")
+        till_stock = dict(db.session.execute(select(Product.id, Product.quantity)).all())
+        check(report["pull"]["deleted"] == 1 and discontinued not in till_stock,
+              "a product deleted centrally is dropped from the till")
+    with central.app_context():
+        central_stock = dict(db.session.execute(select(Product.id, Product.quantity)).all())
+        check(central_stock[oversold] == 0, "oversold stock is floored at zero centrally")
+    check(till_stock == central_stock, "till stock matches central stock after sync")
+    server.shutdown()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+POS scan throughput with and without the product lookup cache.
+
+    python -m benchmarks.scan [--products 20000] [--scans 20000]
+
+Scans random known barcodes through lookup_product (uncached, ORM) and lookup_product_cached,
+reporting scans per second and SQL statements per scan.
+"""
+import argparse
+import random
+import time
+
+from benchmarks import count_queries, create_bench_app, seed_products
+
+
+def run(label, fn, codes, engine):
+    with count_queries(engine) as counter:
+        start = time.perf_counter()
+        for code in codes:
+            if fn(code) is None:
+                raise SystemExit(f"{label}: lookup failed for {code}")
+        elapsed = time.perf_counter() - start
+    print(f"{label:<11} {len(codes) / elapsed:>12,.0f} scans/s {counter.count / len(codes):>8.3f} statements/scan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--scans", type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app import db
+    from app.services.inventory_service import lookup_product, lookup_product_cached
+
+    with app.app_context():
+        seed_products(db, args.products, prefix="SCAN")
+        rng = random.Random(42)
+        hot = [f"SCAN{i:010d}" for i in rng.sample(range(args.products), min(2000, args.products))]
+        codes = [rng.choice(hot) for _ in range(args.scans)]
+        run("uncached", lookup_product, codes, db.engine)
+        run("cold cache", lookup_product_cached, codes, db.engine)
+        run("warm cache", lookup_product_cached, codes, db.engine)
+
+
+if __name__ == "__main__":
+    main()
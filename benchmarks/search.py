@@ -0,0 +1,81 @@
+"""
+Product search on a synthetic large catalogue: indexed backend vs plain ILIKE scan.
+
+    python -m benchmarks.search [--products 200000] [--queries 200]
+
+Runs the same search terms through get_products_page's search path with the detected
+backend (pg_trgm / FTS5) and with the "like" fallback, reporting mean and p95 latency.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import insert
+
+from benchmarks import create_bench_app
+
+ADJECTIVES = ["organic", "fresh", "frozen", "smoked", "spicy", "sweet", "salted", "whole", "low-fat", "classic"]
+NOUNS = ["milk", "bread", "cheddar", "yogurt", "salmon", "apple", "banana", "coffee", "pasta", "cereal",
+         "butter", "chicken", "tomato", "spinach", "almonds", "honey", "granola", "lemonade", "tortilla", "rice"]
+BRANDS = ["Acme", "Valley", "Sunrise", "Northfield", "Golden", "Harbor", "Meadow", "Summit"]
+
+
+def seed_catalogue(db, count):
+    from app.models.product import Product
+    rng = random.Random(7)
+    batch = []
+    for i in range(count):
+        batch.append({
+            "name": f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i % 997}g",
+            "price": 1 + (i % 900) / 100,
+            "quantity": 100,
+            "min_stock": 5,
+            "sku": f"SRCH-{i:07d}",
+            "barcode": f"77{i:011d}",
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(Product), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Product), batch)
+    db.session.commit()
+
+
+def measure(db, terms, backend):
+    from app.models.product import Product
+    from app.services.search_service import apply_product_search
+    timings = []
+    for term in terms:
+        start = time.perf_counter()
+        apply_product_search(Product.query, term, backend=backend).limit(20).all()
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app import db
+    from app.services.search_service import get_search_backend
+
+    with app.app_context():
+        seed_catalogue(db, args.products)
+        rng = random.Random(11)
+        terms = [rng.choice(NOUNS + BRANDS)[: rng.randint(4, 7)] for _ in range(args.queries)]
+        terms += [f"SRCH-{rng.randrange(args.products):07d}" for _ in range(args.queries // 4)]
+        backend = get_search_backend()
+        print(f"products={args.products} queries={len(terms)}")
+        for label in (backend, "like"):
+            mean, p95 = measure(db, terms, label)
+            print(f"{label:<6} mean={mean:8.2f} ms  p95={p95:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
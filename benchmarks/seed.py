@@ -0,0 +1,144 @@
+"""
+Seed a synthetic store: categories, SKUs, customers and months of sales history.
+
+    python -m benchmarks.seed [--skus 2000] [--customers 500] [--months 3] [--sales-per-day 200]
+
+Uses DATABASE_URL when set (e.g. a local PostgreSQL), otherwise a throwaway SQLite file. Data is
+deterministic for a given --seed. History is inserted with bulk statements, then the daily
+rollups are built so analytics pages behave like a long-running store.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from benchmarks import create_bench_app, seed_user
+
+CATEGORIES = ("Dairy", "Bakery", "Beverages", "Produce", "Frozen", "Snacks", "Household", "Meat")
+CHUNK = 20_000
+
+
+def _chunks(rows, size=CHUNK):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def seed_store(db, skus=2000, customers=500, months=3, sales_per_day=200, max_basket=8, seed=42, prefix="STORE"):
+    """
+    Insert a synthetic store and return a dict with the ids/codes the load generator needs:
+    {user_id, product_ids, barcodes, customer_ids, sale_ids, search_terms}.
+    """
+    from sqlalchemy import insert, select
+    from app.models.category import Category
+    from app.models.customer import Customer
+    from app.models.product import Product
+    from app.models.sale import Sale, SaleItem
+    from app.services.rollup_service import build_rollups
+
+    rng = random.Random(seed)
+    user = seed_user(db)
+    existing = {c.name: c.id for c in Category.query.all()}
+    for name in CATEGORIES:
+        if name not in existing:
+            db.session.add(Category(name=name))
+    db.session.commit()
+    category_ids = [c.id for c in Category.query.filter(Category.name.in_(CATEGORIES)).all()]
+
+    today = date.today()
+    products = []
+    for i in range(skus):
+        products.append({
+            "name": f"{rng.choice(CATEGORIES)} item {i:06d}",
+            "category_id": rng.choice(category_ids),
+            "price": Decimal(rng.randint(50, 5000)) / 100,
+            "quantity": rng.randint(0, 400) if i % 20 else rng.randint(0, 5),  # ~5% low stock
+            "min_stock": 10,
+            "sku": f"{prefix}-{i:06d}",
+            "barcode": f"{prefix[:3]}{i:010d}",
+            "expiration_date": today + timedelta(days=rng.randint(-3, 120)) if i % 4 == 0 else None,
+        })
+    for chunk in _chunks(products):
+        db.session.execute(insert(Product), chunk)
+    db.session.commit()
+    product_rows = db.session.execute(
+        select(Product.id, Product.price, Product.barcode).where(Product.sku.like(f"{prefix}-%")).order_by(Product.id)
+    ).all()
+    prices = {pid: price for pid, price, _ in product_rows}
+    product_ids = list(prices)
+
+    for chunk in _chunks([
+        {"name": f"Customer {i:06d}", "email": f"c{i}@example.com", "loyalty_points": rng.randint(0, 500)}
+        for i in range(customers)
+    ]):
+        db.session.execute(insert(Customer), chunk)
+    db.session.commit()
+    customer_ids = list(db.session.execute(select(Customer.id).order_by(Customer.id)).scalars())
+
+    days = months * 30
+    start = datetime.combine(today - timedelta(days=days), datetime.min.time())
+    sale_rows, baskets = [], []
+    for day in range(days):
+        for _ in range(sales_per_day):
+            created = start + timedelta(days=day, seconds=rng.randint(8 * 3600, 21 * 3600))
+            basket = {pid: rng.randint(1, 3) for pid in rng.sample(product_ids, rng.randint(1, max_basket))}
+            subtotal = sum(prices[pid] * qty for pid, qty in basket.items())
+            tax = (subtotal * Decimal("0.08")).quantize(Decimal("0.01"))
+            sale_rows.append({
+                "user_id": user.id,
+                "customer_id": rng.choice(customer_ids) if customer_ids and rng.random() < 0.3 else None,
+                "subtotal": subtotal,
+                "tax_amount": tax,
+                "discount_amount": 0,
+                "total": subtotal + tax,
+                "payment_method": rng.choice(("cash", "card", "mobile")),
+                "created_at": created,
+            })
+            baskets.append(basket)
+    sale_ids = []
+    for offset in range(0, len(sale_rows), CHUNK):
+        chunk = sale_rows[offset:offset + CHUNK]
+        ids = db.session.execute(insert(Sale).returning(Sale.id, sort_by_parameter_order=True), chunk).scalars().all()
+        items = [
+            {"sale_id": sid, "product_id": pid, "quantity": qty, "unit_price": prices[pid], "subtotal": prices[pid] * qty}
+            for sid, basket in zip(ids, baskets[offset:offset + CHUNK])
+            for pid, qty in basket.items()
+        ]
+        for item_chunk in _chunks(items):
+            db.session.execute(insert(SaleItem), item_chunk)
+        db.session.commit()
+        sale_ids.extend(ids)
+    build_rollups()
+
+    words = sorted({p["name"].split()[0].lower() for p in products})
+    return {
+        "user_id": user.id,
+        "product_ids": product_ids,
+        "barcodes": [barcode for _, _, barcode in product_rows],
+        "customer_ids": customer_ids,
+        "sale_ids": sale_ids,
+        "search_terms": words + [f"item {i:06d}" for i in rng.sample(range(skus), min(20, skus))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--sales-per-day", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from app import db
+    with app.app_context():
+        t0 = time.perf_counter()
+        store = seed_store(db, args.skus, args.customers, args.months, args.sales_per_day, seed=args.seed)
+        print(f"seeded {len(store['product_ids']):,} SKUs, {len(store['customer_ids']):,} customers, "
+              f"{len(store['sale_ids']):,} sales in {time.perf_counter() - t0:.1f}s")
+        print(f"database: {db.engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    main()
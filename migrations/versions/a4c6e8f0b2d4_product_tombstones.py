@@ -0,0 +1,37 @@
+"""Product tombstones for the catalogue change feed
+
+Revision ID: a4c6e8f0b2d4
+Revises: f9b3c5d7e1a2
+Create Date: 2026-10-18 09:41:27.204115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c6e8f0b2d4'
+down_revision = 'f9b3c5d7e1a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app()'s db.create_all() may already have made the new table
+    if not sa.inspect(op.get_bind()).has_table('product_tombstones'):
+        op.create_table(
+            'product_tombstones',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        with op.batch_alter_table('product_tombstones', schema=None) as batch_op:
+            batch_op.create_index('ix_product_tombstones_deleted_at_id', ['deleted_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product_tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_tombstones_deleted_at_id')
+
+    op.drop_table('product_tombstones')
@@ -0,0 +1,33 @@
+"""Rendered receipt cache
+
+Revision ID: a8b2c6d7e4f5
+Revises: f7a1b5c6d3e4
+Create Date: 2026-10-17 16:20:07.402913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8b2c6d7e4f5'
+down_revision = 'f7a1b5c6d3e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('receipts',
+    sa.Column('sale_id', sa.Integer(), nullable=False),
+    sa.Column('html', sa.Text(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('pdf', sa.LargeBinary(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['sale_id'], ['sales.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('sale_id')
+    )
+    # Older sales get their receipt rendered (once) on first reprint.
+
+
+def downgrade():
+    op.drop_table('receipts')
@@ -0,0 +1,34 @@
+"""Server-side POS carts
+
+Revision ID: b7e2d9f0a1c3
+Revises: a3f1c2d4e5b6
+Create Date: 2026-10-17 10:03:12.540871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d9f0a1c3'
+down_revision = 'a3f1c2d4e5b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pos_carts',
+    sa.Column('cart_id', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('cart_id')
+    )
+    with op.batch_alter_table('pos_carts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pos_carts_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pos_carts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pos_carts_updated_at'))
+
+    op.drop_table('pos_carts')
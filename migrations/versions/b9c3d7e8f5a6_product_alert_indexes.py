@@ -0,0 +1,32 @@
+"""Partial indexes for low-stock and expiry alerts
+
+Revision ID: b9c3d7e8f5a6
+Revises: a8b2c6d7e4f5
+Create Date: 2026-10-17 17:02:44.815390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9c3d7e8f5a6'
+down_revision = 'a8b2c6d7e4f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_low_stock', ['quantity'], unique=False,
+                              postgresql_where=sa.text('quantity <= min_stock'),
+                              sqlite_where=sa.text('quantity <= min_stock'))
+        batch_op.create_index('ix_products_expiration_date', ['expiration_date'], unique=False,
+                              postgresql_where=sa.text('expiration_date IS NOT NULL'),
+                              sqlite_where=sa.text('expiration_date IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_expiration_date')
+        batch_op.drop_index('ix_products_low_stock')
@@ -0,0 +1,121 @@
+"""Monthly partitions and keyset-pagination indexes for activity_logs
+
+Revision ID: c1e6f0a2b8d9
+Revises: b9c3d7e8f5a6
+Create Date: 2026-10-17 19:12:30.418265
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e6f0a2b8d9'
+down_revision = 'b9c3d7e8f5a6'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, user_id, action, entity_type, entity_id, details, ip_address, created_at'
+KEYSET_INDEXES = (
+    ('ix_activity_logs_user_id_created_at_id', ['user_id', 'created_at', 'id']),
+    ('ix_activity_logs_action_created_at_id', ['action', 'created_at', 'id']),
+    ('ix_activity_logs_entity_created_at_id', ['entity_type', 'entity_id', 'created_at', 'id']),
+)
+MONTHS_AHEAD = 3
+
+
+def _month_start(day, offset=0):
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _create_indexes(table):
+    op.create_index('ix_activity_logs_created_at_id', table, ['created_at', 'id'], unique=False)
+    for name, columns in KEYSET_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def _partition_postgresql(bind):
+    """Rebuild activity_logs as a table partitioned by month on created_at, keeping ids."""
+    op.execute(
+        "CREATE TABLE activity_logs_partitioned ("
+        "id integer NOT NULL DEFAULT nextval('activity_logs_id_seq'), "
+        "user_id integer REFERENCES users (id), "
+        "action varchar(50) NOT NULL, "
+        "entity_type varchar(50), "
+        "entity_id integer, "
+        "details text, "
+        "ip_address varchar(45), "
+        "created_at timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'utc'), "
+        "PRIMARY KEY (id, created_at)"
+        ") PARTITION BY RANGE (created_at)"
+    )
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM activity_logs")).scalar()
+    month = _month_start(oldest or date.today())
+    last = _month_start(date.today(), MONTHS_AHEAD)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE activity_logs_y{month.year:04d}m{month.month:02d} PARTITION OF activity_logs_partitioned "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"
+        )
+        month = _month_start(month, 1)
+    op.execute("CREATE TABLE activity_logs_default PARTITION OF activity_logs_partitioned DEFAULT")
+    op.execute(
+        f"INSERT INTO activity_logs_partitioned ({COLUMNS}) "
+        f"SELECT id, user_id, action, entity_type, entity_id, details, ip_address, "
+        f"COALESCE(created_at, now() AT TIME ZONE 'utc') FROM activity_logs"
+    )
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs_partitioned.id")
+    op.drop_table('activity_logs')
+    op.execute("ALTER TABLE activity_logs_partitioned RENAME TO activity_logs")
+    op.execute("ALTER TABLE activity_logs RENAME CONSTRAINT activity_logs_partitioned_pkey TO activity_logs_pkey")
+    _create_indexes('activity_logs')
+    op.execute("ANALYZE activity_logs")
+
+
+def _unpartition_postgresql():
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_partitioned")
+    op.execute("ALTER TABLE activity_logs_partitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_partitioned_pkey")
+    op.execute(
+        "CREATE TABLE activity_logs ("
+        "id integer NOT NULL DEFAULT nextval('activity_logs_id_seq') PRIMARY KEY, "
+        "user_id integer REFERENCES users (id), "
+        "action varchar(50) NOT NULL, "
+        "entity_type varchar(50), "
+        "entity_id integer, "
+        "details text, "
+        "ip_address varchar(45), "
+        "created_at timestamp without time zone"
+        ")"
+    )
+    op.execute(f"INSERT INTO activity_logs ({COLUMNS}) SELECT {COLUMNS} FROM activity_logs_partitioned")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    op.execute("DROP TABLE activity_logs_partitioned CASCADE")
+    op.create_index('ix_activity_logs_created_at_id', 'activity_logs', ['created_at', 'id'], unique=False)
+    op.create_index('ix_activity_logs_user_id', 'activity_logs', ['user_id'], unique=False)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _partition_postgresql(bind)
+        return
+    op.execute("UPDATE activity_logs SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_index('ix_activity_logs_user_id')
+        for name, columns in KEYSET_INDEXES:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _unpartition_postgresql()
+        return
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        for name, _ in reversed(KEYSET_INDEXES):
+            batch_op.drop_index(name)
+        batch_op.create_index('ix_activity_logs_user_id', ['user_id'], unique=False)
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,77 @@
+"""Product search indexes (pg_trgm GIN on PostgreSQL, FTS5 on SQLite)
+
+Revision ID: c4d8e1f2a9b0
+Revises: b7e2d9f0a1c3
+Create Date: 2026-10-17 11:26:05.903417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e1f2a9b0'
+down_revision = 'b7e2d9f0a1c3'
+branch_labels = None
+depends_on = None
+
+TRGM_COLUMNS = ('name', 'sku', 'barcode')
+
+
+def _has_trgm(bind):
+    """Try to enable pg_trgm; search falls back to plain ILIKE when it is unavailable."""
+    available = bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first()
+    if not available:
+        return False
+    savepoint = bind.begin_nested()
+    try:
+        bind.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        savepoint.commit()
+        return True
+    except sa.exc.DBAPIError:
+        savepoint.rollback()  # e.g. no CREATE privilege on the database
+        return False
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        if not _has_trgm(bind):
+            return
+        for column in TRGM_COLUMNS:
+            op.create_index(
+                f'ix_products_{column}_trgm', 'products', [column], unique=False,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+            )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            "name, sku, barcode, content='products', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+            "INSERT INTO products_fts(rowid, name, sku, barcode) VALUES (new.id, new.name, new.sku, new.barcode); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+            "INSERT INTO products_fts(products_fts, rowid, name, sku, barcode) "
+            "VALUES ('delete', old.id, old.name, old.sku, old.barcode); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku, barcode ON products BEGIN "
+            "INSERT INTO products_fts(products_fts, rowid, name, sku, barcode) "
+            "VALUES ('delete', old.id, old.name, old.sku, old.barcode); "
+            "INSERT INTO products_fts(rowid, name, sku, barcode) VALUES (new.id, new.name, new.sku, new.barcode); END"
+        )
+        op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for column in TRGM_COLUMNS:
+            op.execute(f'DROP INDEX IF EXISTS ix_products_{column}_trgm')
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('products_fts_ai', 'products_fts_ad', 'products_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS products_fts')
@@ -0,0 +1,36 @@
+"""(name, id) indexes for product and customer list keyset pagination
+
+Revision ID: d2f7a1b3c9e0
+Revises: c1e6f0a2b8d9
+Create Date: 2026-10-17 21:05:17.552031
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a1b3c9e0'
+down_revision = 'c1e6f0a2b8d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_name_id', ['name', 'id'], unique=False)
+        batch_op.drop_index(batch_op.f('ix_products_name'))
+
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.create_index('ix_customers_name_id', ['name', 'id'], unique=False)
+        batch_op.drop_index(batch_op.f('ix_customers_name'))
+
+
+def downgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_customers_name'), ['name'], unique=False)
+        batch_op.drop_index('ix_customers_name_id')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_products_name'), ['name'], unique=False)
+        batch_op.drop_index('ix_products_name_id')
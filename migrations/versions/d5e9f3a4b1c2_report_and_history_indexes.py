@@ -0,0 +1,53 @@
+"""Indexes for report, history and audit-log queries
+
+Revision ID: d5e9f3a4b1c2
+Revises: c4d8e1f2a9b0
+Create Date: 2026-10-17 12:40:51.277310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e9f3a4b1c2'
+down_revision = 'c4d8e1f2a9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_created_at_positive', ['created_at'], unique=False,
+                              postgresql_where=sa.text('total > 0'), sqlite_where=sa.text('total > 0'))
+        batch_op.create_index('ix_sales_customer_id_created_at', ['customer_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('sale_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sale_items_sale_id'), ['sale_id'], unique=False)
+        batch_op.create_index('ix_sale_items_product_id_sale_id', ['product_id', 'sale_id'], unique=False)
+
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_logs_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_activity_logs_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_shifts_start_at'), ['start_at'], unique=False)
+        batch_op.create_index('ix_shifts_user_id_start_at', ['user_id', 'start_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.drop_index('ix_shifts_user_id_start_at')
+        batch_op.drop_index(batch_op.f('ix_shifts_start_at'))
+
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_activity_logs_user_id'))
+        batch_op.drop_index('ix_activity_logs_created_at_id')
+
+    with op.batch_alter_table('sale_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_items_product_id_sale_id')
+        batch_op.drop_index(batch_op.f('ix_sale_items_sale_id'))
+
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_customer_id_created_at')
+        batch_op.drop_index('ix_sales_created_at_positive')
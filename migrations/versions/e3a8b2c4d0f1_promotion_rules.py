@@ -0,0 +1,42 @@
+"""Item, category and basket promotion rules (BOGO, multi-buy, tiered)
+
+Revision ID: e3a8b2c4d0f1
+Revises: d2f7a1b3c9e0
+Create Date: 2026-10-17 22:31:48.064213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8b2c4d0f1'
+down_revision = 'd2f7a1b3c9e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('promotions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('scope', sa.String(length=20), nullable=False, server_default='basket'))
+        batch_op.add_column(sa.Column('product_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('buy_quantity', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('get_quantity', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('tiers', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('automatic', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.create_foreign_key('fk_promotions_product_id', 'products', ['product_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('fk_promotions_category_id', 'categories', ['category_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('promotions', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_promotions_category_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_promotions_product_id', type_='foreignkey')
+        batch_op.drop_column('automatic')
+        batch_op.drop_column('tiers')
+        batch_op.drop_column('get_quantity')
+        batch_op.drop_column('buy_quantity')
+        batch_op.drop_column('category_id')
+        batch_op.drop_column('product_id')
+        batch_op.drop_column('scope')
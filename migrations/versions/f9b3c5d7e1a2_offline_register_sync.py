@@ -0,0 +1,57 @@
+"""Offline register sync: sale idempotency keys, till outbox, catalogue watermark index
+
+Revision ID: f9b3c5d7e1a2
+Revises: e3a8b2c4d0f1
+Create Date: 2026-10-17 23:12:05.518270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9b3c5d7e1a2'
+down_revision = 'e3a8b2c4d0f1'
+branch_labels = None
+depends_on = None
+
+UNSYNCED = "client_ref IS NOT NULL AND synced_at IS NULL"
+
+
+def upgrade():
+    # create_app()'s db.create_all() may already have made the new table
+    if not sa.inspect(op.get_bind()).has_table('register_state'):
+        op.create_table(
+            'register_state',
+            sa.Column('key', sa.String(length=64), nullable=False),
+            sa.Column('value', sa.Text(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('key'),
+        )
+
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_ref', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('register_id', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('synced_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_sales_client_ref', ['client_ref'], unique=True)
+        batch_op.create_index('ix_sales_unsynced', ['id'], unique=False,
+                              postgresql_where=sa.text(UNSYNCED), sqlite_where=sa.text(UNSYNCED))
+
+    # Rows without a timestamp would never pass a watermark
+    op.execute("UPDATE products SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_updated_at_id', ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_table('register_state')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_updated_at_id')
+
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_unsynced')
+        batch_op.drop_index('ix_sales_client_ref')
+        batch_op.drop_column('synced_at')
+        batch_op.drop_column('register_id')
+        batch_op.drop_column('client_ref')
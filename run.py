@@ -2,6 +2,7 @@
 Entry point to run the Grocery Store Management System.
 """
 import os
+import click
 from app import create_app, db
 from app.models import User, Category, Supplier
 
@@ -31,5 +32,255 @@ def init_db():
     print("Database initialized. Default admin: admin / admin123")
 
 
+@app.cli.command("purge-reservations")
+def purge_reservations():
+    """Delete expired stock reservations left behind by abandoned carts."""
+    from app.services.reservation_service import purge_expired
+    with app.app_context():
+        removed = purge_expired()
+    print(f"Removed {removed} expired reservation(s).")
+
+
+@app.cli.command("purge-carts")
+@click.option("--hours", default=24, show_default=True, help="Remove carts untouched for this long.")
+def purge_carts(hours):
+    """Delete abandoned server-side POS carts."""
+    from datetime import timedelta
+    from app.services.cart_store import get_cart_store
+    with app.app_context():
+        removed = get_cart_store().purge_stale(timedelta(hours=hours))
+    print(f"Removed {removed} abandoned cart(s).")
+
+
+@app.cli.command("db-explain")
+@click.option("--days", default=30, show_default=True, help="Date range used for report queries.")
+@click.option("--verbose", is_flag=True, help="Print the full plan of every statement.")
+@click.option("--strict", is_flag=True, help="Exit with status 1 if any unexpected sequential scan is found.")
+def db_explain(days, verbose, strict):
+    """EXPLAIN report/history queries and flag sequential scans."""
+    from app.utils.explain import run_explain_audit
+    with app.app_context():
+        results = run_explain_audit(days=days)
+    flagged = 0
+    for r in results:
+        status = "SEQ SCAN " + ", ".join(sorted(r["unexpected"])) if r["unexpected"] else "ok"
+        flagged += bool(r["unexpected"])
+        print(f"{r['query']:<24} {status}")
+        if verbose or r["unexpected"]:
+            for line in r["plan"]:
+                print(f"    {line}")
+    print(f"{len(results)} statement(s) explained, {flagged} flagged.")
+    if strict and flagged:
+        raise SystemExit(1)
+
+
+@app.cli.command("rollup-build")
+@click.option("--days", default=None, type=int, help="Only (re)build the last N closed days.")
+@click.option("--force", is_flag=True, help="Rebuild days that are already complete.")
+def rollup_build(days, force):
+    """Catch-up job: build daily sales rollups for closed days from the raw tables."""
+    from datetime import datetime, timedelta
+    from app.services.rollup_service import build_rollups
+    start = datetime.utcnow().date() - timedelta(days=days) if days else None
+    with app.app_context():
+        built = build_rollups(start_day=start, force=force)
+    print(f"Built rollups for {built} day(s).")
+
+
+@app.cli.command("rollup-check")
+@click.option("--days", default=None, type=int, help="Only check the last N closed days.")
+def rollup_check(days):
+    """Verify daily sales rollups against the raw sales tables."""
+    from datetime import datetime, timedelta
+    from app.services.rollup_service import check_rollups
+    start = datetime.utcnow().date() - timedelta(days=days) if days else None
+    with app.app_context():
+        problems = check_rollups(start_day=start)
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} mismatch(es).")
+    if problems:
+        raise SystemExit(1)
+
+
+@app.cli.command("export-worker")
+@click.option("--once", is_flag=True, help="Exit when the queue is empty instead of polling.")
+def export_worker(once):
+    """Run background export jobs in this process (use with EXPORT_WORKER_THREADS=0)."""
+    import threading
+    from app.services.job_service import work
+    stop = threading.Event()
+    try:
+        work(app, stop, poll_interval=app.config.get("EXPORT_POLL_INTERVAL", 1.0), once=once)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+@app.cli.command("export-purge")
+def export_purge():
+    """Delete expired export artifacts and fail jobs whose worker died."""
+    from app.services.job_service import purge_expired_exports
+    with app.app_context():
+        removed, failed = purge_expired_exports()
+    print(f"Removed {removed} expired export(s), marked {failed} stale job(s) failed.")
+
+
+@app.cli.command("perf-report")
+@click.option("--top", default=20, show_default=True, help="Number of endpoints to show.")
+@click.option("--sort", "sort_by", type=click.Choice(["time", "statements", "count", "p95"]), default="time",
+              show_default=True, help="time = total request time, statements = average per request.")
+@click.option("--reset", is_flag=True, help="Delete the collected snapshots after printing.")
+def perf_report(top, sort_by, reset):
+    """Summarise request latency and SQL statements per endpoint (needs METRICS_ENABLED=1)."""
+    import os
+    from app.utils.metrics import LATENCY_BUCKETS, get_metrics_dir, merge_snapshots, quantile, read_snapshots
+    snapshots = read_snapshots(app)
+    merged = merge_snapshots(snapshots, app.config.get("METRICS_SLOW_STATEMENTS", 20))
+    rows = []
+    for key, e in merged["endpoints"].items():
+        n = e["count"] or 1
+        rows.append({
+            "key": key,
+            "count": e["count"],
+            "time": e["latency_sum"],
+            "p50": quantile(0.5, e["latency_buckets"], LATENCY_BUCKETS, e["count"]),
+            "p95": quantile(0.95, e["latency_buckets"], LATENCY_BUCKETS, e["count"]),
+            "statements": e["statements"] / n,
+            "max_statements": e["max_statements"],
+            "db_ms": e["db_time"] / n * 1000,
+            "db_share": e["db_time"] / e["latency_sum"] if e["latency_sum"] else 0,
+        })
+    rows.sort(key=lambda r: r[sort_by], reverse=True)
+    print(f"{len(snapshots)} process snapshot(s), {sum(r['count'] for r in rows)} request(s)")
+    print(f"{'endpoint':<40} {'reqs':>7} {'p50 ms':>8} {'p95 ms':>8} {'stmts':>6} {'max':>5} {'db ms':>7} {'db %':>5}")
+    for r in rows[:top]:
+        print(f"{r['key'][:40]:<40} {r['count']:>7} {r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} "
+              f"{r['statements']:>6.1f} {r['max_statements']:>5} {r['db_ms']:>7.1f} {r['db_share'] * 100:>5.0f}")
+    if merged["slow"]:
+        print("\nSlowest statements:")
+        for seconds, key, statement in merged["slow"]:
+            print(f"{seconds * 1000:>9.1f} ms  {key}  {' '.join(statement.split())[:160]}")
+    if reset:
+        directory = get_metrics_dir(app)
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(directory, name))
+        print("Snapshots deleted.")
+
+
+@app.cli.command("import-products")
+@click.argument("path", type=click.Path(allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json"]), default=None,
+              help="Input format (default: from the file extension).")
+@click.option("--dry-run", is_flag=True, help="Validate and report without saving.")
+@click.option("--batch-size", default=None, type=int, help="Rows per batch/commit (default IMPORT_BATCH_SIZE).")
+def import_products(path, fmt, dry_run, batch_size):
+    """Create/update products from a CSV or JSON (array or JSON Lines) file; - reads stdin."""
+    from app.services import import_service as importer
+    fmt = fmt or importer.guess_format(path)
+    if fmt is None:
+        raise click.UsageError("Cannot tell the format from the file name; pass --format.")
+    with click.open_file(path, "rb") as f, app.app_context():
+        report, err = importer.import_products(importer.iter_rows(f, fmt), dry_run=dry_run, batch_size=batch_size)
+    for e in report["errors"][:50]:
+        print(f"row {e['row']}" + (f" ({e['key']})" if e["key"] else "") + f": {e['error']}")
+    if report["failed"] > 50:
+        print(f"... {report['failed'] - 50} more error(s)")
+    print(("Dry run: " if dry_run else "")
+          + f"{report['processed']} row(s), {report['created']} created, {report['updated']} updated, {report['failed']} failed.")
+    if err:
+        print(err)
+    if err or report["failed"]:
+        raise SystemExit(1)
+
+
+@app.cli.command("activity-replay")
+def activity_replay():
+    """Write activity log records spilled to disk by processes that have exited."""
+    from app.services.activity_writer import ActivityLogWriter
+    writer = ActivityLogWriter(app, batch_size=app.config.get("ACTIVITY_LOG_BATCH_SIZE", 200),
+                               spill_dir=app.config.get("ACTIVITY_LOG_SPILL_DIR"))
+    print(f"Replayed {writer.replay()} activity log record(s) from {writer.spill_dir}.")
+
+
+@app.cli.command("activity-partitions")
+@click.option("--ahead", default=None, type=int, help="Months to create ahead (default ACTIVITY_LOG_PARTITIONS_AHEAD).")
+def activity_partitions(ahead):
+    """Create the coming monthly activity_logs partitions (PostgreSQL; run monthly)."""
+    from app.services.activity_log_service import ensure_partitions, is_partitioned
+    with app.app_context():
+        if not is_partitioned():
+            print("activity_logs is not partitioned; nothing to do.")
+            return
+        created = ensure_partitions(ahead)
+    print(f"Created {len(created)} partition(s)" + (": " + ", ".join(created) if created else "."))
+
+
+@app.cli.command("activity-archive")
+@click.option("--months", default=None, type=int, help="Months to keep (default ACTIVITY_LOG_RETENTION_MONTHS).")
+@click.option("--dir", "out_dir", default=None, help="Archive directory (default ACTIVITY_LOG_ARCHIVE_DIR).")
+@click.option("--dry-run", is_flag=True, help="List the months that would be archived.")
+def activity_archive(months, out_dir, dry_run):
+    """Move activity log months past retention to gzipped JSON Lines files."""
+    from app.services.activity_log_service import archive_activity, ensure_partitions
+    with app.app_context():
+        if not dry_run:
+            ensure_partitions()
+        archived, err = archive_activity(months, out_dir, dry_run=dry_run)
+    if err:
+        raise click.UsageError(err)
+    for month, path, rows in archived:
+        label = f"{month:%Y-%m}" if month else "older rows"
+        print(f"{label}: would be archived" if dry_run else f"{label}: {rows} row(s) -> {path or 'no file'}")
+    if not archived:
+        print("Nothing to archive.")
+
+
+@app.cli.command("catalog-prune")
+@click.option("--days", default=None, type=int, help="Days of deletions to keep (default CATALOG_TOMBSTONE_DAYS).")
+def catalog_prune(days):
+    """Delete old product tombstones from the catalogue change feed."""
+    from app.services.catalog_changes import prune_tombstones
+    with app.app_context():
+        removed = prune_tombstones(days)
+    print(f"Removed {removed} product tombstone(s).")
+
+
+@app.cli.command("register-sync")
+@click.option("--push-only", is_flag=True, help="Only send this till's unsynced sales.")
+@click.option("--pull-only", is_flag=True, help="Only fetch catalogue changes.")
+def register_sync(push_only, pull_only):
+    """Offline till: push unsynced sales to the central database, then pull catalogue changes."""
+    from app.services.register_sync import get_register_sync
+    with app.app_context():
+        sync = get_register_sync()
+        if sync is None:
+            raise click.UsageError("REGISTER_MODE is not 'offline'.")
+        report, err = sync.sync(push=not pull_only, pull=not push_only)
+    if "push" in report:
+        push = report["push"]
+        print(f"Pushed: {push['created']} created, {push['duplicate']} already synced, {push['rejected']} rejected, "
+              f"{push['conflicts']} stock conflict(s).")
+    if "pull" in report:
+        print(f"Pulled {report['pull']['products']} product change(s), {report['pull']['deleted']} deletion(s)"
+              + (", reference data updated." if report["pull"]["reference"] else "."))
+    if err:
+        print(err)
+        raise SystemExit(1)
+
+
+@app.cli.command("register-status")
+def register_status():
+    """Offline till: sales waiting to be pushed and the last sync times."""
+    from app.models import RegisterState
+    from app.services.register_sync import unsynced_count
+    with app.app_context():
+        state = {row.key: row.value for row in RegisterState.query.all()}
+        print(f"Register mode: {app.config.get('REGISTER_MODE')}")
+        print(f"Unsynced sales: {unsynced_count()}")
+        print(f"Last push: {state.get('last_push') or 'never'}")
+        print(f"Last pull: {state.get('last_pull') or 'never'}")
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
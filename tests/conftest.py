@@ -0,0 +1,40 @@
+"""
+Fixtures: a fresh app per test on a throwaway SQLite file (DATABASE_URL is overridden).
+
+    python -m pytest tests
+"""
+import pytest
+
+from benchmarks import seed_user
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    from app import create_app, db
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def db(app):
+    from app import db
+    return db
+
+
+@pytest.fixture
+def user_id(db):
+    return seed_user(db, "tester").id
+
+
+@pytest.fixture
+def client(app, user_id):
+    """A test client logged in as an admin."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return client
@@ -0,0 +1,29 @@
+"""
+The sales CSV export streams: memory stays flat however many rows it drains.
+
+EXPORT_TEST_ROWS sets the number of seeded sales (default 100000 to keep CI fast; use 1000000
+for the full run). EXPORT_TEST_MAX_RSS_MB is the allowed RSS growth while exporting them
+(default 16, well under the ~60 MiB that materialising 100000 rows costs).
+"""
+import os
+from datetime import datetime, timedelta
+
+from benchmarks.export import SALES_PER_DAY, rss_mb, seed_sales
+
+ROWS = int(os.environ.get("EXPORT_TEST_ROWS", "100000"))
+MAX_RSS_MB = float(os.environ.get("EXPORT_TEST_MAX_RSS_MB", "16"))
+
+
+def test_csv_export_memory_is_bounded(db, user_id):
+    from app.services import report_service as reports
+    start = datetime(2020, 1, 1)
+    seed_sales(db, user_id, ROWS, start)
+    db.session.expunge_all()
+    end = start + timedelta(days=-(-ROWS // SALES_PER_DAY) - 1)  # inclusive last day
+    base = peak = rss_mb()
+    lines = 0
+    for chunk in reports.export_sales_csv(start, end):
+        lines += chunk.count("\n")
+        peak = max(peak, rss_mb())
+    assert lines - 1 == ROWS  # less the header
+    assert peak - base <= MAX_RSS_MB, f"RSS grew {peak - base:.1f} MiB exporting {ROWS} sales"
@@ -0,0 +1,11 @@
+"""Cart totals in integer cents agree with exact Decimal arithmetic."""
+import random
+
+from benchmarks.money import check_parity, random_cart
+
+
+def test_cents_totals_match_decimal(app):
+    from app.services.billing_service import get_tax_rate
+    rng = random.Random(8)
+    carts = [random_cart(rng, rng.randint(1, 60)) for _ in range(500)]
+    assert check_parity(rng, carts, get_tax_rate()) == 0
@@ -0,0 +1,61 @@
+"""Parallel registers selling one hot product never sell more than the stock."""
+import random
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import seed_products, sqlite_immediate_transactions
+
+REGISTERS = 8
+STOCK = 40
+
+
+def test_concurrent_checkout_does_not_oversell(app, db, user_id):
+    from app.models.product import Product
+    from app.services import reservation_service as reservations
+    from app.services.billing_service import create_sale
+    sqlite_immediate_transactions(db.engine)
+    product_id = seed_products(db, 1, quantity=STOCK, prefix="HOT")[0]
+    db.session.remove()
+    sold, deadlocks, errors = [], [], []
+
+    def register(n):
+        holder = f"register-{n}"
+        rng = random.Random(n)
+        with app.app_context():
+            try:
+                while True:
+                    qty = rng.randint(1, 3)
+                    try:
+                        _, err = reservations.reserve(holder, product_id, qty)
+                        if not err:
+                            cart = [{"product_id": product_id, "name": "hot", "price": 1, "quantity": qty,
+                                     "subtotal": qty}]
+                            _, err = create_sale(user_id, cart, "cash", holder=holder)
+                    except OperationalError as e:
+                        db.session.rollback()
+                        if "deadlock" in str(e).lower():
+                            deadlocks.append(n)
+                        continue
+                    if not err:
+                        sold.append(qty)
+                    sold_out = err and db.session.get(Product, product_id).quantity == 0
+                    db.session.rollback()
+                    if sold_out:
+                        return
+            except Exception as e:  # surfaced by the assertions below
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=register, args=(n,)) for n in range(REGISTERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=120)
+    assert not any(t.is_alive() for t in threads)
+    assert not errors, errors
+    assert not deadlocks
+    final = db.session.get(Product, product_id).quantity
+    assert final == 0
+    assert sum(sold) == STOCK
@@ -0,0 +1,75 @@
+"""Checkout, batch scans and receipts cost the same number of SQL statements whatever the basket size."""
+from flask import g
+
+from benchmarks import count_queries, seed_products
+
+SIZES = (1, 1, 10, 60)  # the first basket warms per-process caches (active promotions) and is not compared
+
+
+def test_create_sale_statement_count_is_flat(db, user_id):
+    from app.services.billing_service import create_sale
+    product_ids = seed_products(db, max(SIZES), quantity=100, prefix="CHK")
+    counts = []
+    for size in SIZES:
+        cart = [{"product_id": pid, "name": str(pid), "price": 1.5, "quantity": 1, "subtotal": 1.5}
+                for pid in product_ids[:size]]
+        with count_queries(db.engine) as counter:
+            sale, err = create_sale(user_id, cart, "cash")
+        assert err is None
+        assert sale.items.count() == size
+        counts.append(counter.count)
+    assert len(set(counts[1:])) == 1, counts
+
+
+def test_cart_add_batch_statement_count_is_flat(db, client):
+    from app.services.product_cache import get_product_cache
+    seed_products(db, max(SIZES), quantity=100, prefix="BSKT")
+    counts = []
+    for n, size in enumerate(SIZES):
+        cache = get_product_cache()
+        if cache is not None:
+            cache.clear()
+        with client.session_transaction() as session:
+            session["pos_cart_id"] = f"batch-{n}"
+        codes = [f"BSKT{i:010d}" for i in range(size)]
+        with count_queries(db.engine) as counter:
+            response = client.post("/pos/cart/add-batch", json={"items": codes})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        assert len(response.get_json()["cart"]) == size
+        counts.append(counter.count)
+    assert len(set(counts[1:])) == 1, counts
+
+
+def test_receipt_statement_counts_are_flat(db, client, user_id):
+    from app.models.receipt import Receipt
+    from app.services.billing_service import create_sale
+    from app.services.receipt_service import get_receipt
+    product_ids = seed_products(db, max(SIZES), quantity=100, prefix="RCPT")
+    counts = {"stored": [], "first view": [], "GET": []}
+    for size in SIZES:
+        cart = [{"product_id": pid, "name": str(pid), "price": 1.25, "quantity": 2, "subtotal": 2.5}
+                for pid in product_ids[:size]]
+        sale, err = create_sale(user_id, cart, "cash")
+        assert err is None
+        sale_id = sale.id
+        db.session.expunge_all()
+
+        with count_queries(db.engine) as stored:
+            get_receipt(sale_id).html
+        db.session.expunge_all()
+
+        db.session.query(Receipt).filter_by(sale_id=sale_id).delete()
+        db.session.commit()
+        db.session.expunge_all()
+        with count_queries(db.engine) as first:
+            receipt = get_receipt(sale_id)
+        assert receipt.html.count("<tr>") == size + 1  # header row and one per item
+
+        g.pop("_login_user", None)  # requests share the test's app context; reload the user as a request would
+        with count_queries(db.engine) as http:
+            response = client.get(f"/pos/receipt/{sale_id}")
+        assert response.status_code == 200
+        counts["stored"].append(stored.count)
+        counts["first view"].append(first.count)
+        counts["GET"].append(http.count)
+    assert all(len(set(seen[1:])) == 1 for seen in counts.values()), counts